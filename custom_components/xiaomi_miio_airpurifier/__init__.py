@@ -1 +1,60 @@
 """Support for Xiaomi Miio."""
+
+import voluptuous as vol
+
+from homeassistant.const import Platform
+from homeassistant.core import SupportsResponse
+import homeassistant.helpers.config_validation as cv
+from homeassistant.helpers.discovery import async_load_platform
+
+from .const import (
+    CONF_IO_WORKERS,
+    CONF_METRICS_SENSORS,
+    CONF_PUSH_ADDRESS,
+    CONF_SERVICE_CONCURRENCY,
+    DATA_CONFIG,
+    DEFAULT_IO_WORKERS,
+    DEFAULT_PUSH_ADDRESS,
+    DEFAULT_SERVICE_CONCURRENCY,
+    DOMAIN,
+    SERVICE_GET_METRICS,
+)
+from .metrics import async_get_metrics
+
+DOMAIN_SCHEMA = vol.Schema(
+    {
+        vol.Optional(
+            CONF_SERVICE_CONCURRENCY, default=DEFAULT_SERVICE_CONCURRENCY
+        ): cv.positive_int,
+        vol.Optional(CONF_IO_WORKERS, default=DEFAULT_IO_WORKERS): cv.positive_int,
+        vol.Optional(CONF_METRICS_SENSORS, default=False): cv.boolean,
+        vol.Optional(CONF_PUSH_ADDRESS, default=DEFAULT_PUSH_ADDRESS): cv.string,
+    }
+)
+
+CONFIG_SCHEMA = vol.Schema(
+    {vol.Optional(DOMAIN, default={}): DOMAIN_SCHEMA}, extra=vol.ALLOW_EXTRA
+)
+
+
+async def async_setup(hass, config):
+    """Set up the options shared by all devices."""
+    hass.data[DATA_CONFIG] = config.get(DOMAIN) or DOMAIN_SCHEMA({})
+
+    async def async_get_metrics_service(service):
+        """Return the request metrics of all devices."""
+        return async_get_metrics(hass)
+
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_GET_METRICS,
+        async_get_metrics_service,
+        supports_response=SupportsResponse.ONLY,
+    )
+
+    if hass.data[DATA_CONFIG][CONF_METRICS_SENSORS]:
+        hass.async_create_task(
+            async_load_platform(hass, Platform.SENSOR, DOMAIN, {}, config)
+        )
+
+    return True
@@ -0,0 +1,191 @@
+"""Read the state attributes from the status of a device."""
+
+from collections.abc import MutableMapping
+from enum import Enum
+from operator import attrgetter
+
+# Value of the keys which aren't set.
+_UNSET = object()
+
+_SCHEMAS = {}
+
+
+class AttributeExtractor:
+    """Read a map of attributes from a status in one pass.
+
+    The properties of the status are fetched by a single attrgetter. Enum
+    values are replaced by their value. Whether a property returns an
+    enum is learned from the first value which isn't None, so later
+    passes only touch the enum properties.
+    """
+
+    def __init__(self, attributes):
+        """Initialize the extractor of a map of attribute names to properties."""
+        self._attributes = attributes
+        self._subsets = {}
+        self._keys = tuple(attributes)
+        self._getter = attrgetter(*attributes.values()) if attributes else None
+        self._single = len(attributes) == 1
+        # Indexes of the properties which didn't return a value yet.
+        self._unknown = set(range(len(attributes)))
+        self._enums = []
+
+    def __call__(self, state):
+        """Return the attributes of a status."""
+        if self._getter is None:
+            return {}
+
+        values = self._getter(state)
+        if self._single:
+            values = (values,)
+
+        if self._unknown:
+            self._learn(values)
+
+        if self._enums:
+            values = list(values)
+            for index in self._enums:
+                if isinstance(values[index], Enum):
+                    values[index] = values[index].value
+
+        return dict(zip(self._keys, values))
+
+    def subset(self, keys):
+        """Return the extractor of the attributes among the keys.
+
+        The extractors are kept per set of keys, so they only touch the
+        properties of their attributes.
+        """
+        keys = frozenset(keys)
+        extractor = self._subsets.get(keys)
+        if extractor is None:
+            extractor = self._subsets[keys] = AttributeExtractor(
+                {key: prop for key, prop in self._attributes.items() if key in keys}
+            )
+
+        return extractor
+
+    def _learn(self, values):
+        """Remember which properties return enums."""
+        for index in list(self._unknown):
+            value = values[index]
+            if value is None:
+                continue
+
+            self._unknown.discard(index)
+            if isinstance(value, Enum):
+                self._enums.append(index)
+
+
+def get_schema(keys):
+    """Return the index of the keys, shared by all entities with these keys."""
+    keys = tuple(keys)
+    if keys not in _SCHEMAS:
+        _SCHEMAS[keys] = {key: index for index, key in enumerate(keys)}
+
+    return _SCHEMAS[keys]
+
+
+class StateAttributes(MutableMapping):
+    """State attributes of an entity stored as a list of values.
+
+    The index of the keys is shared by the entities of a model, so every
+    entity only keeps a list of values instead of a dict. Keys which
+    aren't part of the index are kept in a dict of their own.
+    """
+
+    __slots__ = ("_index", "_values", "_extra")
+
+    def __init__(self, index, values=None):
+        """Initialize the attributes with the index of their keys."""
+        self._index = index
+        self._values = [_UNSET] * len(index)
+        self._extra = None
+        if values:
+            self.update(values)
+
+    def __getitem__(self, key):
+        """Return the value of a key."""
+        position = self._index.get(key)
+        if position is None:
+            if self._extra is None:
+                raise KeyError(key)
+            return self._extra[key]
+
+        value = self._values[position]
+        if value is _UNSET:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        """Set the value of a key."""
+        position = self._index.get(key)
+        if position is not None:
+            self._values[position] = value
+        elif self._extra is None:
+            self._extra = {key: value}
+        else:
+            self._extra[key] = value
+
+    def __delitem__(self, key):
+        """Remove a key."""
+        position = self._index.get(key)
+        if position is None:
+            if self._extra is None:
+                raise KeyError(key)
+            del self._extra[key]
+        elif self._values[position] is _UNSET:
+            raise KeyError(key)
+        else:
+            self._values[position] = _UNSET
+
+    def __iter__(self):
+        """Iterate over the keys which are set."""
+        for key, value in zip(self._index, self._values):
+            if value is not _UNSET:
+                yield key
+        if self._extra is not None:
+            yield from self._extra
+
+    def __len__(self):
+        """Return the number of keys which are set."""
+        length = len(self._values) - self._values.count(_UNSET)
+        if self._extra is not None:
+            length += len(self._extra)
+        return length
+
+    def get(self, key, default=None):
+        """Return the value of a key or the default if it isn't set."""
+        position = self._index.get(key)
+        if position is None:
+            if self._extra is None:
+                return default
+            return self._extra.get(key, default)
+
+        value = self._values[position]
+        return default if value is _UNSET else value
+
+    def update(self, values):
+        """Set the values of a dict."""
+        index = self._index
+        for key, value in values.items():
+            position = index.get(key)
+            if position is None:
+                self[key] = value
+            else:
+                self._values[position] = value
+
+    def as_dict(self):
+        """Return the attributes as a dict."""
+        attributes = {
+            key: value
+            for key, value in zip(self._index, self._values)
+            if value is not _UNSET
+        }
+        if self._extra is not None:
+            attributes.update(self._extra)
+        return attributes
+
+    def __repr__(self):
+        """Return the representation of the attributes."""
+        return f"{type(self).__name__}({self.as_dict()!r})"
@@ -0,0 +1,68 @@
+"""Circuit breaker for unreachable Xiaomi Miio devices."""
+
+from datetime import timedelta
+import random
+
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
+STATE_HALF_OPEN = "half_open"
+
+# Consecutive failed polls which open the breaker.
+FAILURE_THRESHOLD = 3
+
+DEFAULT_MAX_BACKOFF = timedelta(minutes=10)
+
+
+class CircuitBreaker:
+    """Stop polling a device which doesn't respond.
+
+    After ``threshold`` consecutive failures the breaker opens. The device
+    is then only probed, with an interval starting at ``interval`` and
+    doubled after every failed probe up to ``max_backoff``. The interval
+    is randomized by up to half, so a group of devices which went away
+    together doesn't get probed in lockstep. A successful probe half-opens
+    the breaker and the next successful poll closes it.
+    """
+
+    def __init__(
+        self, interval, threshold=FAILURE_THRESHOLD, max_backoff=DEFAULT_MAX_BACKOFF
+    ):
+        """Initialize the breaker."""
+        self.state = STATE_CLOSED
+        self.failures = 0
+        self._interval = interval
+        self._threshold = threshold
+        self._max_backoff = max(max_backoff, interval)
+        self._backoff = None
+
+    @property
+    def is_open(self):
+        """Return true if the device should only be probed."""
+        return self.state == STATE_OPEN
+
+    def failure(self):
+        """Count a failed poll or probe and return the delay of the next one.
+
+        Returns None while the breaker stays closed.
+        """
+        self.failures += 1
+        if self.state == STATE_CLOSED and self.failures < self._threshold:
+            return None
+
+        if self._backoff is None:
+            self._backoff = self._interval
+        else:
+            self._backoff = min(self._backoff * 2, self._max_backoff)
+
+        self.state = STATE_OPEN
+        return self._backoff / 2 + self._backoff / 2 * random.random()
+
+    def probe_succeeded(self):
+        """Let the next poll through."""
+        self.state = STATE_HALF_OPEN
+
+    def success(self):
+        """Close the breaker after a successful poll."""
+        self.state = STATE_CLOSED
+        self.failures = 0
+        self._backoff = None
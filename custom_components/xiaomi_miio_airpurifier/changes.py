@@ -0,0 +1,67 @@
+"""Skip state writes which wouldn't change anything."""
+
+from numbers import Number
+
+import voluptuous as vol
+
+import homeassistant.helpers.config_validation as cv
+
+THRESHOLDS_SCHEMA = vol.Schema(
+    {cv.string: vol.All(vol.Coerce(float), vol.Range(min=0))}
+)
+
+
+def _is_number(value):
+    return isinstance(value, Number) and not isinstance(value, bool)
+
+
+class StateChangeFilter:
+    """Compare the state of an entity with the state written last.
+
+    ``thresholds`` maps attribute names to the smallest change of their
+    numeric value which is considered significant. Smaller changes are
+    ignored until they add up to the threshold.
+    """
+
+    def __init__(self, thresholds=None):
+        """Initialize the filter."""
+        self._thresholds = thresholds or {}
+        self._written = None
+
+    def has_changed(self, available, state, attributes):
+        """Return true if the given state differs from the one written last."""
+        if self._written is None:
+            return True
+
+        written_available, written_state, written_attributes = self._written
+        if available != written_available or state != written_state:
+            return True
+
+        if attributes.keys() != written_attributes.keys():
+            return True
+
+        for key, value in attributes.items():
+            written = written_attributes[key]
+            if value == written:
+                continue
+
+            threshold = self._thresholds.get(key)
+            if (
+                threshold is not None
+                and _is_number(value)
+                and _is_number(written)
+                and abs(value - written) < threshold
+            ):
+                continue
+
+            return True
+
+        return False
+
+    def written(self, available, state, attributes):
+        """Remember the state which was written."""
+        self._written = (available, state, dict(attributes))
+
+    def reset(self):
+        """Forget the state written last, so the next one is written."""
+        self._written = None
@@ -1,14 +1,9 @@
 """Support for Xiaomi Mi Air Dehumidifier."""
 
-import asyncio
-from enum import Enum
-from functools import partial
 import logging
 
 from miio import (  # pylint: disable=import-error
     AirDehumidifier,
-    Device,
-    DeviceException,
 )
 from miio.airdehumidifier import (  # pylint: disable=import-error, import-error
     FanSpeed as AirdehumidifierFanSpeed,
@@ -16,7 +11,12 @@ from miio.airdehumidifier import (  # pylint: disable=import-error, import-error
 )
 import voluptuous as vol
 
-from homeassistant.components.climate import DOMAIN, PLATFORM_SCHEMA, ClimateEntity
+from homeassistant.components.climate import (
+    DOMAIN,
+    PLATFORM_SCHEMA,
+    SCAN_INTERVAL,
+    ClimateEntity,
+)
 from homeassistant.components.climate.const import (
     ATTR_CURRENT_HUMIDITY,
     ATTR_FAN_MODE,
@@ -37,15 +37,20 @@ from homeassistant.const import (
     CONF_TOKEN,
     UnitOfTemperature,
 )
-from homeassistant.exceptions import PlatformNotReady
 import homeassistant.helpers.config_validation as cv
 
+from .changes import THRESHOLDS_SCHEMA
+from .const import CONF_BACKGROUND_SETUP, CONF_MODEL, CONF_THRESHOLDS
+from .coordinator import COORDINATOR_SCHEMA
+from .entity import XiaomiMiioEntity, async_setup_device
+from .optimistic import IS_ON
+from .profiles import ModelProfile, find_profile
+from .services import async_register_services
+
 _LOGGER = logging.getLogger(__name__)
 
 DEFAULT_NAME = "Xiaomi Miio Device"
-DATA_KEY = "fan.xiaomi_miio_airpurifier"
 
-CONF_MODEL = "model"
 MODEL_AIRDEHUMIDIFIER_V1 = "nwt.derh.wdh318efw1"
 
 PLATFORM_SCHEMA = PLATFORM_SCHEMA.extend(
@@ -54,6 +59,9 @@ PLATFORM_SCHEMA = PLATFORM_SCHEMA.extend(
         vol.Required(CONF_TOKEN): vol.All(cv.string, vol.Length(min=32, max=32)),
         vol.Optional(CONF_NAME, default=DEFAULT_NAME): cv.string,
         vol.Optional(CONF_MODEL): vol.In([MODEL_AIRDEHUMIDIFIER_V1]),
+        vol.Optional(CONF_THRESHOLDS, default={}): THRESHOLDS_SCHEMA,
+        vol.Optional(CONF_BACKGROUND_SETUP, default=False): cv.boolean,
+        **COORDINATOR_SCHEMA,
     }
 )
 
@@ -93,8 +101,6 @@ AVAILABLE_ATTRIBUTES_AIRDEHUMIDIFIER = {
     ATTR_ALARM: "alarm",
 }
 
-SUCCESS = ["ok"]
-
 FEATURE_SET_BUZZER = 1
 FEATURE_SET_LED = 2
 FEATURE_SET_CHILD_LOCK = 4
@@ -119,183 +125,65 @@ AIRDEHUMIDIFIER_SERVICE_SCHEMA = vol.Schema(
 )
 
 SERVICE_TO_METHOD = {
-    SERVICE_SET_BUZZER_ON: {"method": "async_set_buzzer_on"},
-    SERVICE_SET_BUZZER_OFF: {"method": "async_set_buzzer_off"},
-    SERVICE_SET_LED_ON: {"method": "async_set_led_on"},
-    SERVICE_SET_LED_OFF: {"method": "async_set_led_off"},
-    SERVICE_SET_CHILD_LOCK_ON: {"method": "async_set_child_lock_on"},
-    SERVICE_SET_CHILD_LOCK_OFF: {"method": "async_set_child_lock_off"},
+    SERVICE_SET_BUZZER_ON: {
+        "method": "async_set_buzzer_on",
+        "feature": FEATURE_SET_BUZZER,
+    },
+    SERVICE_SET_BUZZER_OFF: {
+        "method": "async_set_buzzer_off",
+        "feature": FEATURE_SET_BUZZER,
+    },
+    SERVICE_SET_LED_ON: {
+        "method": "async_set_led_on",
+        "feature": FEATURE_SET_LED,
+    },
+    SERVICE_SET_LED_OFF: {
+        "method": "async_set_led_off",
+        "feature": FEATURE_SET_LED,
+    },
+    SERVICE_SET_CHILD_LOCK_ON: {
+        "method": "async_set_child_lock_on",
+        "feature": FEATURE_SET_CHILD_LOCK,
+    },
+    SERVICE_SET_CHILD_LOCK_OFF: {
+        "method": "async_set_child_lock_off",
+        "feature": FEATURE_SET_CHILD_LOCK,
+    },
 }
 
 
 async def async_setup_platform(hass, config, async_add_entities, discovery_info=None):
     """Set up the miio fan device from config."""
-    if DATA_KEY not in hass.data:
-        hass.data[DATA_KEY] = {}
-
-    host = config[CONF_HOST]
-    name = config[CONF_NAME]
-    token = config[CONF_TOKEN]
-    model = config.get(CONF_MODEL)
-
-    _LOGGER.info("Initializing with host %s (token %s...)", host, token[:5])
-    unique_id = None
-
-    if model is None:
-        miio_device = Device(host, token)
-        try:
-            device_info = miio_device.info()
-        except DeviceException:
-            raise PlatformNotReady
-
-        model = device_info.model
-        unique_id = "{}-{}".format(model, device_info.mac_address)
-        _LOGGER.info(
-            "%s %s %s detected",
-            model,
-            device_info.firmware_version,
-            device_info.hardware_version,
-        )
+    async_register_services(
+        hass, DOMAIN, SERVICE_TO_METHOD, AIRDEHUMIDIFIER_SERVICE_SCHEMA
+    )
 
-    if model.startswith("nwt.derh."):
-        air_dehumidifier = AirDehumidifier(host, token, model=model)
-        device = XiaomiAirDehumidifier(name, air_dehumidifier, model, unique_id)
-    else:
-        _LOGGER.error(
-            "Unsupported device found! Please create an issue at "
-            "https://github.com/rytilahti/python-miio/issues "
-            "and provide the following data: %s",
-            model,
-        )
-        return False
-
-    hass.data[DATA_KEY][host] = device
-    async_add_entities([device], update_before_add=True)
-
-    async def async_service_handler(service):
-        """Map services to methods on XiaomiAirDehumidifier."""
-        method = SERVICE_TO_METHOD.get(service.service)
-        params = {
-            key: value for key, value in service.data.items() if key != ATTR_ENTITY_ID
-        }
-        entity_ids = service.data.get(ATTR_ENTITY_ID)
-        if entity_ids:
-            devices = [
-                device
-                for device in hass.data[DATA_KEY].values()
-                if device.entity_id in entity_ids
-            ]
-        else:
-            devices = hass.data[DATA_KEY].values()
-
-        update_tasks = []
-        for device in devices:
-            if not hasattr(device, method["method"]):
-                continue
-            await getattr(device, method["method"])(**params)
-            update_tasks.append(asyncio.create_task(device.async_update_ha_state(True)))
-
-        if update_tasks:
-            await asyncio.wait(update_tasks)
-
-    for air_dehumidifier_service in SERVICE_TO_METHOD:
-        schema = SERVICE_TO_METHOD[air_dehumidifier_service].get(
-            "schema", AIRDEHUMIDIFIER_SERVICE_SCHEMA
-        )
-        hass.services.async_register(
-            DOMAIN, air_dehumidifier_service, async_service_handler, schema=schema
-        )
+    return await async_setup_device(
+        hass, config, async_add_entities, get_model_profile, SCAN_INTERVAL
+    )
 
 
-class XiaomiGenericDevice(ClimateEntity):
+class XiaomiGenericDevice(XiaomiMiioEntity, ClimateEntity):
     """Representation of a generic Xiaomi device."""
 
-    def __init__(self, name, device, model, unique_id):
+    def __init__(self, name, coordinator, model, unique_id, thresholds=None):
         """Initialize the generic Xiaomi device."""
-        self._name = name
-        self._device = device
-        self._model = model
-        self._unique_id = unique_id
-
-        self._available = False
-        self._state = None
-        self._state_attrs = {ATTR_MODEL: self._model}
-        self._device_features = FEATURE_SET_CHILD_LOCK
-        self._skip_update = False
-
-    @property
-    def should_poll(self):
-        """Poll the device."""
-        return True
-
-    @property
-    def unique_id(self):
-        """Return an unique ID."""
-        return self._unique_id
-
-    @property
-    def name(self):
-        """Return the name of the device if any."""
-        return self._name
-
-    @property
-    def available(self):
-        """Return true when state is known."""
-        return self._available
-
-    @property
-    def extra_state_attributes(self):
-        """Return the extra state attributes of the device."""
-        return self._state_attrs
-
-    @property
-    def is_on(self):
-        """Return true if device is on."""
-        return self._state
-
-    @staticmethod
-    def _extract_value_from_attribute(state, attribute):
-        value = getattr(state, attribute)
-        if isinstance(value, Enum):
-            return value.value
-
-        return value
-
-    async def _try_command(self, mask_error, func, *args, **kwargs):
-        """Call a miio device command handling error messages."""
-        try:
-            result = await self.hass.async_add_executor_job(
-                partial(func, *args, **kwargs)
-            )
-        except DeviceException as exc:
-            _LOGGER.error(mask_error, exc)
-            self._available = False
-            return False
-
-        _LOGGER.debug("Response received from miio device: %s", result)
-
-        return result == SUCCESS
+        super().__init__(
+            name, coordinator, model, unique_id, get_model_profile(model), thresholds
+        )
 
     async def async_turn_on(self):
         """Turn the device on."""
-        result = await self._try_command(
-            "Turning the miio device on failed.", self._device.on
+        await self._try_optimistic_command(
+            {IS_ON: True}, "Turning the miio device on failed.", self._device.on
         )
 
-        if result:
-            self._state = True
-            self._skip_update = True
-
     async def async_turn_off(self):
         """Turn the device off."""
-        result = await self._try_command(
-            "Turning the miio device off failed.", self._device.off
+        await self._try_optimistic_command(
+            {IS_ON: False}, "Turning the miio device off failed.", self._device.off
         )
 
-        if result:
-            self._state = False
-            self._skip_update = True
-
     async def async_set_buzzer_on(self):
         """Turn the buzzer on."""
         if self._device_features & FEATURE_SET_BUZZER == 0:
@@ -366,13 +254,10 @@ class XiaomiGenericDevice(ClimateEntity):
 class XiaomiAirDehumidifier(XiaomiGenericDevice):
     """Representation of a Xiaomi Air Dehumidifier."""
 
-    def __init__(self, name, device, model, unique_id):
+    def __init__(self, name, coordinator, model, unique_id, thresholds=None):
         """Initialize the plug switch."""
-        super().__init__(name, device, model, unique_id)
+        super().__init__(name, coordinator, model, unique_id, thresholds)
 
-        self._device_features = FEATURE_FLAGS_AIRDEHUMIDIFIER
-        self._available_attributes = AVAILABLE_ATTRIBUTES_AIRDEHUMIDIFIER
-        self._preset_modes_list = [mode.name for mode in AirdehumidifierOperationMode]
         self._fan_mode_list = [
             mode.name
             for mode in AirdehumidifierFanSpeed
@@ -380,10 +265,6 @@ class XiaomiAirDehumidifier(XiaomiGenericDevice):
             not in [AirdehumidifierFanSpeed.Sleep, AirdehumidifierFanSpeed.Strong]
         ]
 
-        self._state_attrs.update(
-            {attribute: None for attribute in self._available_attributes}
-        )
-
     @property
     def state_attributes(self):
         """Return the optional state attributes."""
@@ -424,30 +305,9 @@ class XiaomiAirDehumidifier(XiaomiGenericDevice):
             features |= ClimateEntityFeature.FAN_MODE
         return features
 
-    async def async_update(self):
-        """Fetch state from the device."""
-        # On state change the device doesn't provide the new state immediately.
-        if self._skip_update:
-            self._skip_update = False
-            return
-
-        try:
-            state = await self.hass.async_add_executor_job(self._device.status)
-        except DeviceException as ex:
-            self._available = False
-            _LOGGER.error("Got exception while fetching the state: %s", ex)
-            return
-
-        _LOGGER.debug("Got new state: %s", state)
-
-        self._available = True
-        self._state = state.is_on
-        self._state_attrs.update(
-            {
-                key: self._extract_value_from_attribute(state, value)
-                for key, value in self._available_attributes.items()
-            }
-        )
+    def _update_from_status(self, state):
+        """Update the entity from the status of the device."""
+        super()._update_from_status(state)
         self._state_attrs[ATTR_HUMIDITY] = self._state_attrs[ATTR_TARGET_HUMIDITY]
 
     @property
@@ -490,7 +350,7 @@ class XiaomiAirDehumidifier(XiaomiGenericDevice):
     @property
     def preset_modes(self):
         """Return a list of available preset modes."""
-        return self._preset_modes_list
+        return self._preset_modes
 
     @property
     def preset_mode(self):
@@ -544,3 +404,26 @@ class XiaomiAirDehumidifier(XiaomiGenericDevice):
                 self._device.set_fan_speed,
                 AirdehumidifierFanSpeed[fan_mode],
             )
+
+
+def get_model_profile(model):
+    """Return the profile of a model or None if it isn't supported."""
+    return find_profile(model, MODEL_PROFILES, MODEL_PREFIX_PROFILES)
+
+
+# The profiles refer to the entity classes, so they are defined last.
+MODEL_PROFILES = {}
+
+# Fallbacks for the models which aren't listed, checked in order.
+MODEL_PREFIX_PROFILES = [
+    (
+        "nwt.derh.",
+        ModelProfile(
+            AirDehumidifier,
+            XiaomiAirDehumidifier,
+            FEATURE_FLAGS_AIRDEHUMIDIFIER,
+            AVAILABLE_ATTRIBUTES_AIRDEHUMIDIFIER,
+            [mode.name for mode in AirdehumidifierOperationMode],
+        ),
+    ),
+]
@@ -0,0 +1,130 @@
+"""Serialized per-host queue of requests to a Xiaomi Miio device."""
+
+import asyncio
+import heapq
+import itertools
+import logging
+
+from .metrics import method_name
+
+_LOGGER = logging.getLogger(__name__)
+
+PRIORITY_COMMAND = 0
+PRIORITY_POLL = 1
+
+
+def _request_key(priority, func, args):
+    """Return the key of the requests which may be merged.
+
+    The python-miio commands share the name of their decorator, so the
+    driver method is looked up. Raw requests are told apart by the
+    command they send.
+    """
+    name = method_name(func)
+    if name == "send" and args:
+        return priority, name, args[0]
+
+    return priority, name
+
+
+class _Request:
+    """A queued call of a driver method and the callers waiting for it."""
+
+    __slots__ = ("key", "func", "args", "kwargs", "futures", "started")
+
+    def __init__(self, key, func, args, kwargs):
+        self.key = key
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.futures = []
+        self.started = False
+
+
+class CommandQueue:
+    """Send the requests to a device one at a time.
+
+    Commands are sent before pending polls. If a command is queued while
+    the latest pending command is of the same kind (the same driver
+    method), the pending command is updated with the new arguments
+    instead. All callers get the result of the command that was sent.
+    Pending polls are only shared if they are identical.
+    """
+
+    def __init__(self, hass, call, name):
+        """Initialize the queue."""
+        self._hass = hass
+        self._call = call
+        self._name = name
+        self._pending = []
+        self._sequence = itertools.count()
+        self._latest = {}
+        self._worker = None
+
+    @property
+    def size(self):
+        """Return the number of pending requests."""
+        return len(self._pending)
+
+    async def async_submit(self, priority, func, *args, **kwargs):
+        """Queue a call of the driver method and wait for its result."""
+        future = self._hass.loop.create_future()
+        key = _request_key(priority, func, args)
+
+        request = self._latest.get(priority)
+        if (
+            request is not None
+            and not request.started
+            and request.key == key
+            and (
+                priority == PRIORITY_COMMAND
+                or (request.args, request.kwargs) == (args, kwargs)
+            )
+        ):
+            _LOGGER.debug(
+                "%s: Replacing the pending %s%s by %s%s",
+                self._name,
+                key[1],
+                request.args,
+                key[1],
+                args,
+            )
+            request.func = func
+            request.args = args
+            request.kwargs = kwargs
+        else:
+            request = _Request(key, func, args, kwargs)
+            heapq.heappush(self._pending, (priority, next(self._sequence), request))
+            self._latest[priority] = request
+
+        request.futures.append(future)
+
+        if self._worker is None or self._worker.done():
+            self._worker = self._hass.async_create_task(
+                self._async_process(), f"{self._name} command queue"
+            )
+
+        return await future
+
+    async def _async_process(self):
+        """Send the pending requests in order."""
+        while self._pending:
+            priority, _, request = heapq.heappop(self._pending)
+            request.started = True
+            if self._latest.get(priority) is request:
+                del self._latest[priority]
+
+            try:
+                result = await self._call(request.func, *request.args, **request.kwargs)
+            except asyncio.CancelledError:
+                for future in request.futures:
+                    future.cancel()
+                raise
+            except Exception as ex:  # pylint: disable=broad-except
+                for future in request.futures:
+                    if not future.done():
+                        future.set_exception(ex)
+            else:
+                for future in request.futures:
+                    if not future.done():
+                        future.set_result(result)
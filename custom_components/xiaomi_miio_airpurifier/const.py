@@ -0,0 +1,63 @@
+"""Constants for the Xiaomi Miio integration."""
+
+DOMAIN = "xiaomi_miio_airpurifier"
+
+DATA_CONFIG = "xiaomi_miio_airpurifier.config"
+DATA_COORDINATORS = "xiaomi_miio_airpurifier.coordinators"
+DATA_DEVICE_INFO = "xiaomi_miio_airpurifier.device_info"
+DATA_EXECUTOR = "xiaomi_miio_airpurifier.executor"
+DATA_PUSH_SERVER = "xiaomi_miio_airpurifier.push_server"
+DATA_REGISTRY = "xiaomi_miio_airpurifier.registry"
+DATA_SCENES = "xiaomi_miio_airpurifier.scenes"
+
+SIGNAL_COORDINATOR_ADDED = "xiaomi_miio_airpurifier.coordinator_added"
+
+ATTR_CIRCUIT_BREAKER = "circuit_breaker"
+
+CONF_MODEL = "model"
+CONF_RETRIES = "retries"
+
+CONF_SERVICE_CONCURRENCY = "service_concurrency"
+CONF_IO_WORKERS = "io_workers"
+CONF_METRICS_SENSORS = "metrics_sensors"
+CONF_PUSH_ADDRESS = "push_address"
+
+DEFAULT_SERVICE_CONCURRENCY = 10
+DEFAULT_IO_WORKERS = 8
+DEFAULT_PUSH_ADDRESS = "0.0.0.0"  # nosec
+
+SERVICE_GET_METRICS = "get_metrics"
+
+CONF_TRANSPORT = "transport"
+
+TRANSPORT_EXECUTOR = "executor"
+TRANSPORT_ASYNCIO = "asyncio"
+TRANSPORTS = [TRANSPORT_EXECUTOR, TRANSPORT_ASYNCIO]
+
+CONF_POLL_MODE = "poll_mode"
+
+POLL_MODE_ALL = "all"
+POLL_MODE_EXPOSED = "exposed"
+POLL_MODES = [POLL_MODE_ALL, POLL_MODE_EXPOSED]
+
+CONF_ADAPTIVE_POLLING = "adaptive_polling"
+CONF_MIN_SCAN_INTERVAL = "min_scan_interval"
+CONF_MAX_SCAN_INTERVAL = "max_scan_interval"
+
+CONF_THRESHOLDS = "thresholds"
+
+CONF_BACKGROUND_SETUP = "background_setup"
+
+CONF_TIERED_POLLING = "tiered_polling"
+CONF_SLOW_POLL_CYCLES = "slow_poll_cycles"
+
+DEFAULT_SLOW_POLL_CYCLES = 10
+
+TIER_FAST = "fast"
+TIER_SLOW = "slow"
+TIER_STATIC = "static"
+
+CONF_PUSH_UPDATES = "push_updates"
+
+CONF_RECORD_TRACE = "record_trace"
+CONF_REPLAY_TRACE = "replay_trace"
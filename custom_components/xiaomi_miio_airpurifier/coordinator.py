@@ -0,0 +1,640 @@
+"""Shared per-host update coordinator for Xiaomi Miio devices."""
+
+import asyncio
+from copy import copy
+from datetime import timedelta
+import logging
+import math
+import time
+
+from miio import DeviceException, MiotDevice  # pylint: disable=import-error
+import voluptuous as vol
+
+from homeassistant.const import CONF_SCAN_INTERVAL, EVENT_HOMEASSISTANT_FINAL_WRITE
+from homeassistant.core import callback
+import homeassistant.helpers.config_validation as cv
+from homeassistant.helpers.dispatcher import async_dispatcher_send
+from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
+
+from .breaker import CircuitBreaker
+from .command_queue import PRIORITY_COMMAND, PRIORITY_POLL, CommandQueue
+from .const import (
+    CONF_ADAPTIVE_POLLING,
+    CONF_MAX_SCAN_INTERVAL,
+    CONF_MIN_SCAN_INTERVAL,
+    CONF_POLL_MODE,
+    CONF_PUSH_UPDATES,
+    CONF_RECORD_TRACE,
+    CONF_REPLAY_TRACE,
+    CONF_SLOW_POLL_CYCLES,
+    CONF_TIERED_POLLING,
+    CONF_TRANSPORT,
+    DATA_COORDINATORS,
+    DEFAULT_SLOW_POLL_CYCLES,
+    POLL_MODE_ALL,
+    POLL_MODE_EXPOSED,
+    POLL_MODES,
+    SIGNAL_COORDINATOR_ADDED,
+    TIER_FAST,
+    TIER_SLOW,
+    TIER_STATIC,
+    TRANSPORT_ASYNCIO,
+    TRANSPORT_EXECUTOR,
+    TRANSPORTS,
+)
+from .executor import async_get_executor
+from .metrics import DeviceMetrics, method_name
+from .polling import (
+    DEFAULT_MAX_SCAN_INTERVAL,
+    DEFAULT_MIN_SCAN_INTERVAL,
+    AdaptivePolling,
+)
+from .properties import GET_PROPERTIES, PropertyFilter, status_properties
+from .push import (
+    async_get_push_server,
+    async_get_scene_record,
+    scene_frame,
+    scene_id,
+)
+from .trace import TraceRecorder, TraceReplayProtocol
+from .transport import AsyncMiioTransport
+
+_LOGGER = logging.getLogger(__name__)
+
+DEFAULT_SCAN_INTERVAL = timedelta(seconds=30)
+
+# Longest wait for the removal of the scenes on shutdown.
+SHUTDOWN_TIMEOUT = timedelta(seconds=10)
+
+# Options shared by the platforms which are handled by the coordinator.
+COORDINATOR_SCHEMA = {
+    vol.Optional(CONF_TRANSPORT, default=TRANSPORT_EXECUTOR): vol.In(TRANSPORTS),
+    vol.Optional(CONF_POLL_MODE, default=POLL_MODE_ALL): vol.In(POLL_MODES),
+    vol.Optional(CONF_ADAPTIVE_POLLING, default=False): cv.boolean,
+    vol.Optional(
+        CONF_MIN_SCAN_INTERVAL, default=DEFAULT_MIN_SCAN_INTERVAL
+    ): cv.time_period,
+    vol.Optional(
+        CONF_MAX_SCAN_INTERVAL, default=DEFAULT_MAX_SCAN_INTERVAL
+    ): cv.time_period,
+    vol.Optional(CONF_TIERED_POLLING, default=False): cv.boolean,
+    vol.Optional(CONF_PUSH_UPDATES, default=False): cv.boolean,
+    vol.Optional(
+        CONF_SLOW_POLL_CYCLES, default=DEFAULT_SLOW_POLL_CYCLES
+    ): cv.positive_int,
+    vol.Exclusive(CONF_RECORD_TRACE, "trace"): cv.string,
+    vol.Exclusive(CONF_REPLAY_TRACE, "trace"): cv.string,
+}
+
+
+class XiaomiMiioCoordinator(DataUpdateCoordinator):
+    """Poll the status of a single miio device and share it between entities."""
+
+    def __init__(
+        self,
+        hass,
+        host,
+        device,
+        retries=0,
+        update_interval=DEFAULT_SCAN_INTERVAL,
+        transport=None,
+        poll_mode=POLL_MODE_ALL,
+        polling=None,
+        slow_poll_cycles=None,
+        push_interval=None,
+        model=None,
+    ):
+        """Initialize the coordinator."""
+        super().__init__(hass, _LOGGER, name=host, update_interval=update_interval)
+        self.host = host
+        self.device = device
+        self.transport = transport
+        self.polling = polling
+        self._retry = 0
+        self._retries = retries
+        self._interval = update_interval
+        self.breaker = CircuitBreaker(update_interval)
+        self._status_readers = []
+        self._poll_mode = poll_mode
+        self._slow_poll_cycles = slow_poll_cycles
+        self._tier_readers = {}
+        self._push_interval = push_interval
+        self._model = model
+        self._scenes = None
+        self._subscribing = None
+        self._unregister_push = None
+        self._pushed = set()
+        self._push_read = None
+        self.executor = async_get_executor(hass)
+        self.queue = CommandQueue(hass, self.async_call, host)
+        self.metrics = DeviceMetrics()
+
+        # pylint: disable=protected-access
+        self._property_filter = PropertyFilter(device._protocol)
+        device._protocol = self._property_filter
+
+    @callback
+    def async_add_status_reader(self, reader):
+        """Register a callable which builds entity state from a status object.
+
+        With ``poll_mode`` set to ``exposed`` the status requests are limited
+        to the properties the readers look at, traced against a complete
+        status.
+        """
+        self._status_readers.append(reader)
+        if self._poll_mode == POLL_MODE_EXPOSED:
+            # Trace the properties again on the next complete status.
+            self._property_filter.properties = None
+
+        @callback
+        def remove_status_reader():
+            self._status_readers.remove(reader)
+
+        return remove_status_reader
+
+    @property
+    def tiered_polling(self):
+        """Return true if the properties are polled in tiers."""
+        return self._slow_poll_cycles is not None
+
+    @callback
+    def async_set_tier_readers(self, readers):
+        """Register the readers of the values of every tier.
+
+        The properties read by the slow tier are only requested every
+        ``slow_poll_cycles`` polls and the ones read by the static tier only
+        once. The properties of the tiers are traced on the next poll.
+        """
+        self._tier_readers = readers
+        self._property_filter.tiers = {}
+
+        @callback
+        def remove_tier_readers():
+            if self._tier_readers is readers:
+                self._tier_readers = {}
+                self._property_filter.tiers = {}
+
+        return remove_tier_readers
+
+    @callback
+    def async_command_sent(self, refresh=True):
+        """Refresh the status after a command was sent to the device."""
+        # A command may change the slow values too.
+        self._property_filter.expire()
+        if self.polling is not None:
+            self.update_interval = self.polling.command_sent()
+
+        # Coordinator entities aren't polled by Home Assistant after a service call.
+        if refresh:
+            self.hass.async_create_task(self.async_request_refresh(), eager_start=False)
+
+    async def async_read_status(self, reader):
+        """Read the properties the reader looks at and return the new status.
+
+        Only these properties are requested. The others are taken from the
+        latest status. The complete status is fetched if the properties
+        can't be requested on their own.
+        """
+        properties = None
+        if self.data is not None:
+            properties = status_properties(self.data, [reader])
+
+        return await self._async_read_properties(properties)
+
+    async def async_read_info(self):
+        """Return the info of the device, requested after the queued polls."""
+        return await self.queue.async_submit(PRIORITY_POLL, self.device.info)
+
+    async def _async_read_properties(self, properties):
+        """Read the properties and return the new status."""
+        request = None
+        if self.data is not None:
+            request = self._property_filter.request(properties)
+
+        if request is None:
+            state = await self.queue.async_submit(PRIORITY_POLL, self.device.status)
+        else:
+            command, parameters = request
+            response = await self.queue.async_submit(
+                PRIORITY_POLL, self.device.send, command, parameters
+            )
+            values = self._property_filter.values(command, parameters, response)
+            if values is None:
+                state = await self.queue.async_submit(PRIORITY_POLL, self.device.status)
+            else:
+                _LOGGER.debug("Got new values: %s", values)
+                state = copy(self.data)
+                state.data = copy(self.data.data)
+                state.data.update(values)
+
+        self.async_set_updated_data(state)
+        return state
+
+    @callback
+    def _async_push_received(self, siid, piid):
+        """Read a property the device pushed a change of."""
+        name = (self._scenes or {}).get((siid, piid))
+        if name is None:
+            return
+
+        self._pushed.add(name)
+        if self._push_read is None or self._push_read.done():
+            self._push_read = self.hass.async_create_task(
+                self._async_read_pushed(), eager_start=False
+            )
+
+    async def _async_read_pushed(self):
+        """Read the pushed properties, including the ones pushed meanwhile."""
+        while self._pushed:
+            properties = frozenset(self._pushed)
+            self._pushed.clear()
+            try:
+                await self._async_read_properties(properties)
+            except DeviceException as ex:
+                _LOGGER.debug(
+                    "Unable to read the pushed properties of %s: %s", self.host, ex
+                )
+
+    async def _async_device_id(self):
+        """Return the id of the device, which is known after the first status."""
+        if self.transport is not None:
+            return self.transport.device_id
+
+        return await self.executor.async_run(lambda: self.device.device_id)
+
+    async def _async_subscribe(self, state):
+        """Install the scenes pushing the changes of the properties read.
+
+        A pushed property is read right away, so the device is only polled
+        every ``push_interval`` while the scenes are installed, unless
+        ``polling`` picks the interval.
+        """
+        properties = status_properties(state, self._status_readers)
+        # The tiered properties are polled rarely on purpose.
+        request = self._property_filter.request(
+            properties - self._property_filter.tiers.keys()
+        )
+        if request is None or request[0] != GET_PROPERTIES:
+            _LOGGER.warning("%s can't push its changes, polling it instead", self.host)
+            self._scenes = {}
+            return
+
+        try:
+            server = await async_get_push_server(self.hass)
+            server_ip = await self.hass.async_add_executor_job(
+                server.server_ip, self.host
+            )
+        except OSError as ex:
+            _LOGGER.warning(
+                "Unable to receive the changes of %s, polling it instead: %s",
+                self.host,
+                ex,
+            )
+            self._scenes = {}
+            return
+
+        try:
+            device_id = await self._async_device_id()
+        except DeviceException as ex:
+            # Tried again after the next poll.
+            _LOGGER.debug("Unable to get the id of %s: %s", self.host, ex)
+            return
+
+        if self._unregister_push is not None:
+            self._unregister_push()
+        self._unregister_push = server.async_register(
+            self.host, self.device.token, self._async_push_received
+        )
+
+        record = async_get_scene_record(self.hass)
+        left_over = await record.async_get(self.host)
+        installing = {
+            scene_id(parameter["siid"], parameter["piid"]) for parameter in request[1]
+        }
+        await record.async_add(self.host, installing)
+
+        scenes = {}
+        for parameter in request[1]:
+            frame = scene_frame(
+                parameter, device_id, self._model, self.device.token, server_ip
+            )
+            result = "command of the scene too long"
+            try:
+                if frame is not None:
+                    result = await self.queue.async_submit(
+                        PRIORITY_COMMAND, self.device.send, "send_data_frame", frame
+                    )
+            except DeviceException as ex:
+                result = ex
+
+            if result != ["ok"]:
+                _LOGGER.warning(
+                    "%s doesn't accept the scene pushing %s, polling it instead: %s",
+                    self.host,
+                    parameter["did"],
+                    result,
+                )
+                await self._async_remove_scenes(left_over | installing)
+                self._scenes = {}
+                return
+
+            scenes[parameter["siid"], parameter["piid"]] = parameter["did"]
+
+        self._scenes = scenes
+        await self._async_remove_scenes(left_over - installing)
+        if self.polling is None:
+            self.update_interval = self._push_interval
+        _LOGGER.info(
+            "%s pushes the changes of %s, polling it every %s",
+            self.host,
+            sorted(scenes.values()),
+            self.update_interval,
+        )
+
+    async def _async_remove_scenes(self, ids):
+        """Remove the scenes from the device and from the record."""
+        if not ids:
+            return
+
+        try:
+            await self.queue.async_submit(
+                PRIORITY_COMMAND, self.device.send, "miIO.xdel", sorted(ids)
+            )
+        except DeviceException as ex:
+            _LOGGER.debug("Unable to remove the scenes from %s: %s", self.host, ex)
+            return
+
+        await async_get_scene_record(self.hass).async_discard(self.host, ids)
+
+    async def _async_remove_left_over_scenes(self):
+        """Remove the scenes installed while the push updates were on."""
+        ids = await async_get_scene_record(self.hass).async_get(self.host)
+        if ids:
+            _LOGGER.info("Removing the scenes left on %s", self.host)
+            await self._async_remove_scenes(ids)
+
+    async def async_shutdown(self):
+        """Stop the polls, remove the scenes and close the transport.
+
+        A device which doesn't respond keeps its scenes until the next start.
+        """
+        if self.hass.is_stopping:
+            # The stop listener of async_register_shutdown is gone once it fired.
+            self._unsub_shutdown = None
+        await super().async_shutdown()
+        if self._unregister_push is not None:
+            self._unregister_push()
+            self._unregister_push = None
+
+        if self._scenes and not self.breaker.is_open:
+            try:
+                async with asyncio.timeout(SHUTDOWN_TIMEOUT.total_seconds()):
+                    await self._async_remove_scenes(
+                        {scene_id(siid, piid) for siid, piid in self._scenes}
+                    )
+            except TimeoutError:
+                _LOGGER.debug("Removing the scenes from %s timed out", self.host)
+            self._scenes = None
+
+        if self.transport is not None:
+            await self.transport.async_close()
+
+    async def async_send_command(self, func, *args, **kwargs):
+        """Queue a command for the miio device and return its result.
+
+        Only one request is sent to the device at a time and the commands
+        don't wait behind the queued polls.
+        """
+        return await self.queue.async_submit(PRIORITY_COMMAND, func, *args, **kwargs)
+
+    async def async_call(self, func, *args, **kwargs):
+        """Call a method of the miio device right away.
+
+        The call runs on the worker pool, or on the event loop with a
+        ``transport``. Its latency and outcome are recorded in ``metrics``.
+        """
+        start = time.monotonic()
+        try:
+            if self.transport is not None:
+                result = await self.transport.async_call(func, *args, **kwargs)
+            else:
+                result = await self.executor.async_run(func, *args, **kwargs)
+        except DeviceException as ex:
+            self.metrics.record(method_name(func), time.monotonic() - start, ex)
+            raise
+
+        self.metrics.record(method_name(func), time.monotonic() - start)
+        return result
+
+    async def _async_probe(self):
+        """Check if the device responds to a handshake.
+
+        While the circuit breaker is open the device is only probed, backing
+        off exponentially, until it responds again.
+        """
+        if self.transport is not None:
+            await self.transport.async_send_handshake(retry_count=0)
+            return
+
+        # pylint: disable=protected-access
+        await self.executor.async_run(
+            self.device._protocol.send_handshake, retry_count=0
+        )
+
+    async def _async_update_data(self):
+        """Fetch the status from the device."""
+        try:
+            if self.breaker.is_open:
+                await self._async_probe()
+                _LOGGER.info("%s responds again, resuming the polls", self.host)
+                self.breaker.probe_succeeded()
+                # The scenes may be gone, if the device was restarted.
+                self._scenes = None
+
+            self._property_filter.start_poll()
+            state = await self.queue.async_submit(PRIORITY_POLL, self.device.status)
+        except DeviceException as ex:
+            # A probe stands in for the polls skipped since the last one.
+            self._retry = self._retry + max(
+                1, round(self.update_interval / self._interval)
+            )
+            was_open = self.breaker.is_open
+            delay = self.breaker.failure()
+            if delay is not None:
+                if not was_open:
+                    _LOGGER.info(
+                        "%s doesn't respond, probing it with backoff", self.host
+                    )
+                self.update_interval = delay
+            elif self.polling is not None:
+                self.update_interval = self.polling.status_failed()
+
+            if self._retry < self._retries:
+                self.metrics.retries += 1
+                _LOGGER.info(
+                    "Got exception while fetching the state: %s , _retry=%s",
+                    ex,
+                    self._retry,
+                )
+                return self.data
+
+            raise UpdateFailed(
+                f"Got exception while fetching the state: {ex} , _retry={self._retry}"
+            ) from ex
+
+        _LOGGER.debug("Got new state: %s", state)
+        self._retry = 0
+        self.breaker.success()
+        if self.polling is None:
+            self.update_interval = (
+                self._push_interval if self._scenes else self._interval
+            )
+
+        if (
+            self._poll_mode == POLL_MODE_EXPOSED
+            and self._property_filter.properties is None
+            and self._status_readers
+        ):
+            self._property_filter.properties = status_properties(
+                state, self._status_readers
+            )
+            _LOGGER.debug(
+                "Limiting status requests to %s",
+                sorted(self._property_filter.properties),
+            )
+
+        if self._tier_readers and not self._property_filter.tiers:
+            self._property_filter.tiers = self._trace_tiers(state)
+            _LOGGER.debug(
+                "Polling the properties in tiers: %s", self._property_filter.tiers
+            )
+
+        if self._push_interval is None:
+            if self._subscribing is None:
+                self._subscribing = self.hass.async_create_task(
+                    self._async_remove_left_over_scenes(), eager_start=False
+                )
+        elif (
+            self._scenes is None
+            and self._status_readers
+            and (self._subscribing is None or self._subscribing.done())
+        ):
+            self._subscribing = self.hass.async_create_task(
+                self._async_subscribe(state), eager_start=False
+            )
+
+        if self.polling is not None:
+            self.update_interval = self.polling.status_received(state)
+
+        return state
+
+    def _trace_tiers(self, state):
+        """Return the number of polls between the requests of the properties.
+
+        A property read by more than one tier is requested as often as the
+        fastest of them asks for. All other properties are requested on
+        every poll.
+        """
+        traced = {
+            tier: status_properties(state, [reader])
+            for tier, reader in self._tier_readers.items()
+        }
+        fast = traced.get(TIER_FAST, frozenset())
+        slow = traced.get(TIER_SLOW, frozenset()) - fast
+        static = traced.get(TIER_STATIC, frozenset()) - fast - slow
+        return {
+            **{name: self._slow_poll_cycles for name in slow},
+            **{name: math.inf for name in static},
+        }
+
+
+@callback
+def _async_setup_trace(hass, host, device, config, model):
+    """Record the responses of the device or replay them from a trace."""
+    # pylint: disable=protected-access
+    if CONF_REPLAY_TRACE in config:
+        device._protocol = TraceReplayProtocol(config[CONF_REPLAY_TRACE])
+        return
+
+    if CONF_RECORD_TRACE not in config:
+        return
+
+    if config[CONF_TRANSPORT] == TRANSPORT_ASYNCIO:
+        _LOGGER.warning(
+            "%s can't be recorded with the asyncio transport, "
+            "use the executor transport instead",
+            host,
+        )
+        return
+
+    recorder = device._protocol = TraceRecorder(
+        device._protocol, config[CONF_RECORD_TRACE], model
+    )
+
+    async def async_close_recorder(event):
+        """Close the trace once the coordinators are shut down."""
+        await hass.async_add_executor_job(recorder.close)
+
+    hass.bus.async_listen_once(EVENT_HOMEASSISTANT_FINAL_WRITE, async_close_recorder)
+
+
+async def async_get_coordinator(
+    hass,
+    host,
+    device,
+    config,
+    retries=0,
+    scan_interval=DEFAULT_SCAN_INTERVAL,
+    model=None,
+):
+    """Return the coordinator of a host and create it on first use.
+
+    The entities of a host share its coordinator, so more entities don't
+    cause more requests to the device.
+    """
+    coordinators = hass.data.setdefault(DATA_COORDINATORS, {})
+    if host in coordinators:
+        return coordinators[host]
+
+    update_interval = config.get(CONF_SCAN_INTERVAL, scan_interval)
+
+    _async_setup_trace(hass, host, device, config, model)
+
+    transport = None
+    # A replayed device is answered by the trace, not over the network.
+    if config[CONF_TRANSPORT] == TRANSPORT_ASYNCIO and CONF_REPLAY_TRACE not in config:
+        transport = AsyncMiioTransport.from_device(device)
+
+    push_interval = None
+    if config[CONF_PUSH_UPDATES] and CONF_REPLAY_TRACE not in config:
+        if isinstance(device, MiotDevice):
+            push_interval = config[CONF_MAX_SCAN_INTERVAL]
+        else:
+            _LOGGER.warning("%s can't push its changes, polling it instead", host)
+
+    polling = None
+    if config[CONF_ADAPTIVE_POLLING]:
+        polling = AdaptivePolling(
+            update_interval,
+            config[CONF_MIN_SCAN_INTERVAL],
+            config[CONF_MAX_SCAN_INTERVAL],
+        )
+
+    coordinator = coordinators[host] = XiaomiMiioCoordinator(
+        hass,
+        host,
+        device,
+        retries,
+        update_interval,
+        transport,
+        config[CONF_POLL_MODE],
+        polling,
+        config[CONF_SLOW_POLL_CYCLES] if config[CONF_TIERED_POLLING] else None,
+        push_interval,
+        model,
+    )
+
+    await coordinator.async_register_shutdown()
+    async_dispatcher_send(hass, SIGNAL_COORDINATOR_ADDED, coordinator)
+
+    return coordinator
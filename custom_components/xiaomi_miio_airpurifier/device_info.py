@@ -0,0 +1,136 @@
+"""Persistent cache of the info reported by Xiaomi Miio devices."""
+
+import asyncio
+import hashlib
+import logging
+
+from miio import Device, DeviceException  # pylint: disable=import-error
+
+from homeassistant.core import callback
+from homeassistant.helpers.storage import Store
+
+from .const import DATA_DEVICE_INFO, DOMAIN
+from .executor import async_get_executor
+
+_LOGGER = logging.getLogger(__name__)
+
+STORAGE_KEY = f"{DOMAIN}.device_info"
+STORAGE_VERSION = 1
+SAVE_DELAY = 10
+
+# Delays between the attempts to reach a device which isn't cached.
+RETRY_DELAY = 30
+MAX_RETRY_DELAY = 600
+
+
+def _cache_key(host, token):
+    """Return the key of a device, which doesn't reveal its token."""
+    return f"{host}-{hashlib.sha256(token.encode()).hexdigest()}"
+
+
+class DeviceInfoCache:
+    """Remember the model, MAC address and versions of the devices.
+
+    A device is only asked for its info on the first start. Later on the
+    cached info is returned right away and refreshed once the device is
+    polled, so the setup doesn't depend on the device being reachable.
+    """
+
+    def __init__(self, hass):
+        """Initialize the cache."""
+        self._hass = hass
+        self._store = Store(hass, STORAGE_VERSION, STORAGE_KEY)
+        self._lock = asyncio.Lock()
+        self._data = None
+        self._fetched = set()
+
+    async def async_get(self, host, token):
+        """Return the info of a device.
+
+        Raises DeviceException if the device isn't cached and can't be
+        reached.
+        """
+        async with self._lock:
+            if self._data is None:
+                self._data = await self._store.async_load() or {}
+
+        key = _cache_key(host, token)
+        info = self._data.get(key)
+        if info is None:
+            device_info = await async_get_executor(self._hass).async_run(
+                Device(host, token).info
+            )
+            return self._async_store(key, device_info)
+
+        return info
+
+    @callback
+    def async_get_cached(self, host, token):
+        """Return the cached info of a device or None."""
+        if self._data is None:
+            return None
+
+        return self._data.get(_cache_key(host, token))
+
+    async def async_refresh(self, host, token, coordinator):
+        """Update the cached info of a device, unless it was fetched already.
+
+        The request is queued by the coordinator of the device, so it
+        waits for the polls instead of racing them on a socket of its own.
+        """
+        key = _cache_key(host, token)
+        if key in self._fetched:
+            return
+
+        try:
+            device_info = await coordinator.async_read_info()
+        except DeviceException as ex:
+            _LOGGER.debug("Unable to refresh the info of %s: %s", host, ex)
+            return
+
+        self._async_store(key, device_info)
+
+    @callback
+    def _async_store(self, key, device_info):
+        """Cache the info reported by a device and return it."""
+        self._fetched.add(key)
+        info = {
+            "model": device_info.model,
+            "mac_address": device_info.mac_address,
+            "firmware_version": device_info.firmware_version,
+            "hardware_version": device_info.hardware_version,
+        }
+
+        if self._data.get(key) != info:
+            self._data[key] = info
+            self._store.async_delay_save(lambda: self._data, SAVE_DELAY)
+
+        return info
+
+
+@callback
+def async_get_device_info_cache(hass):
+    """Return the device info cache and create it on first use."""
+    if DATA_DEVICE_INFO not in hass.data:
+        hass.data[DATA_DEVICE_INFO] = DeviceInfoCache(hass)
+
+    return hass.data[DATA_DEVICE_INFO]
+
+
+async def async_wait_for_device_info(hass, host, token):
+    """Return the info of a device, retrying until the device responds."""
+    cache = async_get_device_info_cache(hass)
+    delay = RETRY_DELAY
+    while True:
+        try:
+            return await cache.async_get(host, token)
+        except DeviceException as ex:
+            _LOGGER.debug(
+                "Unable to detect the model of %s, retrying in %s seconds: %s",
+                host,
+                delay,
+                ex,
+            )
+
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, MAX_RETRY_DELAY)
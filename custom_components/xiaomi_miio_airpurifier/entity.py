@@ -0,0 +1,370 @@
+"""Base of the entities of the Xiaomi Miio devices."""
+
+from functools import partial
+import logging
+
+from miio import DeviceException  # pylint: disable=import-error
+
+from homeassistant.const import CONF_HOST, CONF_NAME, CONF_TOKEN
+from homeassistant.core import callback
+from homeassistant.exceptions import PlatformNotReady
+from homeassistant.helpers.event import async_call_later
+from homeassistant.helpers.update_coordinator import CoordinatorEntity
+
+from .attributes import StateAttributes, get_schema
+from .changes import StateChangeFilter
+from .const import (
+    ATTR_CIRCUIT_BREAKER,
+    CONF_BACKGROUND_SETUP,
+    CONF_MODEL,
+    CONF_RETRIES,
+    CONF_THRESHOLDS,
+    DOMAIN,
+)
+from .coordinator import async_get_coordinator
+from .device_info import async_get_device_info_cache, async_wait_for_device_info
+from .optimistic import CONFIRM_ATTEMPTS, CONFIRM_DELAY, IS_ON, OptimisticState
+from .registry import async_get_registry
+from .services import report_command_error
+
+_LOGGER = logging.getLogger(__name__)
+
+ATTR_MODEL = "model"
+
+SUCCESS = ["ok"]
+
+
+async def async_setup_device(
+    hass, config, async_add_entities, get_model_profile, scan_interval
+):
+    """Set up the device of a platform config.
+
+    With ``background_setup`` the device is set up in a background task.
+    """
+    host = config[CONF_HOST]
+    token = config[CONF_TOKEN]
+
+    _LOGGER.info("Initializing with host %s (token %s...)", host, token[:5])
+
+    setup = partial(
+        _async_setup_device,
+        hass,
+        config,
+        async_add_entities,
+        get_model_profile,
+        scan_interval,
+    )
+    if config[CONF_BACKGROUND_SETUP]:
+        hass.async_create_background_task(
+            setup(background=True), f"{DOMAIN} {host} setup"
+        )
+        return None
+
+    return await setup()
+
+
+async def _async_setup_device(
+    hass, config, async_add_entities, get_model_profile, scan_interval, background=False
+):
+    """Detect the model of the device and add its entity.
+
+    In the background the detection is retried until the device responds,
+    and the entity is added before its first status is fetched. The cached
+    info of a detected device is refreshed after the first poll.
+    """
+    host = config[CONF_HOST]
+    token = config[CONF_TOKEN]
+    name = config[CONF_NAME]
+    model = config.get(CONF_MODEL)
+    retries = config.get(CONF_RETRIES, 0)
+
+    unique_id = None
+    device_info = None
+
+    if model is None:
+        try:
+            if background:
+                device_info = await async_wait_for_device_info(hass, host, token)
+            else:
+                device_info = await async_get_device_info_cache(hass).async_get(
+                    host, token
+                )
+            model = device_info["model"]
+            unique_id = f"{model}-{device_info['mac_address']}"
+            _LOGGER.info(
+                "%s %s %s detected",
+                model,
+                device_info["firmware_version"],
+                device_info["hardware_version"],
+            )
+        except DeviceException as ex:
+            raise PlatformNotReady from ex
+
+    profile = get_model_profile(model)
+    if profile is None:
+        _LOGGER.error(
+            "Unsupported device found! Please create an issue at "
+            "https://github.com/syssi/xiaomi_airpurifier/issues "
+            "and provide the following data: %s",
+            model,
+        )
+        return False
+
+    miio_device = profile.create_driver(host, token, model)
+    if profile.retries is not None:
+        retries = profile.retries
+
+    coordinator = await async_get_coordinator(
+        hass, host, miio_device, config, retries, scan_interval, model
+    )
+    device = profile.entity_class(
+        name, coordinator, model, unique_id, config[CONF_THRESHOLDS]
+    )
+
+    if background:
+        # The entity is unavailable until the first status is received.
+        async_add_entities([device])
+        await coordinator.async_refresh()
+    else:
+        await coordinator.async_refresh()
+        async_add_entities([device])
+
+    if device_info is not None:
+        hass.async_create_background_task(
+            async_get_device_info_cache(hass).async_refresh(host, token, coordinator),
+            f"{DOMAIN} {host} device info",
+        )
+
+
+class XiaomiMiioEntity(CoordinatorEntity):
+    """Entity of a Xiaomi Miio device updated by the coordinator of its host.
+
+    The values expected after a command are shown right away and read back
+    from the device a moment later. They are rolled back if the command
+    fails or the device keeps reporting other values.
+    """
+
+    def __init__(self, name, coordinator, model, unique_id, profile, thresholds):
+        """Initialize the entity of a device of the model profile."""
+        super().__init__(coordinator)
+        self._name = name
+        self._device = coordinator.device
+        self._model = model
+        self._unique_id = unique_id
+        self._changes = StateChangeFilter(thresholds)
+
+        self._available = False
+        self._state = None
+        self._device_features = profile.features
+        self._available_attributes = profile.attributes
+        self._extract_attributes = profile.extract_attributes
+        self._preset_modes = profile.preset_modes
+        self._state_attrs = StateAttributes(
+            get_schema((ATTR_MODEL, *self._available_attributes, ATTR_CIRCUIT_BREAKER)),
+            {ATTR_MODEL: self._model},
+        )
+        self._state_attrs.update(
+            {attribute: None for attribute in self._available_attributes}
+        )
+        self._optimistic = OptimisticState()
+        self._cancel_confirm = None
+
+    @property
+    def device_features(self):
+        """Return the feature flags of the device."""
+        return self._device_features
+
+    @property
+    def unique_id(self):
+        """Return an unique ID."""
+        return self._unique_id
+
+    @property
+    def name(self):
+        """Return the name of the device if any."""
+        return self._name
+
+    @property
+    def available(self):
+        """Return true when state is known."""
+        return self._available
+
+    @property
+    def extra_state_attributes(self):
+        """Return the extra state attributes of the device."""
+        return self._state_attrs.as_dict()
+
+    @property
+    def is_on(self):
+        """Return true if device is on."""
+        return self._state
+
+    async def async_added_to_hass(self):
+        """Register the entity and apply the status fetched during setup."""
+        await super().async_added_to_hass()
+        self.async_on_remove(
+            self.coordinator.async_add_status_reader(self._update_from_status)
+        )
+
+        self.async_on_remove(self._async_cancel_confirm)
+
+        registry = async_get_registry(self.hass)
+        registry.async_add(self, self.coordinator.host)
+        self.async_on_remove(lambda: registry.async_remove(self, self.coordinator.host))
+
+        self._state_attrs[ATTR_CIRCUIT_BREAKER] = self.coordinator.breaker.state
+        if self.coordinator.last_update_success and self.coordinator.data is not None:
+            self._available = True
+            self._update_from_status(self.coordinator.data)
+            self._apply_values(self._optimistic.expected)
+
+    @callback
+    def _handle_coordinator_update(self):
+        """Handle updated data from the coordinator."""
+        self._state_attrs[ATTR_CIRCUIT_BREAKER] = self.coordinator.breaker.state
+        if not self.coordinator.last_update_success:
+            self._available = False
+        elif self.coordinator.data is not None:
+            self._available = True
+            self._update_from_status(self.coordinator.data)
+            # On state change the device doesn't provide the new state immediately.
+            self._apply_values(self._optimistic.expected)
+
+        attributes = {**(self.state_attributes or {}), **self.extra_state_attributes}
+        if self._changes.has_changed(self.available, self.state, attributes):
+            self.async_write_ha_state()
+
+    @callback
+    def async_write_ha_state(self):
+        """Write the state and remember it for the change detection."""
+        super().async_write_ha_state()
+        attributes = {**(self.state_attributes or {}), **self.extra_state_attributes}
+        self._changes.written(self.available, self.state, attributes)
+
+    def _current_values(self, keys):
+        """Return the values shown for the keys."""
+        return {
+            key: self._state if key == IS_ON else self._state_attrs.get(key)
+            for key in keys
+        }
+
+    def _apply_values(self, values):
+        """Show the values on the entity."""
+        for key, value in values.items():
+            if key == IS_ON:
+                self._state = value
+            else:
+                self._state_attrs[key] = value
+
+    def _read_values(self, keys, state):
+        """Return the values of the keys from a status of the device."""
+        values = self._extract_attributes.subset(keys)(state)
+        if IS_ON in keys:
+            values[IS_ON] = state.is_on
+
+        return values
+
+    @callback
+    def _async_expect(self, values):
+        """Show the values expected after a command right away."""
+        self._optimistic.expect(values, self._current_values(values))
+        self._apply_values(values)
+        self.async_write_ha_state()
+
+    @callback
+    def _async_schedule_confirm(self, attempt=1):
+        """Read the expected values back from the device after a moment."""
+        self._async_cancel_confirm()
+        self._cancel_confirm = async_call_later(
+            self.hass, CONFIRM_DELAY, partial(self._async_confirm, attempt)
+        )
+
+    @callback
+    def _async_cancel_confirm(self):
+        """Cancel the scheduled read of the expected values."""
+        if self._cancel_confirm is not None:
+            self._cancel_confirm()
+            self._cancel_confirm = None
+
+    async def _async_confirm(self, attempt, _now=None):
+        """Keep the expected values if the device reports them, else roll back."""
+        self._cancel_confirm = None
+        expected = dict(self._optimistic.expected)
+        if not expected:
+            return
+
+        mismatches = None
+        try:
+            state = await self.coordinator.async_read_status(
+                partial(self._read_values, expected)
+            )
+        except DeviceException as ex:
+            _LOGGER.debug("Reading the expected values %s failed: %s", expected, ex)
+        else:
+            mismatches = {
+                key: value
+                for key, value in self._read_values(expected, state).items()
+                if value != expected[key]
+            }
+
+        if mismatches != {} and attempt < CONFIRM_ATTEMPTS:
+            self._async_schedule_confirm(attempt + 1)
+            return
+
+        if mismatches:
+            _LOGGER.debug(
+                "%s reports %s instead of the expected values, rolling back",
+                self.entity_id,
+                mismatches,
+            )
+
+        self._optimistic.settle(expected)
+        self._handle_coordinator_update()
+
+    def _update_from_status(self, state):
+        """Update the entity from the status of the device."""
+        self._state = state.is_on
+        self._state_attrs.update(self._extract_attributes(state))
+
+    async def _try_command(self, mask_error, func, *args, **kwargs):
+        """Call a miio device command handling error messages."""
+        try:
+            result = await self.coordinator.async_send_command(func, *args, **kwargs)
+        except DeviceException as exc:
+            self._command_failed(mask_error, exc)
+            return False
+        finally:
+            self.coordinator.async_command_sent()
+
+        _LOGGER.debug("Response received from miio device: %s", result)
+
+        return result == SUCCESS
+
+    async def _try_optimistic_command(self, values, mask_error, func, *args, **kwargs):
+        """Show the expected values and call a miio device command.
+
+        The values are rolled back if the command fails. Otherwise they are
+        read back from the device a moment later instead of fetching the
+        complete status.
+        """
+        self._async_expect(values)
+        try:
+            result = await self.coordinator.async_send_command(func, *args, **kwargs)
+        except DeviceException as exc:
+            self._command_failed(mask_error, exc)
+            self._apply_values(self._optimistic.roll_back(values))
+            self.async_write_ha_state()
+            return False
+        finally:
+            self.coordinator.async_command_sent(refresh=False)
+
+        _LOGGER.debug("Response received from miio device: %s", result)
+
+        self._async_schedule_confirm()
+        return result == SUCCESS
+
+    def _command_failed(self, mask_error, exc):
+        """Log a failed command and mark the device unavailable."""
+        _LOGGER.error(mask_error, exc)
+        report_command_error(exc)
+        self._available = False
@@ -0,0 +1,96 @@
+"""Worker threads for the blocking requests to Xiaomi Miio devices."""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+import logging
+import threading
+
+from homeassistant.const import EVENT_HOMEASSISTANT_CLOSE
+from homeassistant.core import callback
+
+from .const import CONF_IO_WORKERS, DATA_CONFIG, DATA_EXECUTOR, DEFAULT_IO_WORKERS
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class MiioExecutor:
+    """Bounded pool of threads owned by the integration.
+
+    The python-miio drivers block until a device responds or times out.
+    Running them on a pool of their own keeps unreachable devices from
+    using up the threads of the Home Assistant executor. The pool counts
+    the requests waiting for a thread, so a backlog is visible.
+
+    A process pool isn't an option. The drivers keep protocol state like
+    the device id, timestamp and message id between requests.
+    """
+
+    def __init__(self, max_workers):
+        """Initialize the pool."""
+        self.max_workers = max_workers
+        self.queue_depth = 0
+        self.max_queue_depth = 0
+        self.active = 0
+        self.completed = 0
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(
+            max_workers, thread_name_prefix="xiaomi_miio_airpurifier"
+        )
+
+    async def async_run(self, func, *args, **kwargs):
+        """Run the blocking function on a worker thread and return its result."""
+        with self._lock:
+            self.queue_depth += 1
+            if self.queue_depth > self.max_queue_depth:
+                self.max_queue_depth = self.queue_depth
+                _LOGGER.debug(
+                    "Up to %s requests are waiting for a worker", self.queue_depth
+                )
+
+        future = self._executor.submit(partial(self._run, func, *args, **kwargs))
+        future.add_done_callback(self._done)
+        return await asyncio.wrap_future(future)
+
+    def _run(self, func, *args, **kwargs):
+        """Run the function and keep count of the requests."""
+        with self._lock:
+            self.queue_depth -= 1
+            self.active += 1
+        try:
+            return func(*args, **kwargs)
+        finally:
+            with self._lock:
+                self.active -= 1
+                self.completed += 1
+
+    def _done(self, future):
+        """Stop counting a request which was cancelled before it started."""
+        if future.cancelled():
+            with self._lock:
+                self.queue_depth -= 1
+
+    def shutdown(self):
+        """Stop the workers once the running requests are done."""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+@callback
+def async_get_executor(hass):
+    """Return the worker pool and create it on first use."""
+    if DATA_EXECUTOR in hass.data:
+        return hass.data[DATA_EXECUTOR]
+
+    max_workers = hass.data.get(DATA_CONFIG, {}).get(
+        CONF_IO_WORKERS, DEFAULT_IO_WORKERS
+    )
+    executor = hass.data[DATA_EXECUTOR] = MiioExecutor(max_workers)
+
+    @callback
+    def async_shutdown(event):
+        """Stop the workers once the coordinators are shut down."""
+        executor.shutdown()
+
+    hass.bus.async_listen_once(EVENT_HOMEASSISTANT_CLOSE, async_shutdown)
+
+    return executor
@@ -1,7 +1,5 @@
 """Support for Xiaomi Mi Air Purifier and Xiaomi Mi Air Humidifier."""
 
-import asyncio
-from enum import Enum
 from functools import partial
 import logging
 from typing import Optional
@@ -18,8 +16,6 @@ from miio import (  # pylint: disable=import-error
     AirHumidifierMjjsq,
     AirPurifier,
     AirPurifierMiot,
-    Device,
-    DeviceException,
     Fan,
     Fan1C,
     FanLeshow,
@@ -75,7 +71,12 @@ from miio.integrations.humidifier.deerma.airhumidifier_jsqs import (  # pylint:
 )
 import voluptuous as vol
 
-from homeassistant.components.fan import PLATFORM_SCHEMA, FanEntity, FanEntityFeature
+from homeassistant.components.fan import (
+    PLATFORM_SCHEMA,
+    SCAN_INTERVAL,
+    FanEntity,
+    FanEntityFeature,
+)
 from homeassistant.const import (
     ATTR_ENTITY_ID,
     ATTR_MODE,
@@ -83,22 +84,34 @@ from homeassistant.const import (
     CONF_NAME,
     CONF_TOKEN,
 )
-from homeassistant.exceptions import PlatformNotReady
 import homeassistant.helpers.config_validation as cv
 from homeassistant.util.percentage import (
     ordered_list_item_to_percentage,
     percentage_to_ordered_list_item,
 )
 
+from .changes import THRESHOLDS_SCHEMA
+from .const import (
+    CONF_BACKGROUND_SETUP,
+    CONF_MODEL,
+    CONF_RETRIES,
+    CONF_THRESHOLDS,
+    DOMAIN,
+    TIER_FAST,
+    TIER_SLOW,
+    TIER_STATIC,
+)
+from .coordinator import COORDINATOR_SCHEMA
+from .entity import XiaomiMiioEntity, async_setup_device
+from .optimistic import IS_ON
+from .profiles import ModelProfile, find_profile
+from .services import async_register_services
+
 _LOGGER = logging.getLogger(__name__)
 
 DEFAULT_NAME = "Xiaomi Miio Device"
 DEFAULT_RETRIES = 20
-DATA_KEY = "fan.xiaomi_miio_airpurifier"
-DOMAIN = "xiaomi_miio_airpurifier"
 
-CONF_MODEL = "model"
-CONF_RETRIES = "retries"
 
 MODEL_AIRPURIFIER_V1 = "zhimi.airpurifier.v1"
 MODEL_AIRPURIFIER_V2 = "zhimi.airpurifier.v2"
@@ -216,6 +229,9 @@ PLATFORM_SCHEMA = PLATFORM_SCHEMA.extend(
             ]
         ),
         vol.Optional(CONF_RETRIES, default=DEFAULT_RETRIES): cv.positive_int,
+        vol.Optional(CONF_THRESHOLDS, default={}): THRESHOLDS_SCHEMA,
+        vol.Optional(CONF_BACKGROUND_SETUP, default=False): cv.boolean,
+        **COORDINATOR_SCHEMA,
     }
 )
 
@@ -319,14 +335,36 @@ ATTR_RAW_SPEED = "raw_speed"
 # Fan Leshow SS4
 ATTR_ERROR_DETECTED = "error_detected"
 
-PURIFIER_MIOT = [MODEL_AIRPURIFIER_3, MODEL_AIRPURIFIER_3H, MODEL_AIRPURIFIER_ZA1]
-HUMIDIFIER_MIOT = [MODEL_AIRHUMIDIFIER_CA4]
 
 # AirDogX7SM
 ATTR_FORMALDEHYDE = "hcho"
 # AirDogX3, AirDogX5, AirDogX7SM
 ATTR_CLEAN_FILTERS = "clean_filters"
 
+# Attributes which change slowly and are polled less often in tiered polling
+SLOW_ATTRIBUTES = {
+    ATTR_FILTER_HOURS_USED,
+    ATTR_FILTER_LIFE,
+    ATTR_PURIFY_VOLUME,
+    ATTR_USE_TIME,
+    ATTR_SLEEP_TIME,
+    ATTR_SLEEP_LEARN_COUNT,
+    ATTR_POWER_TIME,
+    ATTR_DUST_FILTER_LIFE_REMAINING,
+    ATTR_DUST_FILTER_LIFE_REMAINING_DAYS,
+    ATTR_UPPER_FILTER_LIFE_REMAINING,
+    ATTR_UPPER_FILTER_LIFE_REMAINING_DAYS,
+}
+
+# Attributes which don't change and are polled once in tiered polling
+STATIC_ATTRIBUTES = {
+    ATTR_FILTER_RFID_PRODUCT_ID,
+    ATTR_FILTER_RFID_TAG,
+    ATTR_FILTER_TYPE,
+    ATTR_HARDWARE_VERSION,
+    ATTR_TURBO_MODE_SUPPORTED,
+}
+
 # Map attributes to properties of the state object
 AVAILABLE_ATTRIBUTES_AIRPURIFIER_COMMON = {
     ATTR_TEMPERATURE: "temperature",
@@ -720,8 +758,47 @@ OPERATION_MODES_AIRPURIFIER_V3 = [
 ]
 OPERATION_MODES_AIRFRESH = ["Auto", "Silent", "Interval", "Low", "Middle", "Strong"]
 OPERATION_MODES_AIRFRESH_T2017 = ["Auto", "Sleep", "Favorite"]
-
-SUCCESS = ["ok"]
+OPERATION_MODES_AIRHUMIDIFIER = [
+    mode.name
+    for mode in AirhumidifierOperationMode
+    if mode is not AirhumidifierOperationMode.Auto
+]
+OPERATION_MODES_AIRHUMIDIFIER_CA_AND_CB = [
+    mode.name
+    for mode in AirhumidifierOperationMode
+    if mode is not AirhumidifierOperationMode.Strong
+]
+OPERATION_MODES_AIRHUMIDIFIER_CA4 = [
+    mode.name for mode in AirhumidifierMiotOperationMode
+]
+OPERATION_MODES_AIRHUMIDIFIER_MJJSQ = [
+    mode.name
+    for mode in AirhumidifierMjjsqOperationMode
+    if mode is not AirhumidifierMjjsqOperationMode.WetAndProtect
+]
+OPERATION_MODES_AIRHUMIDIFIER_JSQ1 = [
+    mode.name for mode in AirhumidifierMjjsqOperationMode
+]
+OPERATION_MODES_AIRHUMIDIFIER_JSQS = [
+    mode.name for mode in AirhumidifierJsqsOperationMode
+]
+OPERATION_MODES_AIRHUMIDIFIER_JSQ = [
+    mode.name for mode in AirhumidifierJsqOperationMode
+]
+OPERATION_MODES_FAN_LESHOW_SS4 = [mode.name for mode in FanLeshowOperationMode]
+
+# Mode and speed of the AirDog preset modes.
+AIRDOG_PRESET_MODES = {
+    "Auto": (AirDogOperationMode.Auto, 1),
+    "Night mode": (AirDogOperationMode.Idle, 1),
+    "Speed 1": (AirDogOperationMode.Manual, 1),
+    "Speed 2": (AirDogOperationMode.Manual, 2),
+    "Speed 3": (AirDogOperationMode.Manual, 3),
+    "Speed 4": (AirDogOperationMode.Manual, 4),
+    "Speed 5": (AirDogOperationMode.Manual, 5),
+}
+OPERATION_MODES_AIRPURIFIER_AIRDOG_X3 = list(AIRDOG_PRESET_MODES)[:-1]
+OPERATION_MODES_AIRPURIFIER_AIRDOG_X7SM = list(AIRDOG_PRESET_MODES)
 
 FEATURE_SET_BUZZER = 1
 FEATURE_SET_LED = 2
@@ -1023,244 +1100,168 @@ SERVICE_SCHEMA_DELAY_OFF = AIRPURIFIER_SERVICE_SCHEMA.extend(
 )
 
 SERVICE_TO_METHOD = {
-    SERVICE_SET_BUZZER_ON: {"method": "async_set_buzzer_on"},
-    SERVICE_SET_BUZZER_OFF: {"method": "async_set_buzzer_off"},
-    SERVICE_SET_FAN_LED_ON: {"method": "async_set_led_on"},
-    SERVICE_SET_FAN_LED_OFF: {"method": "async_set_led_off"},
-    SERVICE_SET_CHILD_LOCK_ON: {"method": "async_set_child_lock_on"},
-    SERVICE_SET_CHILD_LOCK_OFF: {"method": "async_set_child_lock_off"},
-    SERVICE_SET_AUTO_DETECT_ON: {"method": "async_set_auto_detect_on"},
-    SERVICE_SET_AUTO_DETECT_OFF: {"method": "async_set_auto_detect_off"},
-    SERVICE_SET_LEARN_MODE_ON: {"method": "async_set_learn_mode_on"},
-    SERVICE_SET_LEARN_MODE_OFF: {"method": "async_set_learn_mode_off"},
-    SERVICE_RESET_FILTER: {"method": "async_reset_filter"},
+    SERVICE_SET_BUZZER_ON: {
+        "method": "async_set_buzzer_on",
+        "feature": FEATURE_SET_BUZZER,
+    },
+    SERVICE_SET_BUZZER_OFF: {
+        "method": "async_set_buzzer_off",
+        "feature": FEATURE_SET_BUZZER,
+    },
+    SERVICE_SET_FAN_LED_ON: {
+        "method": "async_set_led_on",
+        "feature": FEATURE_SET_LED,
+    },
+    SERVICE_SET_FAN_LED_OFF: {
+        "method": "async_set_led_off",
+        "feature": FEATURE_SET_LED,
+    },
+    SERVICE_SET_CHILD_LOCK_ON: {
+        "method": "async_set_child_lock_on",
+        "feature": FEATURE_SET_CHILD_LOCK,
+    },
+    SERVICE_SET_CHILD_LOCK_OFF: {
+        "method": "async_set_child_lock_off",
+        "feature": FEATURE_SET_CHILD_LOCK,
+    },
+    SERVICE_SET_AUTO_DETECT_ON: {
+        "method": "async_set_auto_detect_on",
+        "feature": FEATURE_SET_AUTO_DETECT,
+    },
+    SERVICE_SET_AUTO_DETECT_OFF: {
+        "method": "async_set_auto_detect_off",
+        "feature": FEATURE_SET_AUTO_DETECT,
+    },
+    SERVICE_SET_LEARN_MODE_ON: {
+        "method": "async_set_learn_mode_on",
+        "feature": FEATURE_SET_LEARN_MODE,
+    },
+    SERVICE_SET_LEARN_MODE_OFF: {
+        "method": "async_set_learn_mode_off",
+        "feature": FEATURE_SET_LEARN_MODE,
+    },
+    SERVICE_RESET_FILTER: {
+        "method": "async_reset_filter",
+        "feature": FEATURE_RESET_FILTER,
+    },
     SERVICE_SET_LED_BRIGHTNESS: {
         "method": "async_set_led_brightness",
+        "feature": FEATURE_SET_LED_BRIGHTNESS,
         "schema": SERVICE_SCHEMA_LED_BRIGHTNESS,
     },
     SERVICE_SET_FAVORITE_LEVEL: {
         "method": "async_set_favorite_level",
+        "feature": FEATURE_SET_FAVORITE_LEVEL,
         "schema": SERVICE_SCHEMA_FAVORITE_LEVEL,
     },
     SERVICE_SET_FAVORITE_SPEED: {
         "method": "async_set_favorite_speed",
+        "feature": FEATURE_SET_FAVORITE_SPEED,
         "schema": SERVICE_SCHEMA_FAVORITE_SPEED,
     },
     SERVICE_SET_FAN_LEVEL: {
         "method": "async_set_fan_level",
+        "feature": FEATURE_SET_FAN_LEVEL,
         "schema": SERVICE_SCHEMA_FAN_LEVEL,
     },
-    SERVICE_SET_VOLUME: {"method": "async_set_volume", "schema": SERVICE_SCHEMA_VOLUME},
+    SERVICE_SET_VOLUME: {
+        "method": "async_set_volume",
+        "feature": FEATURE_SET_VOLUME,
+        "schema": SERVICE_SCHEMA_VOLUME,
+    },
     SERVICE_SET_EXTRA_FEATURES: {
         "method": "async_set_extra_features",
+        "feature": FEATURE_SET_EXTRA_FEATURES,
         "schema": SERVICE_SCHEMA_EXTRA_FEATURES,
     },
     SERVICE_SET_TARGET_HUMIDITY: {
         "method": "async_set_target_humidity",
+        "feature": FEATURE_SET_TARGET_HUMIDITY,
         "schema": SERVICE_SCHEMA_TARGET_HUMIDITY,
     },
     SERVICE_SET_MOTOR_SPEED: {
         "method": "async_set_motor_speed",
+        "feature": FEATURE_SET_MOTOR_SPEED,
         "schema": SERVICE_SCHEMA_MOTOR_SPEED,
     },
-    SERVICE_SET_DRY_ON: {"method": "async_set_dry_on"},
-    SERVICE_SET_DRY_OFF: {"method": "async_set_dry_off"},
+    SERVICE_SET_DRY_ON: {"method": "async_set_dry_on", "feature": FEATURE_SET_DRY},
+    SERVICE_SET_DRY_OFF: {"method": "async_set_dry_off", "feature": FEATURE_SET_DRY},
     SERVICE_SET_OSCILLATION_ANGLE: {
         "method": "async_set_oscillation_angle",
+        "feature": FEATURE_SET_OSCILLATION_ANGLE,
         "schema": SERVICE_SCHEMA_OSCILLATION_ANGLE,
     },
     SERVICE_SET_DELAY_OFF: {
         "method": "async_set_delay_off",
         "schema": SERVICE_SCHEMA_DELAY_OFF,
     },
-    SERVICE_SET_NATURAL_MODE_ON: {"method": "async_set_natural_mode_on"},
-    SERVICE_SET_NATURAL_MODE_OFF: {"method": "async_set_natural_mode_off"},
+    SERVICE_SET_NATURAL_MODE_ON: {
+        "method": "async_set_natural_mode_on",
+        "feature": FEATURE_SET_NATURAL_MODE,
+    },
+    SERVICE_SET_NATURAL_MODE_OFF: {
+        "method": "async_set_natural_mode_off",
+        "feature": FEATURE_SET_NATURAL_MODE,
+    },
     SERVICE_SET_PTC_LEVEL: {
         "method": "async_set_ptc_level",
+        "feature": FEATURE_SET_PTC_LEVEL,
         "schema": SERVICE_SCHEMA_PTC_LEVEL,
     },
     SERVICE_SET_DISPLAY_ORIENTATION: {
         "method": "async_set_display_orientation",
+        "feature": FEATURE_SET_DISPLAY_ORIENTATION,
         "schema": SERVICE_SCHEMA_DISPLAY_ORIENTATION,
     },
-    SERVICE_SET_PTC_ON: {"method": "async_set_ptc_on"},
-    SERVICE_SET_PTC_OFF: {"method": "async_set_ptc_off"},
-    SERVICE_SET_DISPLAY_ON: {"method": "async_set_display_on"},
-    SERVICE_SET_DISPLAY_OFF: {"method": "async_set_display_off"},
-    SERVICE_SET_WET_PROTECTION_ON: {"method": "async_set_wet_protection_on"},
-    SERVICE_SET_WET_PROTECTION_OFF: {"method": "async_set_wet_protection_off"},
-    SERVICE_SET_CLEAN_MODE_ON: {"method": "async_set_clean_mode_on"},
-    SERVICE_SET_CLEAN_MODE_OFF: {"method": "async_set_clean_mode_off"},
+    SERVICE_SET_PTC_ON: {"method": "async_set_ptc_on", "feature": FEATURE_SET_PTC},
+    SERVICE_SET_PTC_OFF: {"method": "async_set_ptc_off", "feature": FEATURE_SET_PTC},
+    SERVICE_SET_DISPLAY_ON: {
+        "method": "async_set_display_on",
+        "feature": FEATURE_SET_LED,
+    },
+    SERVICE_SET_DISPLAY_OFF: {
+        "method": "async_set_display_off",
+        "feature": FEATURE_SET_LED,
+    },
+    SERVICE_SET_WET_PROTECTION_ON: {
+        "method": "async_set_wet_protection_on",
+        "feature": FEATURE_SET_WET_PROTECTION,
+    },
+    SERVICE_SET_WET_PROTECTION_OFF: {
+        "method": "async_set_wet_protection_off",
+        "feature": FEATURE_SET_WET_PROTECTION,
+    },
+    SERVICE_SET_CLEAN_MODE_ON: {
+        "method": "async_set_clean_mode_on",
+        "feature": FEATURE_SET_CLEAN_MODE,
+    },
+    SERVICE_SET_CLEAN_MODE_OFF: {
+        "method": "async_set_clean_mode_off",
+        "feature": FEATURE_SET_CLEAN_MODE,
+    },
     SERVICE_SET_FILTERS_CLEANED: {"method": "async_set_filters_cleaned"},
 }
 
 
 async def async_setup_platform(hass, config, async_add_entities, discovery_info=None):
     """Set up the miio fan device from config."""
-    if DATA_KEY not in hass.data:
-        hass.data[DATA_KEY] = {}
-
-    host = config[CONF_HOST]
-    token = config[CONF_TOKEN]
-    name = config[CONF_NAME]
-    model = config.get(CONF_MODEL)
-    retries = config[CONF_RETRIES]
-
-    _LOGGER.info("Initializing with host %s (token %s...)", host, token[:5])
-    unique_id = None
-
-    if model is None:
-        try:
-            miio_device = Device(host, token)
-            device_info = await hass.async_add_executor_job(miio_device.info)
-            model = device_info.model
-            unique_id = f"{model}-{device_info.mac_address}"
-            _LOGGER.info(
-                "%s %s %s detected",
-                model,
-                device_info.firmware_version,
-                device_info.hardware_version,
-            )
-        except DeviceException as ex:
-            raise PlatformNotReady from ex
-
-    if model in PURIFIER_MIOT:
-        air_purifier = AirPurifierMiot(host, token)
-        device = XiaomiAirPurifierMiot(name, air_purifier, model, unique_id, retries)
-    elif model.startswith("zhimi.airpurifier."):
-        air_purifier = AirPurifier(host, token)
-        device = XiaomiAirPurifier(name, air_purifier, model, unique_id)
-    elif model in HUMIDIFIER_MIOT:
-        air_humidifier = AirHumidifierMiot(host, token)
-        device = XiaomiAirHumidifierMiot(name, air_humidifier, model, unique_id)
-    elif model.startswith("zhimi.humidifier."):
-        air_humidifier = AirHumidifier(host, token, model=model)
-        device = XiaomiAirHumidifier(name, air_humidifier, model, unique_id)
-    elif model in [
-        MODEL_AIRHUMIDIFIER_MJJSQ,
-        MODEL_AIRHUMIDIFIER_JSQ,
-        MODEL_AIRHUMIDIFIER_JSQ1,
-    ]:
-        air_humidifier = AirHumidifierMjjsq(host, token, model=model)
-        device = XiaomiAirHumidifierMjjsq(name, air_humidifier, model, unique_id)
-    elif model in [
-        MODEL_AIRHUMIDIFIER_JSQ2W,
-        MODEL_AIRHUMIDIFIER_JSQ3,
-        MODEL_AIRHUMIDIFIER_JSQ5,
-        MODEL_AIRHUMIDIFIER_JSQS,
-    ]:
-        air_humidifier = AirHumidifierJsqs(host, token, model=model)
-        device = XiaomiAirHumidifierJsqs(name, air_humidifier, model, unique_id)
-    elif model == MODEL_AIRHUMIDIFIER_JSQ001:
-        air_humidifier = AirHumidifierJsq(host, token, model=model)
-        device = XiaomiAirHumidifierJsq(name, air_humidifier, model, unique_id)
-    elif model.startswith("zhimi.airfresh."):
-        air_fresh = AirFresh(host, token, model=model)
-        device = XiaomiAirFresh(name, air_fresh, model, unique_id)
-    elif model == MODEL_AIRFRESH_A1:
-        air_fresh = AirFreshA1(host, token, model=model)
-        device = XiaomiAirFreshA1(name, air_fresh, model, unique_id)
-    elif model == MODEL_AIRFRESH_T2017:
-        air_fresh = AirFreshT2017(host, token, model=model)
-        device = XiaomiAirFreshT2017(name, air_fresh, model, unique_id)
-    elif model in [
-        MODEL_FAN_V2,
-        MODEL_FAN_V3,
-        MODEL_FAN_SA1,
-        MODEL_FAN_ZA1,
-        MODEL_FAN_ZA3,
-        MODEL_FAN_ZA4,
-    ]:
-        fan = Fan(host, token, model=model)
-        device = XiaomiFan(name, fan, model, unique_id, retries)
-    elif model == MODEL_FAN_P5:
-        fan = FanP5(host, token, model=model)
-        device = XiaomiFanP5(name, fan, model, unique_id, retries)
-    elif model in [MODEL_FAN_P10, MODEL_FAN_P18]:
-        fan = FanMiot(host, token, model=MODEL_FAN_P10)
-        device = XiaomiFanMiot(name, fan, model, unique_id, retries)
-    elif model in [MODEL_FAN_P9, MODEL_FAN_P11]:
-        fan = FanMiot(host, token, model=model)
-        device = XiaomiFanMiot(name, fan, model, unique_id, retries)
-    elif model == MODEL_FAN_LESHOW_SS4:
-        fan = FanLeshow(host, token, model=model)
-        device = XiaomiFanLeshow(name, fan, model, unique_id, retries)
-    elif model in [
-        MODEL_AIRPURIFIER_AIRDOG_X3,
-        MODEL_AIRPURIFIER_AIRDOG_X5,
-        MODEL_AIRPURIFIER_AIRDOG_X7SM,
-    ]:
-        air_purifier = AirDogX3(host, token, model=model)
-        device = XiaomiAirDog(name, air_purifier, model, unique_id, retries)
-    elif model in [MODEL_FAN_1C, MODEL_FAN_P8]:
-        fan = Fan1C(host, token, model=model)
-        device = XiaomiFan1C(name, fan, model, unique_id, retries)
-    else:
-        _LOGGER.error(
-            "Unsupported device found! Please create an issue at "
-            "https://github.com/syssi/xiaomi_airpurifier/issues "
-            "and provide the following data: %s",
-            model,
-        )
-        return False
-
-    hass.data[DATA_KEY][host] = device
-    async_add_entities([device], update_before_add=True)
-
-    async def async_service_handler(service):
-        """Map services to methods on XiaomiAirPurifier."""
-        method = SERVICE_TO_METHOD.get(service.service)
-        params = {
-            key: value for key, value in service.data.items() if key != ATTR_ENTITY_ID
-        }
-        entity_ids = service.data.get(ATTR_ENTITY_ID)
-        if entity_ids:
-            devices = [
-                device
-                for device in hass.data[DATA_KEY].values()
-                if device.entity_id in entity_ids
-            ]
-        else:
-            devices = hass.data[DATA_KEY].values()
-
-        update_tasks = []
-        for device in devices:
-            if not hasattr(device, method["method"]):
-                continue
-            await getattr(device, method["method"])(**params)
-            update_tasks.append(asyncio.create_task(device.async_update_ha_state(True)))
+    async_register_services(hass, DOMAIN, SERVICE_TO_METHOD, AIRPURIFIER_SERVICE_SCHEMA)
 
-        if update_tasks:
-            await asyncio.wait(update_tasks)
+    return await async_setup_device(
+        hass, config, async_add_entities, get_model_profile, SCAN_INTERVAL
+    )
 
-    for air_purifier_service in SERVICE_TO_METHOD:
-        schema = SERVICE_TO_METHOD[air_purifier_service].get(
-            "schema", AIRPURIFIER_SERVICE_SCHEMA
-        )
-        hass.services.async_register(
-            DOMAIN, air_purifier_service, async_service_handler, schema=schema
-        )
 
-
-class XiaomiGenericDevice(FanEntity):
+class XiaomiGenericDevice(XiaomiMiioEntity, FanEntity):
     """Representation of a generic Xiaomi device."""
 
     _enable_turn_on_off_backwards_compatibility = False
 
-    def __init__(self, name, device, model, unique_id, retries=0):
+    def __init__(self, name, coordinator, model, unique_id, thresholds=None):
         """Initialize the generic Xiaomi device."""
-        self._name = name
-        self._device = device
-        self._model = model
-        self._unique_id = unique_id
-        self._retry = 0
-        self._retries = retries
-
-        self._available = False
-        self._state = None
-        self._state_attrs = {ATTR_MODEL: self._model}
-        self._device_features = FEATURE_SET_CHILD_LOCK
-        self._skip_update = False
+        super().__init__(
+            name, coordinator, model, unique_id, get_model_profile(model), thresholds
+        )
 
     @property
     def supported_features(self):
@@ -1271,59 +1272,23 @@ class XiaomiGenericDevice(FanEntity):
             | FanEntityFeature.TURN_ON
         )
 
-    @property
-    def should_poll(self):
-        """Poll the device."""
-        return True
-
-    @property
-    def unique_id(self):
-        """Return an unique ID."""
-        return self._unique_id
-
-    @property
-    def name(self):
-        """Return the name of the device if any."""
-        return self._name
-
-    @property
-    def available(self):
-        """Return true when state is known."""
-        return self._available
-
-    @property
-    def extra_state_attributes(self):
-        """Return the extra state attributes of the device."""
-        return self._state_attrs
-
-    @property
-    def is_on(self):
-        """Return true if device is on."""
-        return self._state
-
-    @staticmethod
-    def _extract_value_from_attribute(state, attribute):
-        value = getattr(state, attribute)
-        if isinstance(value, Enum):
-            return value.value
-
-        return value
-
-    async def _try_command(self, mask_error, func, *args, **kwargs):
-        """Call a miio device command handling error messages."""
-        try:
-            result = await self.hass.async_add_executor_job(
-                partial(func, *args, **kwargs)
+    async def async_added_to_hass(self):
+        """Register the entity and the readers of its polling tiers."""
+        await super().async_added_to_hass()
+        if self.coordinator.tiered_polling:
+            slow = SLOW_ATTRIBUTES & self._available_attributes.keys()
+            static = STATIC_ATTRIBUTES & self._available_attributes.keys()
+            fast = {IS_ON, *self._available_attributes.keys() - slow - static}
+            self.async_on_remove(
+                self.coordinator.async_set_tier_readers(
+                    {
+                        TIER_FAST: partial(self._read_values, fast),
+                        TIER_SLOW: partial(self._read_values, slow),
+                        TIER_STATIC: partial(self._read_values, static),
+                    }
+                )
             )
 
-            _LOGGER.debug("Response received from miio device: %s", result)
-
-            return result == SUCCESS
-        except DeviceException as exc:
-            _LOGGER.error(mask_error, exc)
-            self._available = False
-            return False
-
     async def async_turn_on(
         self,
         speed: str = None,
@@ -1334,26 +1299,18 @@ class XiaomiGenericDevice(FanEntity):
         """Turn the device on."""
         if preset_mode:
             # If operation mode was set the device must not be turned on.
-            result = await self.async_set_preset_mode(preset_mode)
+            await self.async_set_preset_mode(preset_mode)
         else:
-            result = await self._try_command(
-                "Turning the miio device on failed.", self._device.on
+            await self._try_optimistic_command(
+                {IS_ON: True}, "Turning the miio device on failed.", self._device.on
             )
 
-        if result:
-            self._state = True
-            self._skip_update = True
-
     async def async_turn_off(self, **kwargs) -> None:
         """Turn the device off."""
-        result = await self._try_command(
-            "Turning the miio device off failed.", self._device.off
+        await self._try_optimistic_command(
+            {IS_ON: False}, "Turning the miio device off failed.", self._device.off
         )
 
-        if result:
-            self._state = False
-            self._skip_update = True
-
     async def async_set_buzzer_on(self):
         """Turn the buzzer on."""
         if self._device_features & FEATURE_SET_BUZZER == 0:
@@ -1402,81 +1359,6 @@ class XiaomiGenericDevice(FanEntity):
 class XiaomiAirPurifier(XiaomiGenericDevice):
     """Representation of a Xiaomi Air Purifier."""
 
-    def __init__(self, name, device, model, unique_id, retries=0):
-        """Initialize the plug switch."""
-        super().__init__(name, device, model, unique_id, retries)
-
-        if self._model == MODEL_AIRPURIFIER_PRO:
-            self._device_features = FEATURE_FLAGS_AIRPURIFIER_PRO
-            self._available_attributes = AVAILABLE_ATTRIBUTES_AIRPURIFIER_PRO
-            self._preset_modes = OPERATION_MODES_AIRPURIFIER_PRO
-        elif self._model == MODEL_AIRPURIFIER_PRO_V7:
-            self._device_features = FEATURE_FLAGS_AIRPURIFIER_PRO_V7
-            self._available_attributes = AVAILABLE_ATTRIBUTES_AIRPURIFIER_PRO_V7
-            self._preset_modes = OPERATION_MODES_AIRPURIFIER_PRO_V7
-        elif self._model == MODEL_AIRPURIFIER_2S:
-            self._device_features = FEATURE_FLAGS_AIRPURIFIER_2S
-            self._available_attributes = AVAILABLE_ATTRIBUTES_AIRPURIFIER_2S
-            self._preset_modes = OPERATION_MODES_AIRPURIFIER_2S
-        elif self._model == MODEL_AIRPURIFIER_2H:
-            self._device_features = FEATURE_FLAGS_AIRPURIFIER_2H
-            self._available_attributes = AVAILABLE_ATTRIBUTES_AIRPURIFIER_2H
-            self._preset_modes = OPERATION_MODES_AIRPURIFIER_2H
-        elif self._model in PURIFIER_MIOT:
-            self._device_features = FEATURE_FLAGS_AIRPURIFIER_3
-            self._available_attributes = AVAILABLE_ATTRIBUTES_AIRPURIFIER_3
-            self._preset_modes = OPERATION_MODES_AIRPURIFIER_3
-        elif self._model == MODEL_AIRPURIFIER_V3:
-            self._device_features = FEATURE_FLAGS_AIRPURIFIER_V3
-            self._available_attributes = AVAILABLE_ATTRIBUTES_AIRPURIFIER_V3
-            self._preset_modes = OPERATION_MODES_AIRPURIFIER_V3
-        else:
-            self._device_features = FEATURE_FLAGS_AIRPURIFIER
-            self._available_attributes = AVAILABLE_ATTRIBUTES_AIRPURIFIER
-            self._preset_modes = OPERATION_MODES_AIRPURIFIER
-
-        self._state_attrs.update(
-            {attribute: None for attribute in self._available_attributes}
-        )
-
-    async def async_update(self):
-        """Fetch state from the device."""
-        # On state change the device doesn't provide the new state immediately.
-        if self._skip_update:
-            self._skip_update = False
-            return
-
-        try:
-            state = await self.hass.async_add_executor_job(self._device.status)
-            _LOGGER.debug("Got new state: %s", state)
-
-            self._available = True
-            self._state = state.is_on
-            self._state_attrs.update(
-                {
-                    key: self._extract_value_from_attribute(state, value)
-                    for key, value in self._available_attributes.items()
-                }
-            )
-
-            self._retry = 0
-
-        except DeviceException as ex:
-            self._retry = self._retry + 1
-            if self._retry < self._retries:
-                _LOGGER.info(
-                    "Got exception while fetching the state: %s , _retry=%s",
-                    ex,
-                    self._retry,
-                )
-            else:
-                self._available = False
-                _LOGGER.error(
-                    "Got exception while fetching the state: %s , _retry=%s",
-                    ex,
-                    self._retry,
-                )
-
     @property
     def preset_modes(self):
         """Get the list of available preset modes."""
@@ -1666,63 +1548,6 @@ class XiaomiAirPurifierMiot(XiaomiAirPurifier):
 class XiaomiAirHumidifier(XiaomiGenericDevice):
     """Representation of a Xiaomi Air Humidifier."""
 
-    def __init__(self, name, device, model, unique_id):
-        """Initialize the plug switch."""
-        super().__init__(name, device, model, unique_id)
-
-        if self._model in [
-            MODEL_AIRHUMIDIFIER_CA1,
-            MODEL_AIRHUMIDIFIER_CB1,
-            MODEL_AIRHUMIDIFIER_CB2,
-        ]:
-            self._device_features = FEATURE_FLAGS_AIRHUMIDIFIER_CA_AND_CB
-            self._available_attributes = AVAILABLE_ATTRIBUTES_AIRHUMIDIFIER_CA_AND_CB
-            self._preset_modes = [
-                mode.name
-                for mode in AirhumidifierOperationMode
-                if mode is not AirhumidifierOperationMode.Strong
-            ]
-        elif self._model == MODEL_AIRHUMIDIFIER_CA4:
-            self._device_features = FEATURE_FLAGS_AIRHUMIDIFIER_CA4
-            self._available_attributes = AVAILABLE_ATTRIBUTES_AIRHUMIDIFIER_CA4
-            self._preset_modes = [mode.name for mode in AirhumidifierMiotOperationMode]
-        else:
-            self._device_features = FEATURE_FLAGS_AIRHUMIDIFIER
-            self._available_attributes = AVAILABLE_ATTRIBUTES_AIRHUMIDIFIER
-            self._preset_modes = [
-                mode.name
-                for mode in AirhumidifierOperationMode
-                if mode is not AirhumidifierOperationMode.Auto
-            ]
-
-        self._state_attrs.update(
-            {attribute: None for attribute in self._available_attributes}
-        )
-
-    async def async_update(self):
-        """Fetch state from the device."""
-        # On state change the device doesn't provide the new state immediately.
-        if self._skip_update:
-            self._skip_update = False
-            return
-
-        try:
-            state = await self.hass.async_add_executor_job(self._device.status)
-            _LOGGER.debug("Got new state: %s", state)
-
-            self._available = True
-            self._state = state.is_on
-            self._state_attrs.update(
-                {
-                    key: self._extract_value_from_attribute(state, value)
-                    for key, value in self._available_attributes.items()
-                }
-            )
-
-        except DeviceException as ex:
-            self._available = False
-            _LOGGER.error("Got exception while fetching the state: %s", ex)
-
     @property
     def preset_modes(self):
         """Get the list of available preset modes."""
@@ -1891,28 +1716,6 @@ class XiaomiAirHumidifierMiot(XiaomiAirHumidifier):
 class XiaomiAirHumidifierMjjsq(XiaomiAirHumidifier):
     """Representation of a Xiaomi Air Humidifier Mjjsq."""
 
-    def __init__(self, name, device, model, unique_id):
-        """Initialize the plug switch."""
-        super().__init__(name, device, model, unique_id)
-
-        if self._model == MODEL_AIRHUMIDIFIER_JSQ1:
-            self._device_features = FEATURE_FLAGS_AIRHUMIDIFIER_JSQ1
-            self._available_attributes = AVAILABLE_ATTRIBUTES_AIRHUMIDIFIER_JSQ1
-        else:
-            self._device_features = FEATURE_FLAGS_AIRHUMIDIFIER_MJJSQ
-            self._available_attributes = AVAILABLE_ATTRIBUTES_AIRHUMIDIFIER_MJJSQ
-
-        self._preset_modes = [
-            mode.name
-            for mode in AirhumidifierMjjsqOperationMode
-            if self._device_features & FEATURE_SET_WET_PROTECTION != 0
-            or mode != AirhumidifierMjjsqOperationMode.WetAndProtect
-        ]
-        self._state_attrs = {ATTR_MODEL: self._model}
-        self._state_attrs.update(
-            {attribute: None for attribute in self._available_attributes}
-        )
-
     @property
     def preset_mode(self):
         """Get the current preset mode."""
@@ -1958,23 +1761,6 @@ class XiaomiAirHumidifierMjjsq(XiaomiAirHumidifier):
 class XiaomiAirHumidifierJsqs(XiaomiAirHumidifier):
     """Representation of a Xiaomi Air Humidifier Jsqs."""
 
-    def __init__(self, name, device, model, unique_id):
-        """Initialize the plug switch."""
-        super().__init__(name, device, model, unique_id)
-
-        if self._model in [MODEL_AIRHUMIDIFIER_JSQ3, MODEL_AIRHUMIDIFIER_JSQ5]:
-            self._device_features = FEATURE_FLAGS_AIRHUMIDIFIER_JSQ5
-            self._available_attributes = AVAILABLE_ATTRIBUTES_AIRHUMIDIFIER_JSQ5
-        else:
-            self._device_features = FEATURE_FLAGS_AIRHUMIDIFIER_JSQS
-            self._available_attributes = AVAILABLE_ATTRIBUTES_AIRHUMIDIFIER_JSQS
-
-        self._preset_modes = [mode.name for mode in AirhumidifierJsqsOperationMode]
-        self._state_attrs = {ATTR_MODEL: self._model}
-        self._state_attrs.update(
-            {attribute: None for attribute in self._available_attributes}
-        )
-
     @property
     def preset_mode(self):
         """Get the current preset mode."""
@@ -2042,18 +1828,6 @@ class XiaomiAirHumidifierJsqs(XiaomiAirHumidifier):
 class XiaomiAirHumidifierJsq(XiaomiAirHumidifier):
     """Representation of a Xiaomi Air Humidifier Jsq001."""
 
-    def __init__(self, name, device, model, unique_id):
-        """Initialize the plug switch."""
-        super().__init__(name, device, model, unique_id)
-
-        self._device_features = FEATURE_FLAGS_AIRHUMIDIFIER_JSQ
-        self._available_attributes = AVAILABLE_ATTRIBUTES_AIRHUMIDIFIER_JSQ
-        self._preset_modes = [mode.name for mode in AirhumidifierJsqOperationMode]
-        self._state_attrs = {ATTR_MODEL: self._model}
-        self._state_attrs.update(
-            {attribute: None for attribute in self._available_attributes}
-        )
-
     @property
     def preset_mode(self):
         """Get the current preset mode."""
@@ -2098,46 +1872,6 @@ class XiaomiAirHumidifierJsq(XiaomiAirHumidifier):
 class XiaomiAirFresh(XiaomiGenericDevice):
     """Representation of a Xiaomi Air Fresh."""
 
-    def __init__(self, name, device, model, unique_id):
-        """Initialize the miio device."""
-        super().__init__(name, device, model, unique_id)
-
-        if self._model == MODEL_AIRFRESH_VA4:
-            self._available_attributes = AVAILABLE_ATTRIBUTES_AIRFRESH_VA4
-            self._device_features = FEATURE_FLAGS_AIRFRESH_VA4
-        else:
-            self._available_attributes = AVAILABLE_ATTRIBUTES_AIRFRESH
-            self._device_features = FEATURE_FLAGS_AIRFRESH
-
-        self._preset_modes = OPERATION_MODES_AIRFRESH
-        self._state_attrs.update(
-            {attribute: None for attribute in self._available_attributes}
-        )
-
-    async def async_update(self):
-        """Fetch state from the device."""
-        # On state change the device doesn't provide the new state immediately.
-        if self._skip_update:
-            self._skip_update = False
-            return
-
-        try:
-            state = await self.hass.async_add_executor_job(self._device.status)
-            _LOGGER.debug("Got new state: %s", state)
-
-            self._available = True
-            self._state = state.is_on
-            self._state_attrs.update(
-                {
-                    key: self._extract_value_from_attribute(state, value)
-                    for key, value in self._available_attributes.items()
-                }
-            )
-
-        except DeviceException as ex:
-            self._available = False
-            _LOGGER.error("Got exception while fetching the state: %s", ex)
-
     @property
     def preset_modes(self):
         """Get the list of available preset modes."""
@@ -2237,46 +1971,6 @@ class XiaomiAirFresh(XiaomiGenericDevice):
 class XiaomiAirFreshT2017(XiaomiAirFresh):
     """Representation of a Xiaomi Air Fresh T2017."""
 
-    def __init__(self, name, device, model, unique_id):
-        """Initialize the miio device."""
-        super().__init__(name, device, model, unique_id)
-
-        if self._model == MODEL_AIRFRESH_T2017:
-            self._available_attributes = AVAILABLE_ATTRIBUTES_AIRFRESH_T2017
-            self._device_features = FEATURE_FLAGS_AIRFRESH_T2017
-        else:
-            self._available_attributes = AVAILABLE_ATTRIBUTES_AIRFRESH_A1
-            self._device_features = FEATURE_FLAGS_AIRFRESH_A1
-
-        self._preset_modes = OPERATION_MODES_AIRFRESH_T2017
-        self._state_attrs.update(
-            {attribute: None for attribute in self._available_attributes}
-        )
-
-    async def async_update(self):
-        """Fetch state from the device."""
-        # On state change the device doesn't provide the new state immediately.
-        if self._skip_update:
-            self._skip_update = False
-            return
-
-        try:
-            state = await self.hass.async_add_executor_job(self._device.status)
-            _LOGGER.debug("Got new state: %s", state)
-
-            self._available = True
-            self._state = state.is_on
-            self._state_attrs.update(
-                {
-                    key: self._extract_value_from_attribute(state, value)
-                    for key, value in self._available_attributes.items()
-                }
-            )
-
-        except DeviceException as ex:
-            self._available = False
-            _LOGGER.error("Got exception while fetching the state: %s", ex)
-
     @property
     def preset_mode(self):
         """Get the current preset mode."""
@@ -2382,22 +2076,15 @@ class XiaomiAirFreshA1(XiaomiAirFreshT2017):
 class XiaomiFan(XiaomiGenericDevice):
     """Representation of a Xiaomi Pedestal Fan."""
 
-    def __init__(self, name, device, model, unique_id, retries):
+    def __init__(self, name, coordinator, model, unique_id, thresholds=None):
         """Initialize the fan entity."""
-        super().__init__(name, device, model, unique_id, retries)
+        super().__init__(name, coordinator, model, unique_id, thresholds)
 
-        self._device_features = FEATURE_FLAGS_FAN
-        self._available_attributes = AVAILABLE_ATTRIBUTES_FAN
         self._percentage = None
-        self._preset_modes = list(FAN_PRESET_MODES)
         self._preset_mode = None
         self._oscillate = None
         self._natural_mode = False
 
-        self._state_attrs.update(
-            {attribute: None for attribute in self._available_attributes}
-        )
-
     @property
     def supported_features(self) -> int:
         """Supported features."""
@@ -2410,58 +2097,26 @@ class XiaomiFan(XiaomiGenericDevice):
             | FanEntityFeature.TURN_ON
         )
 
-    async def async_update(self):
-        """Fetch state from the device."""
-        # On state change the device doesn't provide the new state immediately.
-        if self._skip_update:
-            self._skip_update = False
-            return
-
-        try:
-            state = await self.hass.async_add_executor_job(self._device.status)
-            _LOGGER.debug("Got new state: %s", state)
-
-            self._available = True
-            self._oscillate = state.oscillate
-            self._natural_mode = state.natural_speed != 0
-            self._state = state.is_on
-
-            if self._natural_mode:
-                for preset_mode, range in FAN_PRESET_MODES.items():
-                    if state.natural_speed in range:
-                        self._preset_mode = preset_mode
-                        self._percentage = state.natural_speed
-                        break
-            else:
-                for preset_mode, range in FAN_PRESET_MODES.items():
-                    if state.direct_speed in range:
-                        self._preset_mode = preset_mode
-                        self._percentage = state.direct_speed
-                        break
-
-            self._state_attrs.update(
-                {
-                    key: self._extract_value_from_attribute(state, value)
-                    for key, value in self._available_attributes.items()
-                }
-            )
-            self._retry = 0
-
-        except DeviceException as ex:
-            self._retry = self._retry + 1
-            if self._retry < self._retries:
-                _LOGGER.info(
-                    "Got exception while fetching the state: %s , _retry=%s",
-                    ex,
-                    self._retry,
-                )
-            else:
-                self._available = False
-                _LOGGER.error(
-                    "Got exception while fetching the state: %s , _retry=%s",
-                    ex,
-                    self._retry,
-                )
+    def _update_from_status(self, state):
+        """Update the entity from the status of the device."""
+        self._oscillate = state.oscillate
+        self._natural_mode = state.natural_speed != 0
+        self._state = state.is_on
+
+        if self._natural_mode:
+            for preset_mode, range in FAN_PRESET_MODES.items():
+                if state.natural_speed in range:
+                    self._preset_mode = preset_mode
+                    self._percentage = state.natural_speed
+                    break
+        else:
+            for preset_mode, range in FAN_PRESET_MODES.items():
+                if state.direct_speed in range:
+                    self._preset_mode = preset_mode
+                    self._percentage = state.direct_speed
+                    break
+
+        self._state_attrs.update(self._extract_attributes(state))
 
     @property
     def percentage(self):
@@ -2610,68 +2265,19 @@ class XiaomiFan(XiaomiGenericDevice):
 class XiaomiFanP5(XiaomiFan):
     """Representation of a Xiaomi Pedestal Fan P5."""
 
-    def __init__(self, name, device, model, unique_id, retries):
-        """Initialize the fan entity."""
-        super().__init__(name, device, model, unique_id, retries)
+    def _update_from_status(self, state):
+        """Update the entity from the status of the device."""
+        self._percentage = state.speed
+        self._oscillate = state.oscillate
+        self._natural_mode = state.mode == FanOperationMode.Nature
+        self._state = state.is_on
 
-        self._device_features = FEATURE_FLAGS_FAN_P5
-        self._available_attributes = AVAILABLE_ATTRIBUTES_FAN_P5
-        self._percentage = None
-        self._preset_modes = list(FAN_PRESET_MODES)
-        self._preset_mode = None
-        self._oscillate = None
-        self._natural_mode = False
+        for preset_mode, range in FAN_PRESET_MODES.items():
+            if state.speed in range:
+                self._preset_mode = preset_mode
+                break
 
-        self._state_attrs.update(
-            {attribute: None for attribute in self._available_attributes}
-        )
-
-    async def async_update(self):
-        """Fetch state from the device."""
-        # On state change the device doesn't provide the new state immediately.
-        if self._skip_update:
-            self._skip_update = False
-            return
-
-        try:
-            state = await self.hass.async_add_executor_job(self._device.status)
-            _LOGGER.debug("Got new state: %s", state)
-
-            self._available = True
-            self._percentage = state.speed
-            self._oscillate = state.oscillate
-            self._natural_mode = state.mode == FanOperationMode.Nature
-            self._state = state.is_on
-
-            for preset_mode, range in FAN_PRESET_MODES.items():
-                if state.speed in range:
-                    self._preset_mode = preset_mode
-                    break
-
-            self._state_attrs.update(
-                {
-                    key: self._extract_value_from_attribute(state, value)
-                    for key, value in self._available_attributes.items()
-                }
-            )
-
-            self._retry = 0
-
-        except DeviceException as ex:
-            self._retry = self._retry + 1
-            if self._retry < self._retries:
-                _LOGGER.info(
-                    "Got exception while fetching the state: %s , _retry=%s",
-                    ex,
-                    self._retry,
-                )
-            else:
-                self._available = False
-                _LOGGER.error(
-                    "Got exception while fetching the state: %s , _retry=%s",
-                    ex,
-                    self._retry,
-                )
+        self._state_attrs.update(self._extract_attributes(state))
 
     async def async_set_preset_mode(self, preset_mode: str) -> None:
         """Set the preset mode of the fan."""
@@ -2740,20 +2346,13 @@ class XiaomiFanMiot(XiaomiFanP5):
 class XiaomiFanLeshow(XiaomiGenericDevice):
     """Representation of a Xiaomi Fan Leshow SS4."""
 
-    def __init__(self, name, device, model, unique_id, retries):
+    def __init__(self, name, coordinator, model, unique_id, thresholds=None):
         """Initialize the fan entity."""
-        super().__init__(name, device, model, unique_id, retries)
+        super().__init__(name, coordinator, model, unique_id, thresholds)
 
-        self._device_features = FEATURE_FLAGS_FAN_LESHOW_SS4
-        self._available_attributes = AVAILABLE_ATTRIBUTES_FAN_LESHOW_SS4
         self._percentage = None
-        self._preset_modes = [mode.name for mode in FanLeshowOperationMode]
         self._oscillate = None
 
-        self._state_attrs.update(
-            {attribute: None for attribute in self._available_attributes}
-        )
-
     @property
     def supported_features(self) -> int:
         """Supported features."""
@@ -2765,45 +2364,13 @@ class XiaomiFanLeshow(XiaomiGenericDevice):
             | FanEntityFeature.TURN_ON
         )
 
-    async def async_update(self):
-        """Fetch state from the device."""
-        # On state change the device doesn't provide the new state immediately.
-        if self._skip_update:
-            self._skip_update = False
-            return
-
-        try:
-            state = await self.hass.async_add_executor_job(self._device.status)
-            _LOGGER.debug("Got new state: %s", state)
-
-            self._available = True
-            self._percentage = state.speed
-            self._oscillate = state.oscillate
-            self._state = state.is_on
+    def _update_from_status(self, state):
+        """Update the entity from the status of the device."""
+        self._percentage = state.speed
+        self._oscillate = state.oscillate
+        self._state = state.is_on
 
-            self._state_attrs.update(
-                {
-                    key: self._extract_value_from_attribute(state, value)
-                    for key, value in self._available_attributes.items()
-                }
-            )
-            self._retry = 0
-
-        except DeviceException as ex:
-            self._retry = self._retry + 1
-            if self._retry < self._retries:
-                _LOGGER.info(
-                    "Got exception while fetching the state: %s , _retry=%s",
-                    ex,
-                    self._retry,
-                )
-            else:
-                self._available = False
-                _LOGGER.error(
-                    "Got exception while fetching the state: %s , _retry=%s",
-                    ex,
-                    self._retry,
-                )
+        self._state_attrs.update(self._extract_attributes(state))
 
     @property
     def percentage(self):
@@ -2880,19 +2447,6 @@ class XiaomiFanLeshow(XiaomiGenericDevice):
 class XiaomiFan1C(XiaomiFan):
     """Representation of a Xiaomi Fan 1C."""
 
-    def __init__(self, name, device, model, unique_id, retries):
-        """Initialize the fan entity."""
-        super().__init__(name, device, model, unique_id, retries)
-
-        self._device_features = FEATURE_FLAGS_FAN_1C
-        self._available_attributes = AVAILABLE_ATTRIBUTES_FAN_1C
-        self._preset_modes = list(FAN_PRESET_MODES_1C)
-        self._oscillate = None
-
-        self._state_attrs.update(
-            {attribute: None for attribute in self._available_attributes}
-        )
-
     @property
     def supported_features(self) -> int:
         """Supported features."""
@@ -2904,48 +2458,16 @@ class XiaomiFan1C(XiaomiFan):
             | FanEntityFeature.TURN_ON
         )
 
-    async def async_update(self):
-        """Fetch state from the device."""
-        # On state change the device doesn't provide the new state immediately.
-        if self._skip_update:
-            self._skip_update = False
-            return
-
-        try:
-            state = await self.hass.async_add_executor_job(self._device.status)
-            _LOGGER.debug("Got new state: %s", state)
-
-            self._available = True
-            self._oscillate = state.oscillate
-            self._state = state.is_on
+    def _update_from_status(self, state):
+        """Update the entity from the status of the device."""
+        self._oscillate = state.oscillate
+        self._state = state.is_on
 
-            for preset_mode, value in FAN_PRESET_MODES_1C.items():
-                if state.speed == value:
-                    self._preset_mode = preset_mode
+        for preset_mode, value in FAN_PRESET_MODES_1C.items():
+            if state.speed == value:
+                self._preset_mode = preset_mode
 
-            self._state_attrs.update(
-                {
-                    key: self._extract_value_from_attribute(state, value)
-                    for key, value in self._available_attributes.items()
-                }
-            )
-            self._retry = 0
-
-        except DeviceException as ex:
-            self._retry = self._retry + 1
-            if self._retry < self._retries:
-                _LOGGER.info(
-                    "Got exception while fetching the state: %s , _retry=%s",
-                    ex,
-                    self._retry,
-                )
-            else:
-                self._available = False
-                _LOGGER.error(
-                    "Got exception while fetching the state: %s , _retry=%s",
-                    ex,
-                    self._retry,
-                )
+        self._state_attrs.update(self._extract_attributes(state))
 
     @property
     def percentage(self) -> Optional[int]:
@@ -3059,77 +2581,19 @@ class XiaomiFan1C(XiaomiFan):
 class XiaomiAirDog(XiaomiGenericDevice):
     """Representation of a Xiaomi AirDog air purifiers."""
 
-    def __init__(self, name, device, model, unique_id, retries=0):
+    def __init__(self, name, coordinator, model, unique_id, thresholds=None):
         """Initialize the plug switch."""
-        super().__init__(name, device, model, unique_id, retries)
-
-        self._device_features = FEATURE_FLAGS_AIRPURIFIER_AIRDOG
-
-        if self._model == MODEL_AIRPURIFIER_AIRDOG_X7SM:
-            self._available_attributes = AVAILABLE_ATTRIBUTES_AIRPURIFIER_AIRDOG_X7SM
-        else:
-            self._available_attributes = AVAILABLE_ATTRIBUTES_AIRPURIFIER_AIRDOG_X3
+        super().__init__(name, coordinator, model, unique_id, thresholds)
 
         self._preset_modes_to_mode_speed = {
-            "Auto": (AirDogOperationMode("auto"), 1),
-            "Night mode": (AirDogOperationMode("sleep"), 1),
-            "Speed 1": (AirDogOperationMode("manual"), 1),
-            "Speed 2": (AirDogOperationMode("manual"), 2),
-            "Speed 3": (AirDogOperationMode("manual"), 3),
-            "Speed 4": (AirDogOperationMode("manual"), 4),
+            preset_mode: AIRDOG_PRESET_MODES[preset_mode]
+            for preset_mode in self._preset_modes
         }
-        if self._model == MODEL_AIRPURIFIER_AIRDOG_X7SM:
-            self._preset_modes_to_mode_speed["Speed 5"] = (
-                AirDogOperationMode("Manual"),
-                5,
-            )
 
         self._mode_speed_to_preset_modes = {}
         for key, value in self._preset_modes_to_mode_speed.items():
             self._mode_speed_to_preset_modes[value] = key
 
-        self._state_attrs.update(
-            {attribute: None for attribute in self._available_attributes}
-        )
-
-    async def async_update(self):
-        """Fetch state from the device."""
-        # On state change the device doesn't provide the new state immediately.
-        if self._skip_update:
-            self._skip_update = False
-            return
-
-        try:
-            state = await self.hass.async_add_executor_job(self._device.status)
-            _LOGGER.debug("Got new state: %s", state)
-
-            self._available = True
-            self._state = state.is_on
-            self._state_attrs.update(
-                {
-                    key: self._extract_value_from_attribute(state, value)
-                    for key, value in self._available_attributes.items()
-                }
-            )
-
-            self._retry = 0
-
-        except DeviceException as ex:
-            self._retry = self._retry + 1
-            if self._retry < self._retries:
-                _LOGGER.info(
-                    "Got exception while fetching the state: %s , _retry=%s",
-                    ex,
-                    self._retry,
-                )
-            else:
-                self._available = False
-                _LOGGER.error(
-                    "Got exception while fetching the state: %s , _retry=%s",
-                    ex,
-                    self._retry,
-                )
-
     @property
     def preset_modes(self):
         """Get the list of available preset modes."""
@@ -3206,7 +2670,16 @@ class XiaomiAirDog(XiaomiGenericDevice):
         # To allow switching from any mode to any other mode command is repeated
         # twice when switching is from 'Night mode' or 'Auto' to 'Speed X'.
 
-        await self._try_command(
+        mode = self._state_attrs[ATTR_MODE]
+        # Setting a preset mode turns the device on.
+        expected = {
+            IS_ON: True,
+            ATTR_MODE: self._preset_modes_to_mode_speed[preset_mode][0].value,
+            ATTR_SPEED: self._preset_modes_to_mode_speed[preset_mode][1],
+        }
+
+        await self._try_optimistic_command(
+            expected,
             "Setting preset mode of the miio device failed.",
             self._device.set_mode_and_speed,
             *self._preset_modes_to_mode_speed[
@@ -3215,10 +2688,11 @@ class XiaomiAirDog(XiaomiGenericDevice):
         )
 
         if (
-            self._state_attrs[ATTR_MODE] in ("auto", "sleep")
+            mode in ("auto", "sleep")
             and self._preset_modes_to_mode_speed[preset_mode][0].value == "manual"
         ):
-            await self._try_command(
+            await self._try_optimistic_command(
+                expected,
                 "Setting preset mode of the miio device failed.",
                 self._device.set_mode_and_speed,
                 *self._preset_modes_to_mode_speed[
@@ -3226,14 +2700,6 @@ class XiaomiAirDog(XiaomiGenericDevice):
                 ],  # Corresponding mode and speed parameters are in tuple
             )
 
-        self._state_attrs.update(
-            {
-                ATTR_MODE: self._preset_modes_to_mode_speed[preset_mode][0].value,
-                ATTR_SPEED: self._preset_modes_to_mode_speed[preset_mode][1],
-            }
-        )
-        self._skip_update = True
-
     async def async_set_filters_cleaned(self):
         """Set filters cleaned."""
         await self._try_command(
@@ -3241,42 +2707,252 @@ class XiaomiAirDog(XiaomiGenericDevice):
             self._device.set_filters_cleaned,
         )
 
-    async def async_turn_on(
-        self,
-        speed: str = None,
-        percentage: int = None,
-        preset_mode: str = None,
-        **kwargs,
-    ) -> None:
-        """Turn the device on."""
-        await super().async_turn_on(speed, percentage, preset_mode, **kwargs)
-
-        self._state = True
-        self._skip_update = True
-
-    async def async_turn_off(self, **kwargs) -> None:
-        """Turn the device off."""
-        await super().async_turn_off(**kwargs)
-
-        self._state = False
-        self._skip_update = True
-
     async def async_set_child_lock_on(self):
         """Turn the child lock on."""
-        await super().async_set_child_lock_on()
-        self._state_attrs.update(
-            {
-                ATTR_CHILD_LOCK: True,
-            }
+        if self._device_features & FEATURE_SET_CHILD_LOCK == 0:
+            return
+
+        await self._try_optimistic_command(
+            {ATTR_CHILD_LOCK: True},
+            "Turning the child lock of the miio device on failed.",
+            self._device.set_child_lock,
+            True,
         )
-        self._skip_update = True
 
     async def async_set_child_lock_off(self):
         """Turn the child lock off."""
-        await super().async_set_child_lock_off()
-        self._state_attrs.update(
-            {
-                ATTR_CHILD_LOCK: False,
-            }
+        if self._device_features & FEATURE_SET_CHILD_LOCK == 0:
+            return
+
+        await self._try_optimistic_command(
+            {ATTR_CHILD_LOCK: False},
+            "Turning the child lock of the miio device off failed.",
+            self._device.set_child_lock,
+            False,
         )
-        self._skip_update = True
+
+
+def get_model_profile(model):
+    """Return the profile of a model or None if it isn't supported."""
+    return find_profile(model, MODEL_PROFILES, MODEL_PREFIX_PROFILES)
+
+
+# The profiles refer to the entity classes, so they are defined last.
+_AIRPURIFIER = partial(
+    ModelProfile, AirPurifier, XiaomiAirPurifier, retries=0, pass_model=False
+)
+_AIRPURIFIER_MIOT = ModelProfile(
+    AirPurifierMiot,
+    XiaomiAirPurifierMiot,
+    FEATURE_FLAGS_AIRPURIFIER_3,
+    AVAILABLE_ATTRIBUTES_AIRPURIFIER_3,
+    OPERATION_MODES_AIRPURIFIER_3,
+    pass_model=False,
+)
+_AIRHUMIDIFIER = partial(ModelProfile, AirHumidifier, XiaomiAirHumidifier, retries=0)
+_AIRHUMIDIFIER_CA_AND_CB = _AIRHUMIDIFIER(
+    FEATURE_FLAGS_AIRHUMIDIFIER_CA_AND_CB,
+    AVAILABLE_ATTRIBUTES_AIRHUMIDIFIER_CA_AND_CB,
+    OPERATION_MODES_AIRHUMIDIFIER_CA_AND_CB,
+)
+_AIRHUMIDIFIER_MJJSQ = ModelProfile(
+    AirHumidifierMjjsq,
+    XiaomiAirHumidifierMjjsq,
+    FEATURE_FLAGS_AIRHUMIDIFIER_MJJSQ,
+    AVAILABLE_ATTRIBUTES_AIRHUMIDIFIER_MJJSQ,
+    OPERATION_MODES_AIRHUMIDIFIER_MJJSQ,
+    retries=0,
+)
+_AIRHUMIDIFIER_JSQS = partial(
+    ModelProfile,
+    AirHumidifierJsqs,
+    XiaomiAirHumidifierJsqs,
+    preset_modes=OPERATION_MODES_AIRHUMIDIFIER_JSQS,
+    retries=0,
+)
+_AIRHUMIDIFIER_JSQ5 = _AIRHUMIDIFIER_JSQS(
+    features=FEATURE_FLAGS_AIRHUMIDIFIER_JSQ5,
+    attributes=AVAILABLE_ATTRIBUTES_AIRHUMIDIFIER_JSQ5,
+)
+_AIRHUMIDIFIER_JSQS_DEFAULT = _AIRHUMIDIFIER_JSQS(
+    features=FEATURE_FLAGS_AIRHUMIDIFIER_JSQS,
+    attributes=AVAILABLE_ATTRIBUTES_AIRHUMIDIFIER_JSQS,
+)
+_AIRFRESH = partial(
+    ModelProfile,
+    AirFresh,
+    XiaomiAirFresh,
+    preset_modes=OPERATION_MODES_AIRFRESH,
+    retries=0,
+)
+_FAN = ModelProfile(
+    Fan, XiaomiFan, FEATURE_FLAGS_FAN, AVAILABLE_ATTRIBUTES_FAN, list(FAN_PRESET_MODES)
+)
+_FAN_MIOT = partial(
+    ModelProfile,
+    FanMiot,
+    XiaomiFanMiot,
+    FEATURE_FLAGS_FAN_P5,
+    AVAILABLE_ATTRIBUTES_FAN_P5,
+    list(FAN_PRESET_MODES),
+)
+_AIRDOG_X3 = ModelProfile(
+    AirDogX3,
+    XiaomiAirDog,
+    FEATURE_FLAGS_AIRPURIFIER_AIRDOG,
+    AVAILABLE_ATTRIBUTES_AIRPURIFIER_AIRDOG_X3,
+    OPERATION_MODES_AIRPURIFIER_AIRDOG_X3,
+)
+_FAN_1C = ModelProfile(
+    Fan1C,
+    XiaomiFan1C,
+    FEATURE_FLAGS_FAN_1C,
+    AVAILABLE_ATTRIBUTES_FAN_1C,
+    list(FAN_PRESET_MODES_1C),
+)
+
+MODEL_PROFILES = {
+    MODEL_AIRPURIFIER_PRO: _AIRPURIFIER(
+        FEATURE_FLAGS_AIRPURIFIER_PRO,
+        AVAILABLE_ATTRIBUTES_AIRPURIFIER_PRO,
+        OPERATION_MODES_AIRPURIFIER_PRO,
+    ),
+    MODEL_AIRPURIFIER_PRO_V7: _AIRPURIFIER(
+        FEATURE_FLAGS_AIRPURIFIER_PRO_V7,
+        AVAILABLE_ATTRIBUTES_AIRPURIFIER_PRO_V7,
+        OPERATION_MODES_AIRPURIFIER_PRO_V7,
+    ),
+    MODEL_AIRPURIFIER_2S: _AIRPURIFIER(
+        FEATURE_FLAGS_AIRPURIFIER_2S,
+        AVAILABLE_ATTRIBUTES_AIRPURIFIER_2S,
+        OPERATION_MODES_AIRPURIFIER_2S,
+    ),
+    MODEL_AIRPURIFIER_2H: _AIRPURIFIER(
+        FEATURE_FLAGS_AIRPURIFIER_2H,
+        AVAILABLE_ATTRIBUTES_AIRPURIFIER_2H,
+        OPERATION_MODES_AIRPURIFIER_2H,
+    ),
+    MODEL_AIRPURIFIER_V3: _AIRPURIFIER(
+        FEATURE_FLAGS_AIRPURIFIER_V3,
+        AVAILABLE_ATTRIBUTES_AIRPURIFIER_V3,
+        OPERATION_MODES_AIRPURIFIER_V3,
+    ),
+    MODEL_AIRPURIFIER_3: _AIRPURIFIER_MIOT,
+    MODEL_AIRPURIFIER_3H: _AIRPURIFIER_MIOT,
+    MODEL_AIRPURIFIER_ZA1: _AIRPURIFIER_MIOT,
+    MODEL_AIRPURIFIER_AIRDOG_X3: _AIRDOG_X3,
+    MODEL_AIRPURIFIER_AIRDOG_X5: _AIRDOG_X3,
+    MODEL_AIRPURIFIER_AIRDOG_X7SM: ModelProfile(
+        AirDogX3,
+        XiaomiAirDog,
+        FEATURE_FLAGS_AIRPURIFIER_AIRDOG,
+        AVAILABLE_ATTRIBUTES_AIRPURIFIER_AIRDOG_X7SM,
+        OPERATION_MODES_AIRPURIFIER_AIRDOG_X7SM,
+    ),
+    MODEL_AIRHUMIDIFIER_CA1: _AIRHUMIDIFIER_CA_AND_CB,
+    MODEL_AIRHUMIDIFIER_CB1: _AIRHUMIDIFIER_CA_AND_CB,
+    MODEL_AIRHUMIDIFIER_CB2: _AIRHUMIDIFIER_CA_AND_CB,
+    MODEL_AIRHUMIDIFIER_CA4: ModelProfile(
+        AirHumidifierMiot,
+        XiaomiAirHumidifierMiot,
+        FEATURE_FLAGS_AIRHUMIDIFIER_CA4,
+        AVAILABLE_ATTRIBUTES_AIRHUMIDIFIER_CA4,
+        OPERATION_MODES_AIRHUMIDIFIER_CA4,
+        retries=0,
+        pass_model=False,
+    ),
+    MODEL_AIRHUMIDIFIER_MJJSQ: _AIRHUMIDIFIER_MJJSQ,
+    MODEL_AIRHUMIDIFIER_JSQ: _AIRHUMIDIFIER_MJJSQ,
+    MODEL_AIRHUMIDIFIER_JSQ1: ModelProfile(
+        AirHumidifierMjjsq,
+        XiaomiAirHumidifierMjjsq,
+        FEATURE_FLAGS_AIRHUMIDIFIER_JSQ1,
+        AVAILABLE_ATTRIBUTES_AIRHUMIDIFIER_JSQ1,
+        OPERATION_MODES_AIRHUMIDIFIER_JSQ1,
+        retries=0,
+    ),
+    MODEL_AIRHUMIDIFIER_JSQ2W: _AIRHUMIDIFIER_JSQS_DEFAULT,
+    MODEL_AIRHUMIDIFIER_JSQ3: _AIRHUMIDIFIER_JSQ5,
+    MODEL_AIRHUMIDIFIER_JSQ5: _AIRHUMIDIFIER_JSQ5,
+    MODEL_AIRHUMIDIFIER_JSQS: _AIRHUMIDIFIER_JSQS_DEFAULT,
+    MODEL_AIRHUMIDIFIER_JSQ001: ModelProfile(
+        AirHumidifierJsq,
+        XiaomiAirHumidifierJsq,
+        FEATURE_FLAGS_AIRHUMIDIFIER_JSQ,
+        AVAILABLE_ATTRIBUTES_AIRHUMIDIFIER_JSQ,
+        OPERATION_MODES_AIRHUMIDIFIER_JSQ,
+        retries=0,
+    ),
+    MODEL_AIRFRESH_VA4: _AIRFRESH(
+        features=FEATURE_FLAGS_AIRFRESH_VA4,
+        attributes=AVAILABLE_ATTRIBUTES_AIRFRESH_VA4,
+    ),
+    MODEL_AIRFRESH_A1: ModelProfile(
+        AirFreshA1,
+        XiaomiAirFreshA1,
+        FEATURE_FLAGS_AIRFRESH_A1,
+        AVAILABLE_ATTRIBUTES_AIRFRESH_A1,
+        OPERATION_MODES_AIRFRESH_T2017,
+        retries=0,
+    ),
+    MODEL_AIRFRESH_T2017: ModelProfile(
+        AirFreshT2017,
+        XiaomiAirFreshT2017,
+        FEATURE_FLAGS_AIRFRESH_T2017,
+        AVAILABLE_ATTRIBUTES_AIRFRESH_T2017,
+        OPERATION_MODES_AIRFRESH_T2017,
+        retries=0,
+    ),
+    MODEL_FAN_V2: _FAN,
+    MODEL_FAN_V3: _FAN,
+    MODEL_FAN_SA1: _FAN,
+    MODEL_FAN_ZA1: _FAN,
+    MODEL_FAN_ZA3: _FAN,
+    MODEL_FAN_ZA4: _FAN,
+    MODEL_FAN_P5: ModelProfile(
+        FanP5,
+        XiaomiFanP5,
+        FEATURE_FLAGS_FAN_P5,
+        AVAILABLE_ATTRIBUTES_FAN_P5,
+        list(FAN_PRESET_MODES),
+    ),
+    MODEL_FAN_P9: _FAN_MIOT(),
+    MODEL_FAN_P10: _FAN_MIOT(),
+    MODEL_FAN_P11: _FAN_MIOT(),
+    MODEL_FAN_P18: _FAN_MIOT(driver_model=MODEL_FAN_P10),
+    MODEL_FAN_LESHOW_SS4: ModelProfile(
+        FanLeshow,
+        XiaomiFanLeshow,
+        FEATURE_FLAGS_FAN_LESHOW_SS4,
+        AVAILABLE_ATTRIBUTES_FAN_LESHOW_SS4,
+        OPERATION_MODES_FAN_LESHOW_SS4,
+    ),
+    MODEL_FAN_1C: _FAN_1C,
+    MODEL_FAN_P8: _FAN_1C,
+}
+
+# Fallbacks for the models which aren't listed, checked in order.
+MODEL_PREFIX_PROFILES = [
+    (
+        "zhimi.airpurifier.",
+        _AIRPURIFIER(
+            FEATURE_FLAGS_AIRPURIFIER,
+            AVAILABLE_ATTRIBUTES_AIRPURIFIER,
+            OPERATION_MODES_AIRPURIFIER,
+        ),
+    ),
+    (
+        "zhimi.humidifier.",
+        _AIRHUMIDIFIER(
+            FEATURE_FLAGS_AIRHUMIDIFIER,
+            AVAILABLE_ATTRIBUTES_AIRHUMIDIFIER,
+            OPERATION_MODES_AIRHUMIDIFIER,
+        ),
+    ),
+    (
+        "zhimi.airfresh.",
+        _AIRFRESH(
+            features=FEATURE_FLAGS_AIRFRESH, attributes=AVAILABLE_ATTRIBUTES_AIRFRESH
+        ),
+    ),
+]
@@ -0,0 +1,192 @@
+"""Latency histograms and error counters of the requests to the devices."""
+
+from bisect import bisect_left
+
+from miio.exceptions import DeviceError  # pylint: disable=import-error
+
+from homeassistant.core import callback
+
+from .const import DATA_COORDINATORS, DATA_EXECUTOR
+from .device_info import async_get_device_info_cache
+from .registry import async_get_registry
+
+# Upper bounds of the latency buckets in seconds. The last bucket is unbounded.
+BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+def is_timeout(error):
+    """Return true if a request failed without an error reply of the device."""
+    while error is not None:
+        if isinstance(error, DeviceError):
+            return False
+        error = error.__cause__ or error.__context__
+
+    return True
+
+
+def method_name(func):
+    """Return the name of the driver method a request calls."""
+    while not hasattr(func, "__name__") and hasattr(func, "func"):
+        func = func.func
+
+    # The decorator of the python-miio commands doesn't keep their name.
+    command = getattr(func, "_device_group_command", None)
+    if command is not None:
+        return command.func.__name__
+
+    return getattr(func, "__name__", repr(func))
+
+
+class Histogram:
+    """Count the latencies of requests in fixed buckets.
+
+    The percentiles are estimated by the upper bound of the bucket they
+    fall into, capped by the longest latency seen.
+    """
+
+    def __init__(self, buckets=BUCKETS):
+        """Initialize the histogram."""
+        self._buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds):
+        """Count a latency."""
+        self.counts[bisect_left(self._buckets, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, fraction):
+        """Return the estimated percentile in seconds or None without samples."""
+        if not self.count:
+            return None
+
+        rank = fraction * self.count
+        seen = 0
+        for bound, count in zip(self._buckets, self.counts):
+            seen += count
+            if count and seen >= rank:
+                return min(bound, self.max)
+
+        return self.max
+
+    def as_dict(self):
+        """Return the summary of the histogram in milliseconds."""
+        summary = {"count": self.count}
+        if not self.count:
+            return summary
+
+        summary["mean_ms"] = round(self.total / self.count * 1000, 1)
+        for name, fraction in (("p50_ms", 0.5), ("p90_ms", 0.9), ("p99_ms", 0.99)):
+            summary[name] = round(self.percentile(fraction) * 1000, 1)
+        summary["max_ms"] = round(self.max * 1000, 1)
+        summary["buckets"] = {
+            f"le_{bound * 1000:g}ms": count
+            for bound, count in zip(self._buckets, self.counts)
+        }
+        summary["buckets"]["inf"] = self.counts[-1]
+        return summary
+
+
+class RequestMetrics:
+    """Latencies and failures of the requests calling a driver method."""
+
+    def __init__(self):
+        """Initialize the metrics."""
+        self.latency = Histogram()
+        self.timeouts = 0
+        self.errors = 0
+        self.failed_time = 0.0
+
+    def record(self, seconds, error=None):
+        """Count a request and its outcome."""
+        self.latency.record(seconds)
+        if error is None:
+            return
+
+        self.failed_time += seconds
+        if is_timeout(error):
+            self.timeouts += 1
+        else:
+            self.errors += 1
+
+    def as_dict(self):
+        """Return the metrics as a dict."""
+        return {
+            "latency": self.latency.as_dict(),
+            "timeouts": self.timeouts,
+            "errors": self.errors,
+            "failed_time_s": round(self.failed_time, 3),
+        }
+
+
+class DeviceMetrics:
+    """Metrics of the requests to a single device.
+
+    The latency of a request is measured from its submission to the worker
+    pool or transport until the driver returns, so the time spent waiting
+    for a free worker is included. The time spent on failed requests is
+    summed up, with the executor transport it blocked a worker in vain.
+    ``retries`` counts the failed polls which were hidden by the
+    ``retries`` option of the device.
+    """
+
+    def __init__(self):
+        """Initialize the metrics."""
+        self.requests = RequestMetrics()
+        self.methods = {}
+        self.retries = 0
+
+    def record(self, method, seconds, error=None):
+        """Count a request calling a driver method."""
+        self.requests.record(seconds, error)
+        metrics = self.methods.get(method)
+        if metrics is None:
+            metrics = self.methods[method] = RequestMetrics()
+        metrics.record(seconds, error)
+
+    def as_dict(self):
+        """Return the metrics as a dict."""
+        return {
+            **self.requests.as_dict(),
+            "retries": self.retries,
+            "methods": {
+                method: metrics.as_dict()
+                for method, metrics in sorted(self.methods.items())
+            },
+        }
+
+
+@callback
+def async_get_metrics(hass):
+    """Return the metrics of all devices and the worker pool."""
+    cache = async_get_device_info_cache(hass)
+    registry = async_get_registry(hass)
+    devices = {}
+    for host, coordinator in hass.data.get(DATA_COORDINATORS, {}).items():
+        info = cache.async_get_cached(host, coordinator.device.token) or {}
+        entity = registry.async_get_host(host)
+        devices[host] = {
+            "entity_id": entity.entity_id if entity else None,
+            "model": coordinator._model,  # pylint: disable=protected-access
+            "firmware_version": info.get("firmware_version"),
+            "circuit_breaker": coordinator.breaker.state,
+            **coordinator.metrics.as_dict(),
+        }
+
+    metrics = {"devices": devices}
+    executor = hass.data.get(DATA_EXECUTOR)
+    if executor is not None:
+        metrics["executor"] = {
+            "max_workers": executor.max_workers,
+            "active": executor.active,
+            "queue_depth": executor.queue_depth,
+            "max_queue_depth": executor.max_queue_depth,
+            "completed": executor.completed,
+        }
+
+    return metrics
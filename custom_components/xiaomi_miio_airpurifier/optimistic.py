@@ -0,0 +1,56 @@
+"""Show the expected result of a command until the device confirms it."""
+
+from datetime import timedelta
+
+# Key of the on/off state of an entity in the expected values.
+IS_ON = "is_on"
+
+# Devices take a moment until their status reflects a command.
+CONFIRM_DELAY = timedelta(seconds=2)
+
+# Number of reads of a differing value before it is rolled back.
+CONFIRM_ATTEMPTS = 2
+
+
+class OptimisticState:
+    """Values of an entity expected after commands which aren't confirmed yet.
+
+    The value shown before a key was expected is kept, so the key can be
+    rolled back if the command fails.
+    """
+
+    def __init__(self):
+        """Initialize the state."""
+        self.expected = {}
+        self._previous = {}
+
+    def expect(self, values, current):
+        """Expect the values. ``current`` holds the values shown so far."""
+        for key, value in values.items():
+            if key not in self.expected:
+                self._previous[key] = current.get(key)
+            self.expected[key] = value
+
+    def roll_back(self, values):
+        """Stop expecting the values of a failed command.
+
+        Returns the values to show instead. Keys expected again by a later
+        command are kept.
+        """
+        previous = {}
+        for key, value in values.items():
+            if key in self.expected and self.expected[key] == value:
+                del self.expected[key]
+                previous[key] = self._previous.pop(key)
+
+        return previous
+
+    def settle(self, values):
+        """Stop expecting the values once they were read from the device.
+
+        Keys expected again by a later command are kept.
+        """
+        for key, value in values.items():
+            if key in self.expected and self.expected[key] == value:
+                del self.expected[key]
+                del self._previous[key]
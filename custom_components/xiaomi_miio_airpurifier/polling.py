@@ -0,0 +1,85 @@
+"""Adaptive polling interval for Xiaomi Miio devices."""
+
+from datetime import timedelta
+import logging
+import time
+
+_LOGGER = logging.getLogger(__name__)
+
+DEFAULT_MIN_SCAN_INTERVAL = timedelta(seconds=10)
+DEFAULT_MAX_SCAN_INTERVAL = timedelta(minutes=5)
+
+# Poll with the minimum interval for this long after a command was sent.
+COMMAND_BURST = timedelta(minutes=1)
+
+# Status attributes which move on their own and are worth following closely.
+VOLATILE_ATTRIBUTES = [
+    "aqi",
+    "average_aqi",
+    "co2",
+    "pm25",
+    "humidity",
+    "temperature",
+    "motor_speed",
+    "motor2_speed",
+    "speed",
+    "depth",
+    "water_level",
+]
+
+
+def _read_attribute(state, attribute):
+    try:
+        return getattr(state, attribute)
+    except Exception:  # pylint: disable=broad-except
+        return None
+
+
+class AdaptivePolling:
+    """Choose the polling interval of a device from its recent behaviour.
+
+    The interval drops to ``min_interval`` after a command and while one of
+    the volatile attributes changes between two polls. While the device is
+    stable the interval is doubled up to ``max_interval``. A device which
+    is turned off is polled with ``max_interval`` right away.
+    """
+
+    def __init__(self, interval, min_interval, max_interval):
+        """Initialize the polling interval."""
+        self.base_interval = interval
+        self.min_interval = min(min_interval, interval)
+        self.max_interval = max(max_interval, interval)
+        self.interval = interval
+        self._values = None
+        self._burst_until = 0.0
+
+    def command_sent(self):
+        """Poll quickly to follow the device reacting to a command."""
+        self._burst_until = time.monotonic() + COMMAND_BURST.total_seconds()
+        self.interval = self.min_interval
+        return self.interval
+
+    def status_received(self, state):
+        """Update the interval from a new status of the device."""
+        values = tuple(
+            _read_attribute(state, attribute) for attribute in VOLATILE_ATTRIBUTES
+        )
+        changed = self._values is not None and values != self._values
+        self._values = values
+
+        if changed or time.monotonic() < self._burst_until:
+            self.interval = self.min_interval
+        elif _read_attribute(state, "is_on") is False:
+            self.interval = self.max_interval
+        else:
+            self.interval = min(self.interval * 2, self.max_interval)
+
+        _LOGGER.debug(
+            "Next poll in %s (volatile values changed: %s)", self.interval, changed
+        )
+        return self.interval
+
+    def status_failed(self):
+        """Fall back to the configured interval while the device is unreachable."""
+        self.interval = self.base_interval
+        return self.interval
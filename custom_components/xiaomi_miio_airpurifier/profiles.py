@@ -0,0 +1,56 @@
+"""Profiles of the supported models."""
+
+from dataclasses import dataclass, field
+from typing import Optional
+
+from .attributes import AttributeExtractor
+
+
+@dataclass(frozen=True)
+class ModelProfile:
+    """Driver, entity and capabilities of the supported models."""
+
+    driver: type
+    entity_class: type
+    features: int
+    attributes: dict
+    preset_modes: list
+    # Retries of a failed poll, None for the configured retries.
+    retries: Optional[int] = None
+    # Model passed to the driver, None for the model of the device.
+    driver_model: Optional[str] = None
+    # Some drivers detect the model themselves.
+    pass_model: bool = True
+    extract_attributes: AttributeExtractor = field(
+        init=False, repr=False, compare=False
+    )
+
+    def __post_init__(self):
+        """Compile the extractor of the attributes."""
+        object.__setattr__(
+            self, "extract_attributes", AttributeExtractor(self.attributes)
+        )
+
+    def create_driver(self, host, token, model):
+        """Return the driver of a device."""
+        if not self.pass_model:
+            return self.driver(host, token)
+
+        return self.driver(host, token, model=self.driver_model or model)
+
+
+def find_profile(model, profiles, prefix_profiles):
+    """Return the profile of a model or None if it isn't supported.
+
+    The models are looked up in ``profiles`` first. Models which aren't
+    listed fall back to the first matching prefix of ``prefix_profiles``.
+    """
+    profile = profiles.get(model)
+    if profile is not None:
+        return profile
+
+    for prefix, profile in prefix_profiles:
+        if model.startswith(prefix):
+            return profile
+
+    return None
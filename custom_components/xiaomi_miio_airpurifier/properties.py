@@ -0,0 +1,243 @@
+"""Request only the device properties which are exposed by the entities."""
+
+import logging
+import math
+
+from .transport import ProtocolWrapper
+
+_LOGGER = logging.getLogger(__name__)
+
+GET_PROP = "get_prop"
+GET_PROPERTIES = "get_properties"
+
+# Result code of MIoT properties which weren't requested. Any code other
+# than 0 makes the status containers of python-miio return None.
+CODE_NOT_REQUESTED = -4004
+
+
+class KeyRecorder(dict):
+    """Status data which remembers the keys read by the status container."""
+
+    def __init__(self, data):
+        """Initialize the recorder."""
+        super().__init__(data)
+        self.keys_read = set()
+        self._missing = getattr(data, "default_factory", None)
+
+    def __getitem__(self, key):
+        self.keys_read.add(key)
+        if key not in self and self._missing is not None:
+            return self._missing()
+        return super().__getitem__(key)
+
+    def __contains__(self, key):
+        self.keys_read.add(key)
+        return super().__contains__(key)
+
+    def get(self, key, default=None):
+        """Return the value of key and remember it was read."""
+        self.keys_read.add(key)
+        return super().get(key, default)
+
+
+def status_properties(state, readers):
+    """Return the raw properties the readers of a status object look at."""
+    data = state.data
+    recorder = KeyRecorder(data)
+    state.data = recorder
+    try:
+        for reader in readers:
+            try:
+                reader(state)
+            except Exception:  # pylint: disable=broad-except
+                _LOGGER.debug(
+                    "Unable to trace the properties read by %s", reader, exc_info=True
+                )
+    finally:
+        state.data = data
+
+    return frozenset(recorder.keys_read)
+
+
+class PropertyFilter(ProtocolWrapper):
+    """Drop the properties nobody is interested in from status requests.
+
+    The drivers always ask for every property they know about. The
+    requests are cut down to the wanted properties and the responses are
+    padded, so the drivers parse them as if everything was requested.
+    Requests are passed through unchanged while ``properties`` is None.
+
+    ``tiers`` maps properties to the number of polls between their
+    requests, which may be infinite. Until a property is due again, its
+    last value is returned from the cache. The properties skipped are
+    picked at the start of a poll, so the requests don't change if the
+    asyncio transport runs the driver again.
+
+    The parameters of the status requests are remembered, so single
+    properties can be requested later on.
+    """
+
+    def __init__(self, protocol, properties=None):
+        """Initialize the filter."""
+        super().__init__(protocol)
+        self.properties = properties
+        self.tiers = {}
+        self._poll = 0
+        self._requests = {}
+        self._cache = {}
+        self._requested = {}
+        self._skipped = frozenset()
+
+    def start_poll(self):
+        """Count a poll and pick the tiered properties which aren't due."""
+        self._poll += 1
+        self._skipped = frozenset(
+            name
+            for name, interval in self.tiers.items()
+            if name in self._requested and self._poll - self._requested[name] < interval
+        )
+
+    def expire(self):
+        """Request the tiered properties on the next poll, except the static ones."""
+        for name, interval in self.tiers.items():
+            if interval != math.inf:
+                self._requested.pop(name, None)
+
+    def send(self, command, parameters=None, retry_count=3, *, extra_parameters=None):
+        """Send the command with the unwanted properties removed."""
+        if not self._is_status_request(command, parameters):
+            return super().send(
+                command, parameters, retry_count, extra_parameters=extra_parameters
+            )
+
+        for parameter in parameters:
+            self._requests[self._property_name(command, parameter)] = (
+                command,
+                parameter,
+            )
+
+        if self.properties is None and not self.tiers:
+            return super().send(
+                command, parameters, retry_count, extra_parameters=extra_parameters
+            )
+
+        wanted = [
+            parameter
+            for parameter in parameters
+            if self._is_wanted(self._property_name(command, parameter))
+        ]
+        if len(wanted) == len(parameters):
+            values = super().send(
+                command, parameters, retry_count, extra_parameters=extra_parameters
+            )
+            self._remember(command, parameters, values)
+            return values
+
+        values = []
+        if wanted:
+            values = super().send(
+                command, wanted, retry_count, extra_parameters=extra_parameters
+            )
+            self._remember(command, wanted, values)
+
+        if command == GET_PROPERTIES:
+            received = {value.get("did"): value for value in values}
+            return [
+                received.get(parameter["did"])
+                or self._cache.get(parameter["did"])
+                or {**parameter, "code": CODE_NOT_REQUESTED}
+                for parameter in parameters
+            ]
+
+        if len(values) != len(wanted):
+            _LOGGER.debug(
+                "Count (%s) of requested properties does not match the count "
+                "(%s) of received values, requesting all properties",
+                len(wanted),
+                len(values),
+            )
+            values = super().send(
+                command, parameters, retry_count, extra_parameters=extra_parameters
+            )
+            self._remember(command, parameters, values)
+            return values
+
+        received = dict(zip(wanted, values))
+        return [
+            received[parameter] if parameter in received else self._cache.get(parameter)
+            for parameter in parameters
+        ]
+
+    def _is_wanted(self, name):
+        """Return true if the property is exposed and due."""
+        if self.properties is not None and name not in self.properties:
+            return False
+
+        return name not in self._skipped
+
+    def _remember(self, command, parameters, values):
+        """Cache the values of the tiered properties."""
+        if not self.tiers:
+            return
+
+        if command == GET_PROPERTIES:
+            values = {
+                value.get("did"): value for value in values if value.get("code") == 0
+            }
+        elif len(values) == len(parameters):
+            values = dict(zip(parameters, values))
+        else:
+            return
+
+        for name, value in values.items():
+            if name in self.tiers:
+                self._cache[name] = value
+                self._requested[name] = self._poll
+
+    def request(self, properties):
+        """Return the command and parameters requesting only the properties.
+
+        Returns None if a property wasn't seen in a status request yet or
+        the properties are requested by different commands.
+        """
+        if not properties or not properties <= self._requests.keys():
+            return None
+
+        commands = {self._requests[name][0] for name in properties}
+        if len(commands) != 1:
+            return None
+
+        return commands.pop(), [self._requests[name][1] for name in properties]
+
+    @staticmethod
+    def values(command, parameters, response):
+        """Return the property values of the response to ``request()``.
+
+        Returns None if the response doesn't match the request.
+        """
+        if command == GET_PROPERTIES:
+            return {
+                value.get("did"): value.get("value") if value.get("code") == 0 else None
+                for value in response
+            }
+
+        if len(response) != len(parameters):
+            return None
+
+        return dict(zip(parameters, response))
+
+    @staticmethod
+    def _is_status_request(command, parameters):
+        if not parameters:
+            return False
+        if command == GET_PROPERTIES:
+            return all(isinstance(parameter, dict) for parameter in parameters)
+        if command == GET_PROP:
+            return all(isinstance(parameter, str) for parameter in parameters)
+        return False
+
+    @staticmethod
+    def _property_name(command, parameter):
+        if command == GET_PROPERTIES:
+            return parameter.get("did")
+        return parameter
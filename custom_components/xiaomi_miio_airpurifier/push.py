@@ -0,0 +1,308 @@
+"""Receive the property changes pushed by MIoT devices.
+
+MIoT devices run scenes on their own. A scene is installed on the device
+for every property of interest, which sends a command to another device
+on the local network as soon as the property changes. The push server
+plays that other device: it answers the handshake, accepts the commands
+and hands them to the coordinator of the device which sent them.
+
+The scenes are built like the ones of the Mi Home app and
+``miio.push_server``.
+"""
+
+import asyncio
+import datetime
+import json
+import logging
+import socket
+import struct
+import time
+
+from miio.protocol import Message, Utils  # pylint: disable=import-error
+
+from homeassistant.const import EVENT_HOMEASSISTANT_STOP
+from homeassistant.core import callback
+from homeassistant.helpers.storage import Store
+
+from .const import (
+    CONF_PUSH_ADDRESS,
+    DATA_CONFIG,
+    DATA_PUSH_SERVER,
+    DATA_SCENES,
+    DEFAULT_PUSH_ADDRESS,
+    DOMAIN,
+)
+from .transport import HELLO_BYTES, MIIO_PORT
+
+_LOGGER = logging.getLogger(__name__)
+
+# The fake device the scenes send their commands to.
+SERVER_ID = 120009025
+SERVER_MODEL = "chuangmi.plug.v3"
+
+# Ids of the scenes, a scene per property.
+SCENE_ID_BASE = 2000000
+
+# Record of the scenes installed on the devices.
+STORAGE_KEY = f"{DOMAIN}.scenes"
+STORAGE_VERSION = 1
+
+# Longest command a device sends.
+MAX_COMMAND_LENGTH = 49
+
+
+def scene_id(siid, piid):
+    """Return the id of the scene pushing a property.
+
+    The ids don't change between restarts, so the scenes left behind on
+    the device are replaced instead of piling up.
+    """
+    return f"x.scene.{SCENE_ID_BASE + siid * 1000 + piid}"
+
+
+def scene_action(siid, piid):
+    """Return the name of the command sent on a change of the property."""
+    return f"prop_{siid}_{piid}"
+
+
+def parse_action(method):
+    """Return the service and property id of a pushed command or None."""
+    action = method.rsplit(":", 1)[0].removeprefix(f"{SERVER_MODEL}.")
+    prefix, _, ids = action.partition("_")
+    siid, _, piid = ids.partition("_")
+    if prefix != "prop" or not siid.isdigit() or not piid.isdigit():
+        return None
+
+    return int(siid), int(piid)
+
+
+def scene_frame(parameter, device_id, model, token, server_ip):
+    """Return the parameters of the send_data_frame command installing a scene.
+
+    The scene sends a command to the push server whenever the MIoT
+    property of the get_properties parameter changes.
+    """
+    siid, piid = parameter["siid"], parameter["piid"]
+    # The target is identified by the token of the device encrypted with itself.
+    token = bytes.fromhex(token)
+    target_token = Utils.encrypt(token, token).hex()[:32]
+    trigger = {
+        "did": str(device_id),
+        "extra": "",
+        "key": f"prop.{siid}.{piid}",
+        "model": model,
+        "src": "device",
+        "timespan": ["0 0 * * 0,1,2,3,4,5,6", "0 0 * * 0,1,2,3,4,5,6"],
+        "token": "",
+    }
+    target = {
+        "command": f"{SERVER_MODEL}.{scene_action(siid, piid)}:{device_id}",
+        "did": str(SERVER_ID),
+        "extra": "",
+        "id": 0,
+        "ip": server_ip,
+        "model": SERVER_MODEL,
+        "token": target_token,
+        "value": "",
+    }
+    if len(target["command"]) > MAX_COMMAND_LENGTH:
+        return None
+
+    scene = [[scene_id(siid, piid), ["1.0", 0, ["0", trigger], [target]]]]
+    return {
+        "cur": 0,
+        "data": json.dumps(scene, separators=(",", ":")),
+        "data_tkn": 29576,
+        "total": 1,
+        "type": "scene",
+    }
+
+
+class PushServer(asyncio.DatagramProtocol):
+    """Accept the commands the scenes of the devices send.
+
+    Devices are identified by their address. The commands of unknown
+    devices are ignored.
+    """
+
+    def __init__(self, address):
+        """Initialize the server."""
+        self.address = address
+        self._transport = None
+        self._start_lock = asyncio.Lock()
+        self._devices = {}
+
+    async def async_start(self):
+        """Listen on the miIO port if the server isn't listening yet."""
+        async with self._start_lock:
+            if self._transport is not None:
+                return
+
+            loop = asyncio.get_running_loop()
+            await loop.create_datagram_endpoint(
+                lambda: self, local_addr=(self.address, MIIO_PORT)
+            )
+            _LOGGER.debug("Listening for pushed changes on %s", self.address)
+
+    def connection_made(self, transport):
+        """Store the datagram transport."""
+        self._transport = transport
+
+    def connection_lost(self, exc):
+        """Forget the closed transport."""
+        self._transport = None
+
+    def close(self):
+        """Stop listening."""
+        if self._transport is not None:
+            self._transport.close()
+
+    def server_ip(self, host):
+        """Return the address the device at the host sends the commands to."""
+        if self.address != DEFAULT_PUSH_ADDRESS:
+            return self.address
+
+        # Connecting a datagram socket sends nothing, it only picks the route.
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as route:
+            route.connect((host, MIIO_PORT))
+            return route.getsockname()[0]
+
+    @callback
+    def async_register(self, host, token, push_received):
+        """Hand the commands of a device to a callback.
+
+        The callback is called with the service and property id of the
+        changed property.
+        """
+        self._devices[host] = (bytes.fromhex(token), push_received)
+
+        @callback
+        def unregister():
+            self._devices.pop(host, None)
+
+        return unregister
+
+    def datagram_received(self, data, addr):
+        """Answer a handshake or accept a command of a scene."""
+        if data == HELLO_BYTES:
+            self._transport.sendto(
+                struct.pack(
+                    ">HHIII16s", 0x2131, 32, 0, SERVER_ID, int(time.time()), bytes(16)
+                ),
+                addr,
+            )
+            return
+
+        host = addr[0]
+        device = self._devices.get(host)
+        if device is None:
+            _LOGGER.debug("Ignoring a datagram of the unknown device %s", host)
+            return
+
+        token, push_received = device
+        try:
+            message = Message.parse(data, token=token).data.value
+            message_id, method = message["id"], message["method"]
+        except Exception as ex:  # pylint: disable=broad-except
+            _LOGGER.debug("Dropping a malformed datagram of %s: %s", host, ex)
+            return
+
+        _LOGGER.debug("%s pushed %s(%s)", host, method, message.get("params"))
+        header = {
+            "length": 0,
+            "unknown": 0,
+            "device_id": SERVER_ID.to_bytes(4, "big"),
+            "ts": datetime.datetime.now(datetime.UTC),
+        }
+        self._transport.sendto(
+            Message.build(
+                {
+                    "data": {"value": {"id": message_id, "result": 0}},
+                    "header": {"value": header},
+                    "checksum": 0,
+                },
+                token=token,
+            ),
+            addr,
+        )
+
+        ids = parse_action(method)
+        if ids is not None:
+            push_received(*ids)
+
+
+async def async_get_push_server(hass):
+    """Return the push server and start it on first use.
+
+    Raises ``OSError`` if the miIO port is taken.
+    """
+    server = hass.data.get(DATA_PUSH_SERVER)
+    if server is None:
+        address = hass.data.get(DATA_CONFIG, {}).get(
+            CONF_PUSH_ADDRESS, DEFAULT_PUSH_ADDRESS
+        )
+        server = hass.data[DATA_PUSH_SERVER] = PushServer(address)
+
+        @callback
+        def async_shutdown(event):
+            """Stop listening on shutdown."""
+            server.close()
+
+        hass.bus.async_listen_once(EVENT_HOMEASSISTANT_STOP, async_shutdown)
+
+    await server.async_start()
+    return server
+
+
+class SceneRecord:
+    """Ids of the scenes installed on the devices, kept across restarts.
+
+    The scenes are removed from a device on shutdown. The ones which
+    couldn't be removed, e.g. because the device didn't respond, are
+    removed on the next start, even if the push updates were turned off.
+    """
+
+    def __init__(self, hass):
+        """Initialize the record."""
+        self._store = Store(hass, STORAGE_VERSION, STORAGE_KEY)
+        self._load_lock = asyncio.Lock()
+        self._scenes = None
+
+    async def async_get(self, host):
+        """Return the ids of the scenes installed on the device at the host."""
+        await self._async_load()
+        return set(self._scenes.get(host, ()))
+
+    async def async_add(self, host, ids):
+        """Record scenes before they are installed on the device at the host."""
+        await self._async_save(host, await self.async_get(host) | set(ids))
+
+    async def async_discard(self, host, ids):
+        """Forget scenes removed from the device at the host."""
+        await self._async_save(host, await self.async_get(host) - set(ids))
+
+    async def _async_load(self):
+        """Load the record on first use."""
+        async with self._load_lock:
+            if self._scenes is None:
+                self._scenes = await self._store.async_load() or {}
+
+    async def _async_save(self, host, ids):
+        """Save the ids of the scenes of a host if they changed."""
+        if ids == set(self._scenes.get(host, ())):
+            return
+
+        scenes = {key: value for key, value in self._scenes.items() if key != host}
+        if ids:
+            scenes[host] = sorted(ids)
+        self._scenes = scenes
+        await self._store.async_save(scenes)
+
+
+@callback
+def async_get_scene_record(hass):
+    """Return the record of the installed scenes and create it on first use."""
+    if DATA_SCENES not in hass.data:
+        hass.data[DATA_SCENES] = SceneRecord(hass)
+
+    return hass.data[DATA_SCENES]
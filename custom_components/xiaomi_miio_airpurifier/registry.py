@@ -0,0 +1,79 @@
+"""Index of the Xiaomi Miio entities for the service calls."""
+
+from homeassistant.core import callback
+
+from .const import DATA_REGISTRY
+
+
+def _supports(device, method, feature):
+    if not hasattr(device, method):
+        return False
+    return feature is None or device.device_features & feature != 0
+
+
+class DeviceRegistry:
+    """Look up the entities by entity id, host and supported service method.
+
+    A service method is supported if the entity implements it and, if the
+    service is bound to a feature flag, the device has the feature. The
+    index of a service method is built on its first lookup and kept up to
+    date as entities are added and removed.
+    """
+
+    def __init__(self):
+        """Initialize the registry."""
+        self._by_entity_id = {}
+        self._by_host = {}
+        self._by_method = {}
+
+    @callback
+    def async_add(self, device, host):
+        """Add an entity once it got its entity id."""
+        self._by_entity_id[device.entity_id] = device
+        self._by_host[host] = device
+        for (method, feature), entity_ids in self._by_method.items():
+            if _supports(device, method, feature):
+                entity_ids[device.entity_id] = None
+
+    @callback
+    def async_remove(self, device, host):
+        """Remove an entity."""
+        self._by_entity_id.pop(device.entity_id, None)
+        if self._by_host.get(host) is device:
+            del self._by_host[host]
+        for entity_ids in self._by_method.values():
+            entity_ids.pop(device.entity_id, None)
+
+    @callback
+    def async_get_host(self, host):
+        """Return the entity of a host."""
+        return self._by_host.get(host)
+
+    @callback
+    def async_get_devices(self, method, feature=None, entity_ids=None):
+        """Return the entities supporting the method, optionally limited to ids."""
+        capable = self._by_method.get((method, feature))
+        if capable is None:
+            capable = self._by_method[(method, feature)] = {
+                entity_id: None
+                for entity_id, device in self._by_entity_id.items()
+                if _supports(device, method, feature)
+            }
+
+        if entity_ids is None:
+            return [self._by_entity_id[entity_id] for entity_id in capable]
+
+        return [
+            self._by_entity_id[entity_id]
+            for entity_id in dict.fromkeys(entity_ids)
+            if entity_id in capable
+        ]
+
+
+@callback
+def async_get_registry(hass):
+    """Return the registry and create it on first use."""
+    if DATA_REGISTRY not in hass.data:
+        hass.data[DATA_REGISTRY] = DeviceRegistry()
+
+    return hass.data[DATA_REGISTRY]
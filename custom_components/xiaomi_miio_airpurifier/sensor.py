@@ -0,0 +1,78 @@
+"""Diagnostic sensors of the requests to Xiaomi Miio devices."""
+
+from homeassistant.components.sensor import (
+    SensorDeviceClass,
+    SensorEntity,
+    SensorStateClass,
+)
+from homeassistant.const import EntityCategory, UnitOfTime
+from homeassistant.core import callback
+from homeassistant.helpers.dispatcher import async_dispatcher_connect
+from homeassistant.helpers.update_coordinator import CoordinatorEntity
+
+from .const import DATA_COORDINATORS, SIGNAL_COORDINATOR_ADDED
+
+
+async def async_setup_platform(hass, config, async_add_entities, discovery_info=None):
+    """Add a latency sensor for every device, including devices set up later."""
+    if discovery_info is None:
+        return
+
+    @callback
+    def async_add_sensor(coordinator):
+        """Add the sensor of a device."""
+        async_add_entities([XiaomiMiioLatencySensor(coordinator)])
+
+    for coordinator in hass.data.get(DATA_COORDINATORS, {}).values():
+        async_add_sensor(coordinator)
+
+    async_dispatcher_connect(hass, SIGNAL_COORDINATOR_ADDED, async_add_sensor)
+
+
+class XiaomiMiioLatencySensor(CoordinatorEntity, SensorEntity):
+    """p99 latency of the requests to a device.
+
+    The attributes show the other percentiles and the failed requests.
+    The sensor is updated with every poll of the device and stays
+    available while the device doesn't respond.
+    """
+
+    _attr_device_class = SensorDeviceClass.DURATION
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_native_unit_of_measurement = UnitOfTime.MILLISECONDS
+    _attr_state_class = SensorStateClass.MEASUREMENT
+
+    def __init__(self, coordinator):
+        """Initialize the sensor."""
+        super().__init__(coordinator)
+        self._attr_name = f"{coordinator.host} request latency"
+        self._attr_unique_id = f"{coordinator.host}-request_latency"
+
+    @property
+    def available(self):
+        """Return true, the metrics are known while the device is down."""
+        return True
+
+    @property
+    def native_value(self):
+        """Return the p99 latency of the requests."""
+        latency = self.coordinator.metrics.requests.latency.percentile(0.99)
+        if latency is None:
+            return None
+
+        return round(latency * 1000, 1)
+
+    @property
+    def extra_state_attributes(self):
+        """Return the summary of the requests."""
+        metrics = self.coordinator.metrics
+        latency = metrics.requests.latency.as_dict()
+        latency.pop("buckets", None)
+        return {
+            "requests": latency.pop("count"),
+            **latency,
+            "timeouts": metrics.requests.timeouts,
+            "errors": metrics.requests.errors,
+            "retries": metrics.retries,
+            "circuit_breaker": self.coordinator.breaker.state,
+        }
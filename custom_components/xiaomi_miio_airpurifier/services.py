@@ -0,0 +1,99 @@
+"""Run the services of the Xiaomi Miio integration on the target devices."""
+
+import asyncio
+from contextvars import ContextVar
+import logging
+
+from homeassistant.const import ATTR_ENTITY_ID
+from homeassistant.core import SupportsResponse, callback
+
+from .const import (
+    CONF_SERVICE_CONCURRENCY,
+    DATA_CONFIG,
+    DEFAULT_SERVICE_CONCURRENCY,
+)
+from .registry import async_get_registry
+
+_LOGGER = logging.getLogger(__name__)
+
+# Errors of the device commands of the service call running in this context.
+_COMMAND_ERRORS = ContextVar("command_errors", default=None)
+
+
+def report_command_error(error):
+    """Record a failed command for the outcome of the current service call."""
+    errors = _COMMAND_ERRORS.get()
+    if errors is not None:
+        errors.append(str(error))
+
+
+async def async_call_devices(hass, devices, method, params):
+    """Call the service method on all devices concurrently.
+
+    At most ``service_concurrency`` devices are called at the same time.
+    Returns the outcome per entity id.
+    """
+    concurrency = hass.data.get(DATA_CONFIG, {}).get(
+        CONF_SERVICE_CONCURRENCY, DEFAULT_SERVICE_CONCURRENCY
+    )
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def async_call_device(device):
+        """Call the service method on a single device."""
+        errors = []
+        _COMMAND_ERRORS.set(errors)
+        async with semaphore:
+            try:
+                await getattr(device, method)(**params)
+            except Exception as ex:  # pylint: disable=broad-except
+                _LOGGER.error(
+                    "Calling %s of %s failed: %s", method, device.entity_id, ex
+                )
+                errors.append(str(ex))
+
+        device.async_write_ha_state()
+
+        if errors:
+            return {"success": False, "error": "; ".join(errors)}
+        return {"success": True}
+
+    # Every task runs in a copy of the context, so the errors don't mix.
+    outcomes = await asyncio.gather(*(async_call_device(device) for device in devices))
+
+    return {device.entity_id: outcome for device, outcome in zip(devices, outcomes)}
+
+
+@callback
+def async_register_services(hass, domain, services, schema):
+    """Register the services of a platform once.
+
+    ``services`` maps the services to the entity method, the feature flag
+    the method needs and the schema of the service data, if it isn't
+    ``schema``.
+    """
+    if hass.services.has_service(domain, next(iter(services))):
+        return
+
+    async def async_service_handler(service):
+        """Call the method of the service on the target entities."""
+        method = services.get(service.service)
+        params = {
+            key: value for key, value in service.data.items() if key != ATTR_ENTITY_ID
+        }
+        devices = async_get_registry(hass).async_get_devices(
+            method["method"], method.get("feature"), service.data.get(ATTR_ENTITY_ID)
+        )
+        outcomes = await async_call_devices(hass, devices, method["method"], params)
+
+        if service.return_response:
+            return outcomes
+        return None
+
+    for service, method in services.items():
+        hass.services.async_register(
+            domain,
+            service,
+            async_service_handler,
+            schema=method.get("schema", schema),
+            supports_response=SupportsResponse.OPTIONAL,
+        )
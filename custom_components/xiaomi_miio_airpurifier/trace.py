@@ -0,0 +1,139 @@
+"""Record the responses of Xiaomi Miio devices and replay them."""
+
+from collections import defaultdict
+import gzip
+import json
+import logging
+import threading
+import time
+
+from miio import DeviceException  # pylint: disable=import-error
+from miio.exceptions import DeviceError  # pylint: disable=import-error
+
+from .transport import ProtocolWrapper
+
+_LOGGER = logging.getLogger(__name__)
+
+TRACE_VERSION = 1
+
+
+def _request_key(command, parameters):
+    """Return the key matching a request to its recorded responses."""
+    return command, json.dumps(parameters, sort_keys=True)
+
+
+def read_trace(path):
+    """Return the header and the records of a trace file."""
+    with gzip.open(path, "rt", encoding="utf-8") as trace:
+        header = json.loads(trace.readline())
+        if header.get("version") != TRACE_VERSION:
+            raise ValueError(f"Unsupported trace version: {header.get('version')}")
+        return header, [json.loads(line) for line in trace]
+
+
+class TraceRecorder(ProtocolWrapper):
+    """Write the requests of a driver and their outcome to a trace file.
+
+    The trace is a gzip compressed file of JSON lines. The first line
+    holds the model, every other line a request with the seconds since
+    the start of the recording and either its result, the error replied
+    by the device or the message of the exception raised instead.
+    """
+
+    def __init__(self, protocol, path, model=None):
+        """Initialize the recorder."""
+        super().__init__(protocol)
+        self._path = path
+        self._model = model
+        self._file = None
+        self._start = None
+        self._lock = threading.Lock()
+
+    def send(self, command, parameters=None, retry_count=3, *, extra_parameters=None):
+        """Send the command and record the outcome."""
+        record = {"method": command, "params": parameters}
+        start = time.monotonic()
+        try:
+            result = super().send(
+                command, parameters, retry_count, extra_parameters=extra_parameters
+            )
+        except DeviceError as ex:
+            record["error"] = {"code": ex.code, "message": ex.message}
+            self._write(start, record)
+            raise
+        except DeviceException as ex:
+            record["exception"] = str(ex)
+            self._write(start, record)
+            raise
+
+        record["result"] = result
+        self._write(start, record)
+        return result
+
+    def _write(self, start, record):
+        """Append a record to the trace."""
+        with self._lock:
+            if self._file is None:
+                self._file = gzip.open(self._path, "wt", encoding="utf-8")
+                self._start = start
+                self._file.write(
+                    json.dumps({"version": TRACE_VERSION, "model": self._model}) + "\n"
+                )
+
+            record = {"t": round(start - self._start, 3), **record}
+            self._file.write(json.dumps(record) + "\n")
+            self._file.flush()
+
+    def close(self):
+        """Close the trace file."""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+class TraceReplayProtocol:
+    """Stand-in for ``MiIOProtocol`` which answers from a trace file.
+
+    Every request gets the next recorded response to the same command and
+    parameters, so a driver behaves as it did while recording, without
+    waiting for the device. The responses of a request start over once
+    they are used up. The trace is read on the first request.
+    """
+
+    def __init__(self, path, timeout=5):
+        """Initialize the protocol."""
+        self._path = path
+        self._timeout = timeout
+        self._responses = None
+        self._positions = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def send(self, command, parameters=None, retry_count=3, *, extra_parameters=None):
+        """Return the recorded response to the request."""
+        key = _request_key(command, parameters)
+        with self._lock:
+            if self._responses is None:
+                self._responses = defaultdict(list)
+                _, records = read_trace(self._path)
+                for record in records:
+                    self._responses[
+                        _request_key(record["method"], record["params"])
+                    ].append(record)
+
+            responses = self._responses.get(key)
+            if not responses:
+                raise DeviceException(f"{command} {parameters} isn't in the trace")
+
+            record = responses[self._positions[key] % len(responses)]
+            self._positions[key] += 1
+
+        if "error" in record:
+            raise DeviceError(record["error"])
+        if "exception" in record:
+            raise DeviceException(record["exception"])
+        return record["result"]
+
+    def send_handshake(self, *, retry_count=3):
+        """Pretend the device responded to the handshake."""
+        return None
@@ -0,0 +1,412 @@
+"""Asyncio based miIO transport for Xiaomi Miio devices."""
+
+import asyncio
+import binascii
+from datetime import timedelta
+import logging
+
+import construct  # pylint: disable=import-error
+from miio import DeviceException  # pylint: disable=import-error
+from miio.exceptions import (  # pylint: disable=import-error
+    DeviceError,
+    RecoverableError,
+)
+from miio.protocol import Message  # pylint: disable=import-error
+
+_LOGGER = logging.getLogger(__name__)
+
+MIIO_PORT = 54321
+
+HELLO_BYTES = bytes.fromhex(
+    "21310020ffffffffffffffffffffffffffffffffffffffffffffffffffffffff"
+)
+
+RECOVERABLE_ERRORS = [-30001, -9999]
+
+
+class ProtocolWrapper:
+    """Base class for wrappers around the ``MiIOProtocol`` of a driver.
+
+    Wrappers are installed as ``device._protocol`` and pass everything
+    they don't handle themselves to the wrapped protocol.
+    """
+
+    def __init__(self, protocol):
+        """Initialize the wrapper."""
+        self._protocol = protocol
+
+    def __getattr__(self, name):
+        return getattr(self._protocol, name)
+
+    def send(self, command, parameters=None, retry_count=3, *, extra_parameters=None):
+        """Send the command using the wrapped protocol."""
+        return self._protocol.send(
+            command, parameters, retry_count, extra_parameters=extra_parameters
+        )
+
+
+class MiioDatagramProtocol(asyncio.DatagramProtocol):
+    """Receive miIO datagrams and hand them to the waiting requests."""
+
+    def __init__(self, token):
+        """Initialize the protocol."""
+        self._token = token
+        self._transport = None
+        self._hello = None
+        self._requests = {}
+
+    def connection_made(self, transport):
+        """Store the datagram transport."""
+        self._transport = transport
+
+    def connection_lost(self, exc):
+        """Fail all pending requests."""
+        self._transport = None
+        self._fail_all(DeviceException("Connection lost"))
+
+    def error_received(self, exc):
+        """Fail all pending requests on socket errors like ICMP unreachable."""
+        _LOGGER.debug("Got socket error: %s", exc)
+        self._fail_all(exc)
+
+    def datagram_received(self, data, addr):
+        """Resolve the request the datagram is the response to."""
+        try:
+            if len(data) == 32:
+                message = Message.parse(data)
+                if self._hello is not None and not self._hello.done():
+                    self._hello.set_result(message)
+                return
+
+            message = Message.parse(data, token=self._token)
+            payload = message.data.value
+            request = self._requests.pop(payload["id"], None)
+        except construct.core.ChecksumError as ex:
+            self._fail_all(
+                DeviceException(
+                    "Got checksum error which indicates use "
+                    "of an invalid token. "
+                    "Please check your token!"
+                )
+            )
+            _LOGGER.debug("Unable to parse response from %s: %s", addr[0], ex)
+            return
+        except Exception as ex:  # pylint: disable=broad-except
+            _LOGGER.debug("Unable to parse response from %s: %s", addr[0], ex)
+            return
+
+        if request is None:
+            _LOGGER.debug("Dropping late response from %s: %s", addr[0], payload)
+            return
+
+        if not request.done():
+            request.set_result(message)
+
+    @property
+    def is_connected(self):
+        """Return true if the datagram endpoint is open."""
+        return self._transport is not None
+
+    def send_hello(self):
+        """Send a handshake and return the future of its response."""
+        if self._hello is None or self._hello.done():
+            self._hello = asyncio.get_running_loop().create_future()
+        self._transport.sendto(HELLO_BYTES)
+        return self._hello
+
+    def send_request(self, request_id, data):
+        """Send an encrypted request and return the future of its response."""
+        future = asyncio.get_running_loop().create_future()
+        self._requests[request_id] = future
+        self._transport.sendto(data)
+        return future
+
+    def cancel_request(self, request_id):
+        """Forget a request which timed out."""
+        self._requests.pop(request_id, None)
+
+    def close(self):
+        """Close the datagram endpoint."""
+        if self._transport is not None:
+            self._transport.close()
+
+    def _fail_all(self, exc):
+        waiters = list(self._requests.values())
+        if self._hello is not None:
+            waiters.append(self._hello)
+        self._requests.clear()
+        for waiter in waiters:
+            if not waiter.done():
+                waiter.set_exception(exc)
+
+
+class AsyncMiioTransport:
+    """Talk to a miIO device without blocking a thread per request.
+
+    The packet format, the handshake and the retry behaviour follow
+    ``miio.miioprotocol.MiIOProtocol``. Responses are matched to their
+    requests by the message id, so multiple requests can be in flight.
+    """
+
+    def __init__(self, host, token, timeout=5, retry_count=3):
+        """Initialize the transport."""
+        self.host = host
+        self._token = bytes.fromhex(token)
+        self._timeout = timeout
+        self._retry_count = retry_count
+        self._protocol = None
+        self._connect_lock = asyncio.Lock()
+        self._handshake_lock = asyncio.Lock()
+        self._discovered = False
+        self._device_id = bytes()
+        self._device_ts = None
+        self._id = 0
+
+    @classmethod
+    def from_device(cls, device):
+        """Create a transport using the connection settings of a driver."""
+        return cls(
+            device.ip,
+            device.token,
+            timeout=device._protocol._timeout,  # pylint: disable=protected-access
+            retry_count=device.retry_count,
+        )
+
+    @property
+    def device_id(self):
+        """Return the id of the device, known after the first handshake."""
+        return int.from_bytes(self._device_id, "big")
+
+    async def async_connect(self):
+        """Open the datagram endpoint if it isn't open yet."""
+        async with self._connect_lock:
+            if self._protocol is not None and self._protocol.is_connected:
+                return
+
+            loop = asyncio.get_running_loop()
+            try:
+                _, self._protocol = await loop.create_datagram_endpoint(
+                    lambda: MiioDatagramProtocol(self._token),
+                    remote_addr=(self.host, MIIO_PORT),
+                )
+            except OSError as ex:
+                raise DeviceException(
+                    f"Unable to open connection to {self.host}: {ex}"
+                ) from ex
+
+    async def async_close(self):
+        """Close the datagram endpoint."""
+        if self._protocol is not None:
+            self._protocol.close()
+            self._protocol = None
+        self._discovered = False
+
+    async def async_send_handshake(self, retry_count=3):
+        """Send a handshake to the device and store its id and timestamp."""
+        await self.async_connect()
+        async with self._handshake_lock:
+            for _ in range(retry_count + 1):
+                try:
+                    async with asyncio.timeout(self._timeout):
+                        message = await self._protocol.send_hello()
+                    break
+                except OSError:
+                    continue
+            else:
+                _LOGGER.debug("Unable to discover a device at address %s", self.host)
+                raise DeviceException(f"Unable to discover the device {self.host}")
+
+            header = message.header.value
+            self._device_id = header.device_id
+            self._device_ts = header.ts
+            self._discovered = True
+
+            _LOGGER.debug(
+                "Discovered %s with ts: %s",
+                binascii.hexlify(self._device_id).decode(),
+                self._device_ts,
+            )
+
+            return message
+
+    async def async_send(
+        self, command, parameters=None, retry_count=None, *, extra_parameters=None
+    ):
+        """Build and send the given command and return the result."""
+        if retry_count is None:
+            retry_count = self._retry_count
+
+        if not self._discovered:
+            await self.async_send_handshake()
+
+        request = self._create_request(command, parameters, extra_parameters)
+        header = {
+            "length": 0,
+            "unknown": 0x00000000,
+            "device_id": self._device_id,
+            "ts": self._device_ts + timedelta(seconds=1),
+        }
+        message = Message.build(
+            {"data": {"value": request}, "header": {"value": header}, "checksum": 0},
+            token=self._token,
+        )
+        _LOGGER.debug("%s:%s >>: %s", self.host, MIIO_PORT, request)
+
+        try:
+            try:
+                async with asyncio.timeout(self._timeout):
+                    response = await self._protocol.send_request(request["id"], message)
+            finally:
+                self._protocol.cancel_request(request["id"])
+
+            header = response.header.value
+            payload = response.data.value
+            self._device_ts = header["ts"]
+
+            _LOGGER.debug(
+                "%s:%s (ts: %s, id: %s) << %s",
+                self.host,
+                MIIO_PORT,
+                header["ts"],
+                payload["id"],
+                payload,
+            )
+            if "error" in payload:
+                self._handle_error(payload["error"])
+
+            try:
+                return payload["result"]
+            except KeyError:
+                return payload
+        except OSError as ex:
+            if retry_count > 0:
+                _LOGGER.debug(
+                    "Retrying with incremented id, retries left: %s", retry_count
+                )
+                self._id += 100
+                self._discovered = False
+                return await self.async_send(
+                    command,
+                    parameters,
+                    retry_count - 1,
+                    extra_parameters=extra_parameters,
+                )
+
+            _LOGGER.debug("Got error when receiving: %s", ex)
+            raise DeviceException("No response from the device") from ex
+        except RecoverableError as ex:
+            if retry_count > 0:
+                _LOGGER.debug(
+                    "Retrying to send failed command, retries left: %s", retry_count
+                )
+                return await self.async_send(
+                    command,
+                    parameters,
+                    retry_count - 1,
+                    extra_parameters=extra_parameters,
+                )
+
+            _LOGGER.debug("Got error when receiving: %s", ex)
+            raise DeviceException("Unable to recover failed command") from ex
+
+    async def async_call(self, func, *args, **kwargs):
+        """Call a method of a python-miio driver using this transport.
+
+        The drivers are synchronous and send their requests through
+        ``device._protocol.send``. The method is run with a protocol which
+        replays the responses received so far. Once it asks for a response
+        we don't have yet, the call is aborted, the request is sent
+        asynchronously and the method is run again. Drivers only do cheap
+        bookkeeping between requests, so running them again is fine.
+
+        The responses are replayed to the requests they answer, not in the
+        order they were received. A driver may skip a request on the next
+        run, e.g. ``miIO.info`` once the first run cached the model.
+        """
+        owner = func.__self__
+        # pylint: disable=protected-access
+        while isinstance(owner._protocol, ProtocolWrapper):
+            owner = owner._protocol
+
+        responses = []
+        while True:
+            protocol = _ReplayProtocol(owner._protocol, list(responses))
+            owner._protocol = protocol
+            try:
+                return func(*args, **kwargs)
+            except _PendingRequest as ex:
+                request = ex
+            finally:
+                owner._protocol = protocol._protocol
+
+            try:
+                result = await self.async_send(
+                    request.command,
+                    request.parameters,
+                    request.retry_count,
+                    extra_parameters=request.extra_parameters,
+                )
+            except DeviceException as ex:
+                result = _Failure(ex)
+            responses.append((request.command, request.parameters, result))
+
+    def _next_id(self):
+        self._id += 1
+        if self._id >= 9999:
+            self._id = 1
+        return self._id
+
+    def _create_request(self, command, parameters, extra_parameters=None):
+        request = {"id": self._next_id(), "method": command}
+        request["params"] = parameters if parameters is not None else []
+
+        if extra_parameters is not None:
+            request = {**request, **extra_parameters}
+
+        return request
+
+    @staticmethod
+    def _handle_error(error):
+        if "code" in error and error["code"] in RECOVERABLE_ERRORS:
+            raise RecoverableError(error)
+        raise DeviceError(error)
+
+
+class _PendingRequest(Exception):
+    """Raised by the replay protocol if a response isn't available yet."""
+
+    def __init__(self, command, parameters, retry_count, extra_parameters):
+        super().__init__(command)
+        self.command = command
+        self.parameters = parameters
+        self.retry_count = retry_count
+        self.extra_parameters = extra_parameters
+
+
+class _Failure:
+    """Exception raised by a request, replayed to the driver."""
+
+    def __init__(self, exception):
+        self.exception = exception
+
+
+class _ReplayProtocol(ProtocolWrapper):
+    """Stand-in for ``MiIOProtocol`` which replays recorded responses."""
+
+    def __init__(self, protocol, responses):
+        super().__init__(protocol)
+        self._responses = responses
+
+    def send(self, command, parameters=None, retry_count=3, *, extra_parameters=None):
+        """Return the recorded response to the request or request it."""
+        for index, (recorded, recorded_parameters, _) in enumerate(self._responses):
+            if recorded == command and recorded_parameters == parameters:
+                response = self._responses.pop(index)[2]
+                break
+        else:
+            raise _PendingRequest(command, parameters, retry_count, extra_parameters)
+
+        if isinstance(response, _Failure):
+            raise response.exception
+
+        return response
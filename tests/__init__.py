@@ -0,0 +1 @@
+"""Tests for the Xiaomi Miio integration."""
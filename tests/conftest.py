@@ -0,0 +1,14 @@
+"""Fixtures for the tests of the Xiaomi Miio integration."""
+
+# Import the integrations of this repository before the test plugin mounts
+# the custom_components of its own testing config.
+import custom_components  # noqa: F401
+import pytest
+
+pytest_plugins = "pytest_homeassistant_custom_component"
+
+
+@pytest.fixture(autouse=True)
+def auto_enable_custom_integrations(enable_custom_integrations):
+    """Load the integrations of this repository."""
+    yield
@@ -0,0 +1,115 @@
+"""Tests for the extraction of the state attributes."""
+
+from enum import Enum
+
+import pytest
+
+from custom_components.xiaomi_miio_airpurifier.attributes import (
+    AttributeExtractor,
+    StateAttributes,
+    get_schema,
+)
+
+
+class Mode(Enum):
+    """Mode of a fake status."""
+
+    Auto = "auto"
+
+
+class Status:
+    """Status which records the properties read."""
+
+    def __init__(self):
+        """Initialize the status."""
+        self.read = []
+
+    def __getattr__(self, name):
+        """Return a value of a property and record the read."""
+        self.read.append(name)
+        return Mode.Auto if name == "mode" else 1
+
+
+def test_subset_reads_only_its_properties() -> None:
+    """Test an extractor of some attributes only reads their properties."""
+    extractor = AttributeExtractor({"mode": "mode", "level": "favorite_level"})
+    status = Status()
+
+    values = extractor.subset({"mode", "is_on"})(status)
+
+    assert values == {"mode": "auto"}
+    assert status.read == ["mode"]
+
+
+def test_subset_is_kept_per_set_of_keys() -> None:
+    """Test the extractor of a set of keys is created once."""
+    extractor = AttributeExtractor({"mode": "mode", "level": "favorite_level"})
+
+    assert extractor.subset(["mode", "level"]) is extractor.subset({"level", "mode"})
+    assert extractor.subset(["mode"]) is not extractor.subset(["level"])
+
+
+def _attributes(values=None):
+    """Return attributes of the keys model, mode and aqi."""
+    return StateAttributes(get_schema(("model", "mode", "aqi")), values)
+
+
+def test_unset_keys_raise() -> None:
+    """Test unset keys can't be read or removed."""
+    attributes = _attributes({"model": "zhimi.airpurifier.ma4"})
+
+    with pytest.raises(KeyError):
+        attributes["mode"]
+    with pytest.raises(KeyError):
+        del attributes["mode"]
+    with pytest.raises(KeyError):
+        del attributes["unknown"]
+    assert attributes.get("mode", "auto") == "auto"
+
+    del attributes["model"]
+
+    with pytest.raises(KeyError):
+        attributes["model"]
+
+
+def test_keys_outside_the_index_are_kept() -> None:
+    """Test keys which aren't part of the shared index are stored too."""
+    attributes = _attributes({"mode": "auto", "speed": 2})
+    attributes["led"] = True
+
+    assert attributes["speed"] == 2
+    assert attributes.get("led") is True
+    assert attributes._extra == {"speed": 2, "led": True}
+
+    del attributes["speed"]
+
+    assert "speed" not in attributes
+    with pytest.raises(KeyError):
+        attributes["speed"]
+
+
+def test_unset_keys_are_skipped() -> None:
+    """Test only the keys which are set are counted and iterated."""
+    attributes = _attributes({"aqi": 10, "model": "zhimi.airpurifier.ma4"})
+    attributes["led"] = False
+
+    assert len(attributes) == 3
+    assert list(attributes) == ["model", "aqi", "led"]
+
+    attributes["aqi"] = None
+
+    assert len(attributes) == 3
+    assert attributes["aqi"] is None
+
+
+def test_as_dict_keeps_the_order_of_the_index() -> None:
+    """Test the keys of the index come first, in order, then the others."""
+    attributes = _attributes()
+    attributes.update({"led": True, "aqi": 10, "model": "zhimi.airpurifier.ma4"})
+
+    assert list(attributes.as_dict().items()) == [
+        ("model", "zhimi.airpurifier.ma4"),
+        ("aqi", 10),
+        ("led", True),
+    ]
+    assert attributes == {"model": "zhimi.airpurifier.ma4", "aqi": 10, "led": True}
@@ -0,0 +1,81 @@
+"""Tests for the circuit breaker."""
+
+from datetime import timedelta
+from unittest.mock import patch
+
+from custom_components.xiaomi_miio_airpurifier.breaker import (
+    STATE_CLOSED,
+    STATE_HALF_OPEN,
+    STATE_OPEN,
+    CircuitBreaker,
+)
+
+INTERVAL = timedelta(seconds=30)
+
+
+def test_breaker_opens_after_the_threshold() -> None:
+    """Test the breaker stays closed until the failures reach the threshold."""
+    breaker = CircuitBreaker(INTERVAL, threshold=3)
+
+    assert breaker.failure() is None
+    assert breaker.failure() is None
+    assert breaker.state == STATE_CLOSED
+
+    assert breaker.failure() is not None
+    assert breaker.is_open
+
+
+def test_success_resets_the_failures() -> None:
+    """Test a successful poll in between keeps the breaker closed."""
+    breaker = CircuitBreaker(INTERVAL, threshold=2)
+
+    breaker.failure()
+    breaker.success()
+
+    assert breaker.failure() is None
+    assert breaker.state == STATE_CLOSED
+
+
+@patch("random.random", return_value=1.0)
+def test_backoff_doubles_up_to_the_maximum(_random) -> None:
+    """Test the probe interval doubles after every failed probe."""
+    breaker = CircuitBreaker(INTERVAL, threshold=1, max_backoff=timedelta(minutes=2))
+
+    delays = [breaker.failure() for _ in range(5)]
+
+    assert delays == [
+        timedelta(seconds=30),
+        timedelta(minutes=1),
+        timedelta(minutes=2),
+        timedelta(minutes=2),
+        timedelta(minutes=2),
+    ]
+
+
+@patch("random.random", return_value=0.0)
+def test_backoff_is_randomized_by_up_to_half(_random) -> None:
+    """Test the probe interval is shortened by up to half."""
+    breaker = CircuitBreaker(INTERVAL, threshold=1)
+
+    assert breaker.failure() == timedelta(seconds=15)
+
+
+@patch("random.random", return_value=1.0)
+def test_half_open_breaker(_random) -> None:
+    """Test a probe half-opens the breaker and the next poll decides."""
+    breaker = CircuitBreaker(INTERVAL, threshold=1)
+    breaker.failure()
+
+    breaker.probe_succeeded()
+    assert breaker.state == STATE_HALF_OPEN
+    assert not breaker.is_open
+
+    # A failed poll opens the breaker again, backing off further.
+    assert breaker.failure() == timedelta(minutes=1)
+    assert breaker.state == STATE_OPEN
+
+    breaker.probe_succeeded()
+    breaker.success()
+    assert breaker.state == STATE_CLOSED
+    assert breaker.failures == 0
+    assert breaker.failure() == INTERVAL
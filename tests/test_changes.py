@@ -0,0 +1,86 @@
+"""Tests for the detection of state changes."""
+
+import pytest
+import voluptuous as vol
+
+from custom_components.xiaomi_miio_airpurifier.changes import (
+    THRESHOLDS_SCHEMA,
+    StateChangeFilter,
+)
+
+
+def _written(thresholds, attributes, available=True, state="on"):
+    """Return a filter which wrote the state."""
+    changes = StateChangeFilter(thresholds)
+    changes.written(available, state, attributes)
+    return changes
+
+
+def test_first_state_is_written() -> None:
+    """Test the state is written if nothing was written yet."""
+    assert StateChangeFilter().has_changed(True, "on", {})
+
+
+def test_same_state_is_skipped() -> None:
+    """Test an unchanged state isn't written again."""
+    changes = _written(None, {"aqi": 10, "mode": "auto"})
+
+    assert not changes.has_changed(True, "on", {"aqi": 10, "mode": "auto"})
+
+
+@pytest.mark.parametrize(
+    ("available", "state", "attributes"),
+    [
+        (False, "on", {"aqi": 10}),
+        (True, "off", {"aqi": 10}),
+        (True, "on", {"aqi": 11}),
+        (True, "on", {"aqi": 10, "mode": "auto"}),
+    ],
+)
+def test_changes_are_written(available, state, attributes) -> None:
+    """Test any change is written without a threshold."""
+    changes = _written(None, {"aqi": 10})
+
+    assert changes.has_changed(available, state, attributes)
+
+
+def test_changes_below_the_threshold_are_skipped() -> None:
+    """Test numeric changes smaller than the threshold are skipped."""
+    changes = _written({"temperature": 0.5}, {"temperature": 21.0})
+
+    assert not changes.has_changed(True, "on", {"temperature": 21.4})
+    assert not changes.has_changed(True, "on", {"temperature": 20.6})
+    assert changes.has_changed(True, "on", {"temperature": 21.5})
+
+
+def test_small_changes_add_up() -> None:
+    """Test small changes are compared with the value written last."""
+    changes = _written({"temperature": 0.5}, {"temperature": 21.0})
+
+    assert not changes.has_changed(True, "on", {"temperature": 21.3})
+    assert changes.has_changed(True, "on", {"temperature": 21.6})
+
+
+@pytest.mark.parametrize(("written", "value"), [(1, None), (True, False), (0, "0")])
+def test_threshold_only_applies_to_numbers(written, value) -> None:
+    """Test changes from or to values which aren't numbers are written."""
+    changes = _written({"level": 5}, {"level": written})
+
+    assert changes.has_changed(True, "on", {"level": value})
+
+
+def test_reset_writes_the_next_state() -> None:
+    """Test the next state is written after a reset."""
+    changes = _written(None, {"aqi": 10})
+
+    changes.reset()
+
+    assert changes.has_changed(True, "on", {"aqi": 10})
+
+
+def test_thresholds_schema() -> None:
+    """Test the thresholds are positive numbers."""
+    assert THRESHOLDS_SCHEMA({"temperature": "0.5"}) == {"temperature": 0.5}
+
+    with pytest.raises(vol.Invalid):
+        THRESHOLDS_SCHEMA({"temperature": -1})
@@ -0,0 +1,165 @@
+"""Tests for the request queue of a device."""
+
+import asyncio
+
+from miio import AirPurifierMiot
+
+from custom_components.xiaomi_miio_airpurifier.command_queue import (
+    PRIORITY_COMMAND,
+    PRIORITY_POLL,
+    CommandQueue,
+)
+from custom_components.xiaomi_miio_airpurifier.metrics import method_name
+
+
+class FakeDevice:
+    """Record the requests sent by the queue and hold back the first one."""
+
+    def __init__(self):
+        """Initialize the fake."""
+        self.driver = AirPurifierMiot("127.0.0.1", "0" * 32)
+        self.sent = []
+        self.release = asyncio.Event()
+
+    async def async_call(self, func, *args, **kwargs):
+        """Record the request and answer with its method and arguments."""
+        self.sent.append((method_name(func), args))
+        if len(self.sent) == 1:
+            await self.release.wait()
+        return method_name(func), args
+
+
+async def _async_submit_while_busy(hass, device, queue, requests):
+    """Submit the requests while the queue is sending another one."""
+    busy = hass.async_create_task(
+        queue.async_submit(PRIORITY_POLL, device.driver.status)
+    )
+    await asyncio.sleep(0)
+    tasks = []
+    for priority, func, *args in requests:
+        tasks.append(hass.async_create_task(queue.async_submit(priority, func, *args)))
+        await asyncio.sleep(0)
+
+    device.release.set()
+    await busy
+    return [await task for task in tasks]
+
+
+async def test_different_commands_are_not_merged(hass):
+    """Test that pending commands of different driver methods are all sent."""
+    device = FakeDevice()
+    queue = CommandQueue(hass, device.async_call, "test")
+
+    results = await _async_submit_while_busy(
+        hass,
+        device,
+        queue,
+        [
+            (PRIORITY_COMMAND, device.driver.set_buzzer, True),
+            (PRIORITY_COMMAND, device.driver.set_led, False),
+        ],
+    )
+
+    assert device.sent[1:] == [("set_buzzer", (True,)), ("set_led", (False,))]
+    assert results == [("set_buzzer", (True,)), ("set_led", (False,))]
+
+
+async def test_different_raw_commands_are_not_merged(hass):
+    """Test that raw requests of different device commands are all sent."""
+    device = FakeDevice()
+    queue = CommandQueue(hass, device.async_call, "test")
+
+    await _async_submit_while_busy(
+        hass,
+        device,
+        queue,
+        [
+            (PRIORITY_COMMAND, device.driver.send, "send_data_frame", {}),
+            (PRIORITY_COMMAND, device.driver.send, "miIO.xdel", []),
+        ],
+    )
+
+    assert device.sent[1:] == [
+        ("send", ("send_data_frame", {})),
+        ("send", ("miIO.xdel", [])),
+    ]
+
+
+async def test_same_command_is_merged(hass):
+    """Test that a pending command is updated with the latest arguments."""
+    device = FakeDevice()
+    queue = CommandQueue(hass, device.async_call, "test")
+
+    results = await _async_submit_while_busy(
+        hass,
+        device,
+        queue,
+        [
+            (PRIORITY_COMMAND, device.driver.set_favorite_level, 5),
+            (PRIORITY_COMMAND, device.driver.set_favorite_level, 8),
+        ],
+    )
+
+    assert device.sent[1:] == [("set_favorite_level", (8,))]
+    assert results == [("set_favorite_level", (8,))] * 2
+
+
+async def test_identical_polls_are_merged(hass):
+    """Test that identical pending polls are sent once."""
+    device = FakeDevice()
+    queue = CommandQueue(hass, device.async_call, "test")
+
+    results = await _async_submit_while_busy(
+        hass,
+        device,
+        queue,
+        [
+            (PRIORITY_POLL, device.driver.status),
+            (PRIORITY_POLL, device.driver.status),
+        ],
+    )
+
+    assert device.sent[1:] == [("status", ())]
+    assert results == [("status", ())] * 2
+
+
+async def test_different_polls_are_not_merged(hass):
+    """Test that polls with different arguments are all sent."""
+    device = FakeDevice()
+    queue = CommandQueue(hass, device.async_call, "test")
+
+    await _async_submit_while_busy(
+        hass,
+        device,
+        queue,
+        [
+            (PRIORITY_POLL, device.driver.send, "get_properties", [1]),
+            (PRIORITY_POLL, device.driver.send, "get_properties", [2]),
+        ],
+    )
+
+    assert device.sent[1:] == [
+        ("send", ("get_properties", [1])),
+        ("send", ("get_properties", [2])),
+    ]
+
+
+async def test_commands_are_sent_before_polls(hass):
+    """Test that a command doesn't wait behind a pending poll."""
+    device = FakeDevice()
+    queue = CommandQueue(hass, device.async_call, "test")
+
+    await _async_submit_while_busy(
+        hass,
+        device,
+        queue,
+        [
+            (PRIORITY_POLL, device.driver.send, "get_properties", [1]),
+            (PRIORITY_COMMAND, device.driver.set_led, True),
+        ],
+    )
+
+    assert device.sent[1:] == [
+        ("set_led", (True,)),
+        ("send", ("get_properties", [1])),
+    ]
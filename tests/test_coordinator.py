@@ -0,0 +1,142 @@
+"""Tests for the shared per-host update coordinator."""
+
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+
+from miio import DeviceException
+import pytest
+import voluptuous as vol
+
+from custom_components.xiaomi_miio_airpurifier import coordinator as coordinator_module
+from custom_components.xiaomi_miio_airpurifier.coordinator import (
+    COORDINATOR_SCHEMA,
+    async_get_coordinator,
+)
+from custom_components.xiaomi_miio_airpurifier.entity import XiaomiMiioEntity
+from custom_components.xiaomi_miio_airpurifier.profiles import ModelProfile
+from homeassistant.const import (
+    EVENT_HOMEASSISTANT_STOP,
+    STATE_ON,
+    STATE_UNAVAILABLE,
+)
+from homeassistant.helpers.entity import ToggleEntity
+from pytest_homeassistant_custom_component.common import MockEntityPlatform
+
+HOST = "192.168.1.2"
+MODEL = "zhimi.airpurifier.ma4"
+CONFIG = vol.Schema(COORDINATOR_SCHEMA)({})
+
+
+class FakeEntity(XiaomiMiioEntity, ToggleEntity):
+    """Entity showing the power and the mode of a device."""
+
+
+PROFILE = ModelProfile(
+    driver=None,
+    entity_class=FakeEntity,
+    features=0,
+    attributes={"mode": "mode"},
+    preset_modes=[],
+)
+
+
+@pytest.fixture(autouse=True)
+def executor():
+    """Run the requests of the coordinators on the event loop."""
+    executor = SimpleNamespace(
+        async_run=AsyncMock(side_effect=lambda func, *args: func(*args))
+    )
+    with patch.object(coordinator_module, "async_get_executor", return_value=executor):
+        yield executor
+
+
+class FakeDevice:
+    """Device returning the statuses or raising the exceptions in turn."""
+
+    def __init__(self, *statuses):
+        """Initialize the device."""
+        self._protocol = object()
+        self._statuses = list(statuses)
+        self.polls = 0
+
+    def status(self):
+        """Return the next status."""
+        self.polls += 1
+        status = self._statuses.pop(0)
+        if isinstance(status, Exception):
+            raise status
+        return status
+
+
+def _status(mode="auto"):
+    """Return a status of a device which is on."""
+    return SimpleNamespace(is_on=True, mode=mode)
+
+
+async def _add_entities(hass, coordinator, count):
+    """Add entities of the device of the coordinator."""
+    entities = [
+        FakeEntity(f"Fan {index}", coordinator, MODEL, f"fan-{index}", PROFILE, None)
+        for index in range(count)
+    ]
+    await MockEntityPlatform(hass).async_add_entities(entities)
+    return entities
+
+
+async def test_entities_of_a_host_share_the_polls(hass) -> None:
+    """Test the entities of a host are updated by a single status request."""
+    device = FakeDevice(_status())
+    coordinator = await async_get_coordinator(hass, HOST, device, CONFIG)
+
+    assert await async_get_coordinator(hass, HOST, FakeDevice(), CONFIG) is coordinator
+
+    entities = await _add_entities(hass, coordinator, 2)
+    await coordinator.async_refresh()
+
+    assert device.polls == 1
+    for entity in entities:
+        state = hass.states.get(entity.entity_id)
+        assert state.state == STATE_ON
+        assert state.attributes["mode"] == "auto"
+
+
+async def test_retries_return_the_last_status(hass) -> None:
+    """Test a failed poll returns the last status until the retries run out."""
+    status = _status()
+    device = FakeDevice(status, DeviceException("timeout"), DeviceException("timeout"))
+    coordinator = await async_get_coordinator(hass, HOST, device, CONFIG, retries=2)
+
+    await coordinator.async_refresh()
+    await coordinator.async_refresh()
+
+    assert coordinator.last_update_success
+    assert coordinator.data is status
+    assert coordinator.metrics.retries == 1
+
+    await coordinator.async_refresh()
+
+    assert not coordinator.last_update_success
+
+
+async def test_failed_poll_makes_the_entities_unavailable(hass) -> None:
+    """Test the entities are unavailable once the poll fails."""
+    device = FakeDevice(_status(), DeviceException("timeout"))
+    coordinator = await async_get_coordinator(hass, HOST, device, CONFIG)
+    [entity] = await _add_entities(hass, coordinator, 1)
+
+    await coordinator.async_refresh()
+    assert hass.states.get(entity.entity_id).state == STATE_ON
+
+    await coordinator.async_refresh()
+    assert hass.states.get(entity.entity_id).state == STATE_UNAVAILABLE
+
+
+async def test_coordinator_is_shut_down_with_home_assistant(hass) -> None:
+    """Test the coordinator stops polling when Home Assistant stops."""
+    coordinator = await async_get_coordinator(hass, HOST, FakeDevice(), CONFIG)
+    coordinator.async_shutdown = AsyncMock()
+
+    hass.bus.async_fire(EVENT_HOMEASSISTANT_STOP)
+    await hass.async_block_till_done()
+
+    coordinator.async_shutdown.assert_called_once()
@@ -0,0 +1,121 @@
+"""Tests for the cache of the device info."""
+
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+
+from miio import DeviceException
+import pytest
+
+from custom_components.xiaomi_miio_airpurifier import device_info
+from custom_components.xiaomi_miio_airpurifier.device_info import (
+    STORAGE_KEY,
+    DeviceInfoCache,
+    async_wait_for_device_info,
+)
+
+HOST = "192.168.1.2"
+TOKEN = "0" * 32
+
+INFO = {
+    "model": "zhimi.airpurifier.ma4",
+    "mac_address": "AA:BB:CC:DD:EE:FF",
+    "firmware_version": "2.0.0",
+    "hardware_version": "esp32",
+}
+
+
+@pytest.fixture
+def device():
+    """Patch the device asked for its info."""
+    executor = SimpleNamespace(async_run=AsyncMock(side_effect=lambda func: func()))
+    with (
+        patch.object(device_info, "async_get_executor", return_value=executor),
+        patch.object(device_info, "Device") as device,
+    ):
+        device.return_value.info.return_value = SimpleNamespace(**INFO)
+        yield device.return_value
+
+
+def _cached(hass_storage, info):
+    """Store the info of the device as cached by an earlier run."""
+    hass_storage[STORAGE_KEY] = {
+        "version": 1,
+        "key": STORAGE_KEY,
+        "data": {device_info._cache_key(HOST, TOKEN): info},
+    }
+
+
+async def test_info_is_fetched_and_cached(hass, device) -> None:
+    """Test the info of a device which isn't cached is fetched."""
+    cache = DeviceInfoCache(hass)
+
+    assert await cache.async_get(HOST, TOKEN) == INFO
+    assert cache.async_get_cached(HOST, TOKEN) == INFO
+    assert TOKEN not in device_info._cache_key(HOST, TOKEN)
+
+
+async def test_unreachable_device_raises(hass, device) -> None:
+    """Test a device which isn't cached and doesn't respond raises."""
+    device.info.side_effect = DeviceException("timeout")
+
+    with pytest.raises(DeviceException):
+        await DeviceInfoCache(hass).async_get(HOST, TOKEN)
+
+
+async def test_cached_info_is_returned(hass, hass_storage, device) -> None:
+    """Test the cached info is returned without asking the device."""
+    _cached(hass_storage, INFO)
+
+    assert await DeviceInfoCache(hass).async_get(HOST, TOKEN) == INFO
+    device.info.assert_not_called()
+
+
+def _coordinator(response):
+    """Return a coordinator which reads the response as the info."""
+    return SimpleNamespace(async_read_info=AsyncMock(side_effect=[response]))
+
+
+async def test_cached_info_is_refreshed(hass, hass_storage, device) -> None:
+    """Test the cached info is refreshed by the coordinator of the device."""
+    _cached(hass_storage, {**INFO, "firmware_version": "1.0.0"})
+    cache = DeviceInfoCache(hass)
+    coordinator = _coordinator(SimpleNamespace(**INFO))
+
+    assert (await cache.async_get(HOST, TOKEN))["firmware_version"] == "1.0.0"
+    await cache.async_refresh(HOST, TOKEN, coordinator)
+
+    coordinator.async_read_info.assert_called_once_with()
+    assert cache.async_get_cached(HOST, TOKEN) == INFO
+    device.info.assert_not_called()
+
+
+async def test_failed_refresh_keeps_the_cached_info(hass, hass_storage, device) -> None:
+    """Test the cached info is kept if the device doesn't respond."""
+    _cached(hass_storage, INFO)
+    cache = DeviceInfoCache(hass)
+    await cache.async_get(HOST, TOKEN)
+
+    await cache.async_refresh(HOST, TOKEN, _coordinator(DeviceException("timeout")))
+
+    assert cache.async_get_cached(HOST, TOKEN) == INFO
+
+
+async def test_fetched_info_is_not_refreshed(hass, device) -> None:
+    """Test the info fetched during the setup isn't requested again."""
+    cache = DeviceInfoCache(hass)
+    coordinator = _coordinator(SimpleNamespace(**INFO))
+    await cache.async_get(HOST, TOKEN)
+
+    await cache.async_refresh(HOST, TOKEN, coordinator)
+
+    coordinator.async_read_info.assert_not_called()
+
+
+async def test_wait_for_device_info_retries(hass, device) -> None:
+    """Test the info is fetched once the device responds."""
+    device.info.side_effect = [DeviceException("timeout"), SimpleNamespace(**INFO)]
+
+    with patch.object(device_info, "RETRY_DELAY", 0):
+        assert await async_wait_for_device_info(hass, HOST, TOKEN) == INFO
+
+    assert device.info.call_count == 2
@@ -0,0 +1,242 @@
+"""Tests for the base of the entities."""
+
+from datetime import timedelta
+import logging
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, Mock, patch
+
+from miio import DeviceException
+import pytest
+
+from custom_components.xiaomi_miio_airpurifier import (
+    coordinator as coordinator_module,
+    entity as entity_module,
+)
+from custom_components.xiaomi_miio_airpurifier.const import DATA_COORDINATORS
+from custom_components.xiaomi_miio_airpurifier.entity import (
+    SUCCESS,
+    XiaomiMiioEntity,
+    async_setup_device,
+)
+from custom_components.xiaomi_miio_airpurifier.fan import PLATFORM_SCHEMA
+from custom_components.xiaomi_miio_airpurifier.optimistic import CONFIRM_ATTEMPTS
+from custom_components.xiaomi_miio_airpurifier.profiles import ModelProfile
+from homeassistant.const import STATE_ON, STATE_UNAVAILABLE
+from homeassistant.helpers.entity import ToggleEntity
+from pytest_homeassistant_custom_component.common import MockEntityPlatform
+
+HOST = "192.168.1.2"
+TOKEN = "0" * 32
+MODEL = "zhimi.airpurifier.ma4"
+SCAN_INTERVAL = timedelta(seconds=30)
+
+
+class FakeEntity(XiaomiMiioEntity, ToggleEntity):
+    """Entity showing the power and the mode of a device."""
+
+    def __init__(self, name, coordinator, model, unique_id, thresholds=None):
+        """Initialize the entity."""
+        super().__init__(name, coordinator, model, unique_id, PROFILE, thresholds)
+
+
+class FakeDevice:
+    """Device which responds from the second status request on."""
+
+    def __init__(self, host, token, model=None):
+        """Initialize the device."""
+        self._protocol = object()
+        self.polls = 0
+
+    def status(self):
+        """Return a status of a device which is on, after the first poll."""
+        self.polls += 1
+        if self.polls == 1:
+            raise DeviceException("timeout")
+        return SimpleNamespace(is_on=True, mode="auto")
+
+    def info(self):
+        """Fail to return the info of the device."""
+        raise DeviceException("timeout")
+
+
+PROFILE = ModelProfile(
+    driver=FakeDevice,
+    entity_class=FakeEntity,
+    features=0,
+    attributes={"mode": "mode"},
+    preset_modes=[],
+)
+
+
+def _status(mode="auto", is_on=True):
+    """Return a status of a device."""
+    return SimpleNamespace(is_on=is_on, mode=mode)
+
+
+def _entity(*reads):
+    """Return an entity showing the auto mode, whose reads return the statuses.
+
+    A read status becomes the data of the coordinator, like a status read
+    by the coordinator does.
+    """
+    coordinator = SimpleNamespace(
+        device=None,
+        data=_status(),
+        last_update_success=True,
+        breaker=SimpleNamespace(state="closed"),
+        async_send_command=AsyncMock(return_value=SUCCESS),
+        async_command_sent=Mock(),
+    )
+    reads = list(reads)
+
+    async def async_read_status(reader):
+        read = reads.pop(0)
+        if isinstance(read, Exception):
+            raise read
+        coordinator.data = read
+        return read
+
+    coordinator.async_read_status = async_read_status
+    entity = FakeEntity("Fan", coordinator, MODEL, "fan")
+    entity.async_write_ha_state = Mock()
+    entity._async_schedule_confirm = Mock()
+    entity._handle_coordinator_update()
+    return entity
+
+
+async def _set_silent(entity):
+    """Set the silent mode, expecting it to be shown."""
+    assert await entity._try_optimistic_command(
+        {"mode": "silent"}, "Setting the mode failed: %s", Mock()
+    )
+    assert entity._state_attrs["mode"] == "silent"
+    entity._async_schedule_confirm.assert_called_once_with()
+
+
+async def test_confirmed_values_are_kept() -> None:
+    """Test the expected values stay once the device reports them."""
+    entity = _entity(_status(mode="silent"))
+    await _set_silent(entity)
+
+    await entity._async_confirm(1)
+
+    assert entity._optimistic.expected == {}
+    assert entity._state_attrs["mode"] == "silent"
+    entity._async_schedule_confirm.assert_called_once_with()
+
+
+async def test_mismatch_is_read_again() -> None:
+    """Test the values are read again while the device reports other values."""
+    entity = _entity(_status())
+    await _set_silent(entity)
+
+    await entity._async_confirm(1)
+
+    entity._async_schedule_confirm.assert_called_with(2)
+    assert entity._optimistic.expected == {"mode": "silent"}
+    assert entity._state_attrs["mode"] == "silent"
+
+
+async def test_mismatch_on_the_last_attempt_rolls_back() -> None:
+    """Test the values of the device are shown after the last attempt."""
+    entity = _entity(_status())
+    await _set_silent(entity)
+
+    await entity._async_confirm(CONFIRM_ATTEMPTS)
+
+    assert entity._optimistic.expected == {}
+    assert entity._state_attrs["mode"] == "auto"
+
+
+async def test_failed_read_is_retried_and_settles() -> None:
+    """Test a read which fails is retried and the last status shown after all."""
+    entity = _entity(DeviceException("timeout"), DeviceException("timeout"))
+    await _set_silent(entity)
+
+    await entity._async_confirm(1)
+
+    entity._async_schedule_confirm.assert_called_with(2)
+    assert entity._state_attrs["mode"] == "silent"
+
+    await entity._async_confirm(CONFIRM_ATTEMPTS)
+
+    assert entity._optimistic.expected == {}
+    assert entity._state_attrs["mode"] == "auto"
+
+
+@pytest.fixture
+def device_info():
+    """Patch the detection of the model and the executor of the coordinators."""
+    executor = SimpleNamespace(
+        async_run=AsyncMock(side_effect=lambda func, *args: func(*args))
+    )
+    info = {
+        "model": MODEL,
+        "mac_address": "AA:BB:CC:DD:EE:FF",
+        "firmware_version": "2.0.0",
+        "hardware_version": "esp32",
+    }
+    with (
+        patch.object(coordinator_module, "async_get_executor", return_value=executor),
+        patch.object(
+            entity_module,
+            "async_wait_for_device_info",
+            AsyncMock(return_value=info),
+        ) as wait_for_device_info,
+    ):
+        yield wait_for_device_info
+
+
+def _config():
+    """Return the config of a device set up in the background."""
+    return PLATFORM_SCHEMA(
+        {
+            "platform": "xiaomi_miio_airpurifier",
+            "host": HOST,
+            "token": TOKEN,
+            "name": "Fan",
+            "background_setup": True,
+        }
+    )
+
+
+async def test_entity_is_added_before_the_first_status(hass, device_info) -> None:
+    """Test the entity is unavailable until the device responds."""
+    platform = MockEntityPlatform(hass)
+    polls_when_added = []
+
+    def async_add_entities(entities):
+        coordinator = hass.data[DATA_COORDINATORS][HOST]
+        polls_when_added.append(coordinator.device.polls)
+        hass.async_create_task(platform.async_add_entities(entities))
+
+    assert (
+        await async_setup_device(
+            hass, _config(), async_add_entities, lambda model: PROFILE, SCAN_INTERVAL
+        )
+        is None
+    )
+    await hass.async_block_till_done(wait_background_tasks=True)
+
+    assert polls_when_added == [0]
+    device_info.assert_called_once_with(hass, HOST, TOKEN)
+    assert hass.states.get("test_domain.fan").state == STATE_UNAVAILABLE
+
+    await hass.data[DATA_COORDINATORS][HOST].async_refresh()
+
+    assert hass.states.get("test_domain.fan").state == STATE_ON
+
+
+async def test_unsupported_model_is_logged(hass, device_info, caplog) -> None:
+    """Test an unsupported model detected in the background is only logged."""
+    async_add_entities = Mock()
+
+    with caplog.at_level(logging.ERROR):
+        await async_setup_device(
+            hass, _config(), async_add_entities, lambda model: None, SCAN_INTERVAL
+        )
+        await hass.async_block_till_done(wait_background_tasks=True)
+
+    assert "Unsupported device found" in caplog.text
+    async_add_entities.assert_not_called()
+    assert DATA_COORDINATORS not in hass.data
@@ -0,0 +1,57 @@
+"""Tests for the fan entities."""
+
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, Mock
+
+from miio import AirDogX3, DeviceException
+
+from custom_components.xiaomi_miio_airpurifier.entity import SUCCESS
+from custom_components.xiaomi_miio_airpurifier.fan import (
+    ATTR_MODE,
+    ATTR_SPEED,
+    MODEL_AIRPURIFIER_AIRDOG_X3,
+    XiaomiAirDog,
+)
+
+
+def _airdog(result):
+    """Return an AirDog entity which is off and whose commands end in result."""
+    coordinator = SimpleNamespace(
+        device=AirDogX3("127.0.0.1", "0" * 32),
+        async_send_command=AsyncMock(side_effect=[result, result]),
+        async_command_sent=Mock(),
+    )
+    entity = XiaomiAirDog("AirDog", coordinator, MODEL_AIRPURIFIER_AIRDOG_X3, "id")
+    entity.async_write_ha_state = Mock()
+    entity._async_schedule_confirm = Mock()
+    entity._command_failed = Mock()
+    entity._available = True
+    entity._state = False
+    entity._state_attrs.update({ATTR_MODE: "auto", ATTR_SPEED: 1})
+    return entity
+
+
+async def test_airdog_turn_on_with_preset_expects_on() -> None:
+    """Test the device is expected to be on after a preset mode was set."""
+    entity = _airdog(SUCCESS)
+
+    await entity.async_turn_on(preset_mode="Night mode")
+
+    assert entity.is_on is True
+    assert entity._optimistic.expected == {
+        "is_on": True,
+        ATTR_MODE: "sleep",
+        ATTR_SPEED: 1,
+    }
+
+
+async def test_airdog_turn_on_with_failed_preset_rolls_back() -> None:
+    """Test nothing stays expected if setting the preset mode failed."""
+    entity = _airdog(DeviceException("timeout"))
+
+    await entity.async_turn_on(preset_mode="Night mode")
+
+    assert entity.is_on is False
+    assert entity._state_attrs[ATTR_MODE] == "auto"
+    assert entity._optimistic.expected == {}
+    entity._command_failed.assert_called_once()
@@ -0,0 +1,101 @@
+"""Tests for the metrics of the requests."""
+
+from types import SimpleNamespace
+
+from miio import DeviceError, DeviceException
+
+from custom_components.xiaomi_miio_airpurifier.const import DATA_COORDINATORS
+from custom_components.xiaomi_miio_airpurifier.device_info import (
+    STORAGE_KEY,
+    _cache_key,
+    async_get_device_info_cache,
+)
+from custom_components.xiaomi_miio_airpurifier.metrics import (
+    DeviceMetrics,
+    Histogram,
+    async_get_metrics,
+)
+from custom_components.xiaomi_miio_airpurifier.registry import async_get_registry
+
+HOST = "192.168.1.2"
+TOKEN = "0" * 32
+MODEL = "zhimi.airpurifier.ma4"
+
+
+def _histogram(*latencies):
+    """Return a histogram of the latencies."""
+    histogram = Histogram()
+    for seconds in latencies:
+        histogram.record(seconds)
+    return histogram
+
+
+def test_percentile_without_samples() -> None:
+    """Test no percentile is estimated without a request."""
+    assert _histogram().percentile(0.5) is None
+    assert _histogram().as_dict() == {"count": 0}
+
+
+def test_percentile_is_the_bound_of_its_bucket() -> None:
+    """Test the percentiles are estimated by the upper bounds of the buckets."""
+    histogram = _histogram(*[0.005] * 98, 0.3, 3)
+
+    assert histogram.percentile(0.5) == 0.01
+    assert histogram.percentile(0.99) == 0.5
+    assert histogram.percentile(1) == 3
+
+
+def test_percentile_is_capped_by_the_longest_latency() -> None:
+    """Test a percentile isn't estimated above the longest latency."""
+    assert _histogram(0.03).percentile(0.5) == 0.03
+    assert _histogram(0.03, 30).percentile(0.99) == 30
+
+
+def test_timeouts_and_errors_are_counted() -> None:
+    """Test failed requests count as errors if the device replied an error."""
+    error = DeviceError({"code": -5001, "message": "command error"})
+    wrapped = DeviceException("command failed")
+    wrapped.__cause__ = error
+    metrics = DeviceMetrics()
+
+    metrics.record("status", 0.02)
+    metrics.record("status", 5, DeviceException("timeout"))
+    metrics.record("set_mode", 0.1, error)
+    metrics.record("set_mode", 0.1, wrapped)
+
+    summary = metrics.as_dict()
+    assert summary["latency"]["count"] == 4
+    assert (summary["timeouts"], summary["errors"]) == (1, 2)
+    assert summary["failed_time_s"] == 5.2
+    assert summary["methods"]["status"]["timeouts"] == 1
+    assert summary["methods"]["set_mode"]["errors"] == 2
+
+
+async def test_metrics_of_the_devices(hass, hass_storage) -> None:
+    """Test the metrics of a device show its entity, model and firmware."""
+    hass_storage[STORAGE_KEY] = {
+        "version": 1,
+        "key": STORAGE_KEY,
+        "data": {_cache_key(HOST, TOKEN): {"model": MODEL, "firmware_version": "2"}},
+    }
+    await async_get_device_info_cache(hass).async_get(HOST, TOKEN)
+    async_get_registry(hass).async_add(SimpleNamespace(entity_id="fan.air"), HOST)
+    metrics = DeviceMetrics()
+    metrics.record("status", 0.02)
+    hass.data[DATA_COORDINATORS] = {
+        HOST: SimpleNamespace(
+            device=SimpleNamespace(token=TOKEN),
+            breaker=SimpleNamespace(state="closed"),
+            metrics=metrics,
+            _model=MODEL,
+        )
+    }
+
+    device = async_get_metrics(hass)["devices"][HOST]
+
+    assert device["entity_id"] == "fan.air"
+    assert device["model"] == MODEL
+    assert device["firmware_version"] == "2"
+    assert device["circuit_breaker"] == "closed"
+    assert device["latency"]["count"] == 1
+    assert "executor" not in async_get_metrics(hass)
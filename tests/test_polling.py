@@ -0,0 +1,78 @@
+"""Tests for the adaptive polling interval."""
+
+from datetime import timedelta
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from custom_components.xiaomi_miio_airpurifier.polling import (
+    COMMAND_BURST,
+    AdaptivePolling,
+)
+
+INTERVAL = timedelta(seconds=30)
+MIN_INTERVAL = timedelta(seconds=10)
+MAX_INTERVAL = timedelta(minutes=2)
+
+
+def _status(aqi=10, is_on=True):
+    """Return a status of a device."""
+    return SimpleNamespace(aqi=aqi, is_on=is_on)
+
+
+def _polling():
+    """Return the polling interval of a device."""
+    return AdaptivePolling(INTERVAL, MIN_INTERVAL, MAX_INTERVAL)
+
+
+def test_stable_device_is_polled_less_often() -> None:
+    """Test the interval doubles up to the maximum while nothing changes."""
+    polling = _polling()
+
+    intervals = [polling.status_received(_status()) for _ in range(4)]
+
+    assert intervals == [
+        timedelta(minutes=1),
+        timedelta(minutes=2),
+        timedelta(minutes=2),
+        timedelta(minutes=2),
+    ]
+
+
+def test_changing_device_is_polled_quickly() -> None:
+    """Test the interval drops to the minimum if a volatile value changes."""
+    polling = _polling()
+    polling.status_received(_status(aqi=10))
+
+    assert polling.status_received(_status(aqi=12)) == MIN_INTERVAL
+
+
+def test_device_turned_off_is_polled_slowly() -> None:
+    """Test a device which is off is polled with the maximum interval."""
+    assert _polling().status_received(_status(is_on=False)) == MAX_INTERVAL
+
+
+def test_command_polls_quickly_for_a_while() -> None:
+    """Test the device is polled quickly for a while after a command."""
+    polling = _polling()
+    with patch("time.monotonic", return_value=1000.0):
+        assert polling.command_sent() == MIN_INTERVAL
+        assert polling.status_received(_status()) == MIN_INTERVAL
+
+    later = 1000.0 + COMMAND_BURST.total_seconds() + 1
+    with patch("time.monotonic", return_value=later):
+        assert polling.status_received(_status()) == 2 * MIN_INTERVAL
+
+
+def test_unreachable_device_is_polled_with_the_configured_interval() -> None:
+    """Test the configured interval is used while the device doesn't respond."""
+    polling = _polling()
+    polling.status_received(_status())
+
+    assert polling.status_failed() == INTERVAL
+
+
+def test_missing_attributes_are_ignored() -> None:
+    """Test attributes the status doesn't provide are read as None."""
+    polling = _polling()
+
+    assert polling.status_received(SimpleNamespace()) == timedelta(minutes=1)
@@ -0,0 +1,213 @@
+"""Tests for the requests of the exposed properties."""
+
+import math
+
+from custom_components.xiaomi_miio_airpurifier.properties import (
+    CODE_NOT_REQUESTED,
+    GET_PROP,
+    GET_PROPERTIES,
+    PropertyFilter,
+    status_properties,
+)
+
+MIOT_PROPERTIES = [
+    {"did": "power", "siid": 2, "piid": 2},
+    {"did": "mode", "siid": 2, "piid": 5},
+    {"did": "aqi", "siid": 3, "piid": 6},
+]
+
+
+class FakeProtocol:
+    """Protocol which answers the status requests and records them."""
+
+    def __init__(self, drop=0):
+        """Initialize the protocol, dropping the last values if asked to."""
+        self.requests = []
+        self._drop = drop
+
+    def send(self, command, parameters=None, retry_count=3, *, extra_parameters=None):
+        """Answer a request with a value per property."""
+        self.requests.append((command, parameters))
+        if command == GET_PROPERTIES:
+            return [
+                {**parameter, "code": 0, "value": f"{parameter['did']} value"}
+                for parameter in parameters
+            ]
+        if command == GET_PROP:
+            values = [f"{parameter} value" for parameter in parameters]
+            return values[: len(values) - self._drop]
+        return ["ok"]
+
+
+class FakeStatus:
+    """Status container reading its properties from the data."""
+
+    def __init__(self, data):
+        """Initialize the status."""
+        self.data = data
+
+    @property
+    def power(self):
+        """Return the power."""
+        return self.data["power"]
+
+    @property
+    def mode(self):
+        """Return the mode."""
+        return self.data.get("mode")
+
+
+def test_requests_are_unchanged_without_properties() -> None:
+    """Test every property is requested until the properties are known."""
+    protocol = FakeProtocol()
+    properties = PropertyFilter(protocol)
+
+    values = properties.send(GET_PROP, ["power", "mode", "aqi"])
+
+    assert protocol.requests == [(GET_PROP, ["power", "mode", "aqi"])]
+    assert values == ["power value", "mode value", "aqi value"]
+
+
+def test_get_prop_is_limited_and_padded() -> None:
+    """Test only the exposed properties are requested by get_prop."""
+    protocol = FakeProtocol()
+    properties = PropertyFilter(protocol, frozenset({"power", "aqi"}))
+
+    values = properties.send(GET_PROP, ["power", "mode", "aqi"])
+
+    assert protocol.requests == [(GET_PROP, ["power", "aqi"])]
+    assert values == ["power value", None, "aqi value"]
+
+
+def test_get_properties_is_limited_and_padded() -> None:
+    """Test the MIoT properties which aren't requested are padded with errors."""
+    protocol = FakeProtocol()
+    properties = PropertyFilter(protocol, frozenset({"mode"}))
+
+    values = properties.send(GET_PROPERTIES, MIOT_PROPERTIES)
+
+    assert protocol.requests == [(GET_PROPERTIES, [MIOT_PROPERTIES[1]])]
+    assert values == [
+        {**MIOT_PROPERTIES[0], "code": CODE_NOT_REQUESTED},
+        {**MIOT_PROPERTIES[1], "code": 0, "value": "mode value"},
+        {**MIOT_PROPERTIES[2], "code": CODE_NOT_REQUESTED},
+    ]
+
+
+def test_all_properties_are_requested_on_a_short_response() -> None:
+    """Test every property is requested if values are missing from a response."""
+    protocol = FakeProtocol(drop=1)
+    properties = PropertyFilter(protocol, frozenset({"power", "aqi"}))
+
+    properties.send(GET_PROP, ["power", "mode", "aqi"])
+
+    assert protocol.requests == [
+        (GET_PROP, ["power", "aqi"]),
+        (GET_PROP, ["power", "mode", "aqi"]),
+    ]
+
+
+def test_other_commands_are_passed_through() -> None:
+    """Test commands which don't request the status are sent unchanged."""
+    protocol = FakeProtocol()
+    properties = PropertyFilter(protocol, frozenset({"power"}))
+
+    assert properties.send("set_mode", ["auto"]) == ["ok"]
+    assert protocol.requests == [("set_mode", ["auto"])]
+
+
+def test_single_properties_are_requested() -> None:
+    """Test the request of single properties seen in a status request."""
+    properties = PropertyFilter(FakeProtocol())
+
+    assert properties.request(frozenset({"mode"})) is None
+
+    properties.send(GET_PROPERTIES, MIOT_PROPERTIES)
+    command, parameters = properties.request(frozenset({"mode"}))
+
+    assert (command, parameters) == (GET_PROPERTIES, [MIOT_PROPERTIES[1]])
+    response = [{**MIOT_PROPERTIES[1], "code": 0, "value": "auto"}]
+    assert properties.values(command, parameters, response) == {"mode": "auto"}
+
+
+def test_properties_of_different_commands_are_not_requested() -> None:
+    """Test properties requested by different commands aren't read together."""
+    properties = PropertyFilter(FakeProtocol())
+    properties.send(GET_PROP, ["buzzer"])
+    properties.send(GET_PROPERTIES, MIOT_PROPERTIES)
+
+    assert properties.request(frozenset({"buzzer", "mode"})) is None
+
+
+def test_status_properties_are_traced() -> None:
+    """Test the properties the readers look at are traced."""
+    data = {"power": "on", "mode": "auto", "aqi": 10}
+    state = FakeStatus(data)
+
+    properties = status_properties(state, [lambda state: (state.power, state.mode)])
+
+    assert properties == {"power", "mode"}
+    assert state.data is data
+
+
+def _poll(properties, command, parameters):
+    """Run a poll of the filter and return the response to the driver."""
+    properties.start_poll()
+    return properties.send(command, parameters)
+
+
+def test_slow_properties_are_taken_from_the_cache() -> None:
+    """Test a slow property is only requested every few polls."""
+    protocol = FakeProtocol()
+    properties = PropertyFilter(protocol)
+    properties.tiers = {"aqi": 3}
+
+    responses = [_poll(properties, GET_PROP, ["power", "aqi"]) for _ in range(4)]
+
+    assert protocol.requests == [
+        (GET_PROP, ["power", "aqi"]),
+        (GET_PROP, ["power"]),
+        (GET_PROP, ["power"]),
+        (GET_PROP, ["power", "aqi"]),
+    ]
+    assert all(response == ["power value", "aqi value"] for response in responses)
+
+
+def test_static_properties_are_requested_once() -> None:
+    """Test a static MIoT property is requested once and kept in the cache."""
+    protocol = FakeProtocol()
+    properties = PropertyFilter(protocol)
+    properties.tiers = {"aqi": math.inf}
+
+    _poll(properties, GET_PROPERTIES, MIOT_PROPERTIES)
+    response = _poll(properties, GET_PROPERTIES, MIOT_PROPERTIES)
+
+    assert protocol.requests[1] == (GET_PROPERTIES, MIOT_PROPERTIES[:2])
+    assert response[2] == {**MIOT_PROPERTIES[2], "code": 0, "value": "aqi value"}
+
+
+def test_expire_requests_the_slow_properties() -> None:
+    """Test a command makes the slow but not the static properties due."""
+    protocol = FakeProtocol()
+    properties = PropertyFilter(protocol)
+    properties.tiers = {"mode": 10, "aqi": math.inf}
+
+    _poll(properties, GET_PROP, ["power", "mode", "aqi"])
+    properties.expire()
+    _poll(properties, GET_PROP, ["power", "mode", "aqi"])
+
+    assert protocol.requests[1] == (GET_PROP, ["power", "mode"])
+
+
+def test_skipped_properties_are_picked_per_poll() -> None:
+    """Test the requests don't change if the driver is run again in a poll."""
+    protocol = FakeProtocol()
+    properties = PropertyFilter(protocol)
+    properties.tiers = {"aqi": 2}
+
+    _poll(properties, GET_PROP, ["power", "aqi"])
+    properties.start_poll()
+    properties.send(GET_PROP, ["power", "aqi"])
+    properties.send(GET_PROP, ["power", "aqi"])
+
+    assert protocol.requests[1:] == [(GET_PROP, ["power"]), (GET_PROP, ["power"])]
@@ -0,0 +1,314 @@
+"""Tests for the push updates of the MIoT devices."""
+
+import datetime
+from datetime import timedelta
+import json
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, Mock, patch
+
+from miio.protocol import Message
+import pytest
+
+from custom_components.xiaomi_miio_airpurifier import coordinator as coordinator_module
+from custom_components.xiaomi_miio_airpurifier.coordinator import XiaomiMiioCoordinator
+from custom_components.xiaomi_miio_airpurifier.properties import GET_PROPERTIES
+from custom_components.xiaomi_miio_airpurifier.push import (
+    SERVER_ID,
+    STORAGE_KEY,
+    PushServer,
+    SceneRecord,
+    scene_frame,
+    scene_id,
+)
+
+HOST = "192.168.1.2"
+TOKEN = "0123456789abcdef0123456789abcdef"
+DEVICE_ID = 123456789
+MODEL = "zhimi.airpurifier.ma4"
+PUSH_INTERVAL = timedelta(minutes=5)
+
+MIOT_PROPERTIES = [
+    {"did": "power", "siid": 2, "piid": 2},
+    {"did": "mode", "siid": 2, "piid": 5},
+    {"did": "aqi", "siid": 3, "piid": 6},
+]
+
+POWER_SCENE = scene_id(2, 2)
+MODE_SCENE = scene_id(2, 5)
+LEFT_OVER_SCENE = scene_id(3, 6)
+
+
+class FakeProtocol:
+    """Protocol which answers the status requests."""
+
+    def send(self, command, parameters=None, retry_count=3, *, extra_parameters=None):
+        """Answer a request with a value per property."""
+        return [
+            {**parameter, "code": 0, "value": f"{parameter['did']} value"}
+            for parameter in parameters
+        ]
+
+
+class FakeStatus:
+    """Status container reading its properties from the data."""
+
+    def __init__(self, data):
+        """Initialize the status."""
+        self.data = data
+
+    @property
+    def power(self):
+        """Return the power."""
+        return self.data["power"]
+
+    @property
+    def mode(self):
+        """Return the mode."""
+        return self.data["mode"]
+
+
+class FakeDevice:
+    """MIoT device which records the commands and rejects some scenes."""
+
+    token = TOKEN
+    device_id = DEVICE_ID
+
+    def __init__(self, rejected=()):
+        """Initialize the device."""
+        self._protocol = FakeProtocol()
+        self._rejected = rejected
+        self.commands = []
+
+    def status(self):
+        """Return the status of the properties."""
+        response = self._protocol.send(GET_PROPERTIES, MIOT_PROPERTIES)
+        return FakeStatus({value["did"]: value["value"] for value in response})
+
+    def send(self, command, parameters):
+        """Record a command and reject the scenes asked for."""
+        self.commands.append((command, parameters))
+        if command == "send_data_frame" and any(
+            scene in parameters["data"] for scene in self._rejected
+        ):
+            return ["error"]
+        return ["ok"]
+
+    def installed(self):
+        """Return the ids of the scenes installed."""
+        return {
+            json.loads(parameters["data"])[0][0]
+            for command, parameters in self.commands
+            if command == "send_data_frame"
+        }
+
+    def removed(self):
+        """Return the ids of the scenes removed, per command."""
+        return [
+            parameters
+            for command, parameters in self.commands
+            if command == "miIO.xdel"
+        ]
+
+
+@pytest.fixture
+def push_server():
+    """Patch the executor and the push server of the coordinators."""
+    executor = SimpleNamespace(
+        async_run=AsyncMock(side_effect=lambda func, *args: func(*args))
+    )
+    server = Mock(server_ip=Mock(return_value="192.168.1.10"))
+    with (
+        patch.object(coordinator_module, "async_get_executor", return_value=executor),
+        patch.object(
+            coordinator_module, "async_get_push_server", AsyncMock(return_value=server)
+        ),
+    ):
+        yield server
+
+
+def _left_over(hass_storage):
+    """Store a scene installed by an earlier run."""
+    hass_storage[STORAGE_KEY] = {
+        "version": 1,
+        "key": STORAGE_KEY,
+        "data": {HOST: [LEFT_OVER_SCENE]},
+    }
+
+
+async def _refresh(hass, device, push_interval=PUSH_INTERVAL):
+    """Return a coordinator reading the power and mode after its first poll."""
+    coordinator = XiaomiMiioCoordinator(
+        hass, HOST, device, push_interval=push_interval, model=MODEL
+    )
+    coordinator.async_add_status_reader(lambda state: (state.power, state.mode))
+    await coordinator.async_refresh()
+    await hass.async_block_till_done()
+    return coordinator
+
+
+async def test_scene_record_is_saved(hass, hass_storage) -> None:
+    """Test the installed scenes are saved until they are removed."""
+    record = SceneRecord(hass)
+
+    await record.async_add("192.168.1.2", [scene_id(2, 1), scene_id(2, 2)])
+    await record.async_discard("192.168.1.2", [scene_id(2, 1)])
+
+    assert hass_storage[STORAGE_KEY]["data"] == {"192.168.1.2": ["x.scene.2002002"]}
+    assert await SceneRecord(hass).async_get("192.168.1.2") == {"x.scene.2002002"}
+
+    await record.async_discard("192.168.1.2", [scene_id(2, 2)])
+
+    assert hass_storage[STORAGE_KEY]["data"] == {}
+
+
+async def test_scene_record_is_loaded(hass, hass_storage) -> None:
+    """Test the scenes left by an earlier run are loaded."""
+    hass_storage[STORAGE_KEY] = {
+        "version": 1,
+        "key": STORAGE_KEY,
+        "data": {"192.168.1.2": ["x.scene.2002001"]},
+    }
+
+    record = SceneRecord(hass)
+
+    assert await record.async_get("192.168.1.2") == {"x.scene.2002001"}
+    assert await record.async_get("192.168.1.3") == set()
+
+
+def test_scene_frame() -> None:
+    """Test the scene pushes the changes of the property to the server."""
+    frame = scene_frame(MIOT_PROPERTIES[1], DEVICE_ID, MODEL, TOKEN, "192.168.1.10")
+
+    [[name, [_, _, [_, trigger], [target]]]] = json.loads(frame["data"])
+    assert frame["type"] == "scene"
+    assert name == "x.scene.2002005"
+    assert trigger["did"] == str(DEVICE_ID)
+    assert trigger["key"] == "prop.2.5"
+    assert trigger["model"] == MODEL
+    assert target["command"] == f"chuangmi.plug.v3.prop_2_5:{DEVICE_ID}"
+    assert target["did"] == str(SERVER_ID)
+    assert target["ip"] == "192.168.1.10"
+
+
+def test_scene_frame_with_a_long_command() -> None:
+    """Test no scene is built if the device couldn't send its command."""
+    parameter = {"did": "mode", "siid": 2, "piid": 5}
+
+    assert scene_frame(parameter, 10**24, MODEL, TOKEN, "192.168.1.10") is None
+
+
+def _datagram(method, token=TOKEN):
+    """Return a command sent by a scene, encrypted with the token."""
+    header = {
+        "length": 0,
+        "unknown": 0,
+        "device_id": DEVICE_ID.to_bytes(4, "big"),
+        "ts": datetime.datetime.now(datetime.UTC),
+    }
+    return Message.build(
+        {
+            "data": {"value": {"id": 7, "method": method, "params": []}},
+            "header": {"value": header},
+            "checksum": 0,
+        },
+        token=bytes.fromhex(token),
+    )
+
+
+def _server():
+    """Return a push server with a fake transport and a registered device."""
+    server = PushServer("0.0.0.0")
+    server.connection_made(Mock())
+    push_received = Mock()
+    server.async_register(HOST, TOKEN, push_received)
+    return server, push_received
+
+
+def test_pushed_command_is_accepted() -> None:
+    """Test the command of a registered device is acknowledged and handed on."""
+    server, push_received = _server()
+
+    server.datagram_received(
+        _datagram(f"chuangmi.plug.v3.prop_2_5:{DEVICE_ID}"), (HOST, 54321)
+    )
+
+    push_received.assert_called_once_with(2, 5)
+    server._transport.sendto.assert_called_once()
+    data, addr = server._transport.sendto.call_args.args
+    ack = Message.parse(data, token=bytes.fromhex(TOKEN))
+    assert ack.data.value == {"id": 7, "result": 0}
+    assert addr == (HOST, 54321)
+
+
+def test_command_of_an_unknown_device_is_ignored() -> None:
+    """Test the commands of devices which aren't registered are ignored."""
+    server, push_received = _server()
+
+    server.datagram_received(
+        _datagram(f"chuangmi.plug.v3.prop_2_5:{DEVICE_ID}"), ("192.168.1.3", 54321)
+    )
+
+    push_received.assert_not_called()
+    server._transport.sendto.assert_not_called()
+
+
+def test_command_with_another_token_is_dropped() -> None:
+    """Test a command which doesn't decrypt with the token is dropped."""
+    server, push_received = _server()
+
+    server.datagram_received(
+        _datagram(f"chuangmi.plug.v3.prop_2_5:{DEVICE_ID}", "f" * 32), (HOST, 54321)
+    )
+
+    push_received.assert_not_called()
+    server._transport.sendto.assert_not_called()
+
+
+async def test_scenes_are_installed(hass, hass_storage, push_server) -> None:
+    """Test the scenes of the properties read are installed.
+
+    The scenes left by an earlier run which aren't installed again are
+    removed.
+    """
+    _left_over(hass_storage)
+    device = FakeDevice()
+
+    coordinator = await _refresh(hass, device)
+
+    assert device.installed() == {POWER_SCENE, MODE_SCENE}
+    assert device.removed() == [[LEFT_OVER_SCENE]]
+    assert coordinator._scenes == {(2, 2): "power", (2, 5): "mode"}
+    assert coordinator.update_interval == PUSH_INTERVAL
+    assert hass_storage[STORAGE_KEY]["data"] == {HOST: [POWER_SCENE, MODE_SCENE]}
+    push_server.async_register.assert_called_once()
+
+
+async def test_rejected_scene_removes_all_scenes(
+    hass, hass_storage, push_server
+) -> None:
+    """Test every scene is removed if the device rejects one of them."""
+    _left_over(hass_storage)
+    device = FakeDevice(rejected=[MODE_SCENE])
+
+    coordinator = await _refresh(hass, device)
+
+    assert device.removed() == [sorted({LEFT_OVER_SCENE, POWER_SCENE, MODE_SCENE})]
+    assert coordinator._scenes == {}
+    assert coordinator.update_interval != PUSH_INTERVAL
+    assert hass_storage[STORAGE_KEY]["data"] == {}
+
+
+async def test_left_over_scenes_are_removed_without_push_updates(
+    hass, hass_storage, push_server
+) -> None:
+    """Test the scenes of an earlier run are removed once push is turned off."""
+    _left_over(hass_storage)
+    device = FakeDevice()
+
+    coordinator = await _refresh(hass, device, push_interval=None)
+
+    assert device.installed() == set()
+    assert device.removed() == [[LEFT_OVER_SCENE]]
+    assert coordinator._scenes is None
+    assert hass_storage[STORAGE_KEY]["data"] == {}
+    push_server.async_register.assert_not_called()
@@ -0,0 +1,113 @@
+"""Tests for the index of the entities."""
+
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from custom_components.xiaomi_miio_airpurifier import coordinator as coordinator_module
+from custom_components.xiaomi_miio_airpurifier.coordinator import XiaomiMiioCoordinator
+from custom_components.xiaomi_miio_airpurifier.entity import XiaomiMiioEntity
+from custom_components.xiaomi_miio_airpurifier.profiles import ModelProfile
+from custom_components.xiaomi_miio_airpurifier.registry import (
+    DeviceRegistry,
+    async_get_registry,
+)
+from homeassistant.helpers.entity import ToggleEntity
+from pytest_homeassistant_custom_component.common import MockEntityPlatform
+
+FEATURE_SET_LED = 1
+
+
+class FakeDevice:
+    """Entity with the set_led methods and the feature flags given."""
+
+    def __init__(self, entity_id, device_features):
+        """Initialize the entity."""
+        self.entity_id = entity_id
+        self.device_features = device_features
+
+    async def async_set_led_on(self):
+        """Turn the led on."""
+
+
+class FakeEntity(XiaomiMiioEntity, ToggleEntity):
+    """Entity showing the power of a device."""
+
+
+def _registry(*devices):
+    """Return a registry of the devices, named after their host."""
+    registry = DeviceRegistry()
+    for device in devices:
+        registry.async_add(device, device.entity_id.split(".")[1])
+    return registry
+
+
+def test_devices_are_found_by_entity_id_and_host() -> None:
+    """Test the entities are looked up by their entity id and host."""
+    led = FakeDevice("fan.a", FEATURE_SET_LED)
+    other = FakeDevice("fan.b", 0)
+    registry = _registry(led, other)
+
+    assert registry.async_get_host("a") is led
+    assert registry.async_get_devices("async_set_led_on") == [led, other]
+    assert registry.async_get_devices(
+        "async_set_led_on", entity_ids=["fan.b", "fan.c", "fan.b"]
+    ) == [other]
+
+
+def test_devices_are_indexed_by_feature() -> None:
+    """Test only the entities with the method and feature are returned."""
+    led = FakeDevice("fan.a", FEATURE_SET_LED)
+    registry = _registry(led, FakeDevice("fan.b", 0))
+
+    assert registry.async_get_devices("async_set_led_on", FEATURE_SET_LED) == [led]
+    assert registry.async_get_devices("async_set_buzzer_on") == []
+
+    later = FakeDevice("fan.c", FEATURE_SET_LED)
+    registry.async_add(later, "c")
+
+    assert registry.async_get_devices("async_set_led_on", FEATURE_SET_LED) == [
+        led,
+        later,
+    ]
+
+
+def test_removed_devices_are_dropped() -> None:
+    """Test a removed entity isn't found anymore."""
+    led = FakeDevice("fan.a", FEATURE_SET_LED)
+    registry = _registry(led)
+    registry.async_get_devices("async_set_led_on", FEATURE_SET_LED)
+
+    registry.async_remove(led, "a")
+
+    assert registry.async_get_host("a") is None
+    assert registry.async_get_devices("async_set_led_on", FEATURE_SET_LED) == []
+    assert registry.async_get_devices("async_set_led_on", entity_ids=["fan.a"]) == []
+
+
+@pytest.fixture
+def coordinator(hass):
+    """Return a coordinator whose executor isn't used."""
+    executor = SimpleNamespace(async_run=AsyncMock())
+    with patch.object(coordinator_module, "async_get_executor", return_value=executor):
+        yield XiaomiMiioCoordinator(
+            hass, "192.168.1.2", SimpleNamespace(_protocol=object())
+        )
+
+
+async def test_entity_is_registered_while_added(hass, coordinator) -> None:
+    """Test an entity is registered when added and unregistered on removal."""
+    profile = ModelProfile(None, FakeEntity, FEATURE_SET_LED, {}, [])
+    entity = FakeEntity("Fan", coordinator, "model", "fan", profile, None)
+    registry = async_get_registry(hass)
+
+    await MockEntityPlatform(hass).async_add_entities([entity])
+
+    assert registry.async_get_host("192.168.1.2") is entity
+    assert registry.async_get_devices("async_turn_on") == [entity]
+
+    await entity.async_remove()
+
+    assert registry.async_get_host("192.168.1.2") is None
+    assert registry.async_get_devices("async_turn_on") == []
@@ -0,0 +1,148 @@
+"""Tests for the services run on the target devices."""
+
+import asyncio
+from unittest.mock import Mock
+
+import voluptuous as vol
+
+from custom_components.xiaomi_miio_airpurifier.const import (
+    CONF_SERVICE_CONCURRENCY,
+    DATA_CONFIG,
+)
+from custom_components.xiaomi_miio_airpurifier.registry import async_get_registry
+from custom_components.xiaomi_miio_airpurifier.services import (
+    async_call_devices,
+    async_register_services,
+    report_command_error,
+)
+from homeassistant.const import ATTR_ENTITY_ID
+import homeassistant.helpers.config_validation as cv
+
+DOMAIN = "xiaomi_miio_airpurifier"
+FEATURE_SET_LED = 1
+
+SERVICES = {
+    "fan_set_led_on": {"method": "async_set_led_on", "feature": FEATURE_SET_LED},
+}
+SERVICE_SCHEMA = vol.Schema({vol.Optional(ATTR_ENTITY_ID): cv.entity_ids})
+
+
+class FakeDevice:
+    """Entity with the feature flags given, recording its calls."""
+
+    def __init__(self, entity_id, device_features):
+        """Initialize the entity."""
+        self.entity_id = entity_id
+        self.device_features = device_features
+        self.calls = 0
+        self.async_write_ha_state = Mock()
+
+    async def async_set_led_on(self):
+        """Turn the led on."""
+        self.calls += 1
+
+
+class NoLedDevice:
+    """Entity which doesn't have a led."""
+
+    entity_id = "fan.no_led"
+    device_features = FEATURE_SET_LED
+
+
+async def _call(hass, devices, data):
+    """Call the set_led_on service of the devices and return the response."""
+    registry = async_get_registry(hass)
+    for device in devices:
+        registry.async_add(device, device.entity_id)
+    async_register_services(hass, DOMAIN, SERVICES, SERVICE_SCHEMA)
+
+    return await hass.services.async_call(
+        DOMAIN, "fan_set_led_on", data, blocking=True, return_response=True
+    )
+
+
+async def test_service_reaches_the_devices_with_the_feature(hass) -> None:
+    """Test a service without a target reaches the devices supporting it."""
+    led = FakeDevice("fan.led", FEATURE_SET_LED)
+    other = FakeDevice("fan.other", 0)
+
+    response = await _call(hass, [led, other, NoLedDevice()], {})
+
+    assert response == {"fan.led": {"success": True}}
+    assert (led.calls, other.calls) == (1, 0)
+    led.async_write_ha_state.assert_called_once()
+
+
+async def test_service_reaches_the_targets_with_the_feature(hass) -> None:
+    """Test the targets without the feature are skipped."""
+    led = FakeDevice("fan.led", FEATURE_SET_LED)
+    second = FakeDevice("fan.second", FEATURE_SET_LED)
+    other = FakeDevice("fan.other", 0)
+
+    response = await _call(
+        hass, [led, second, other], {ATTR_ENTITY_ID: ["fan.second", "fan.other"]}
+    )
+
+    assert response == {"fan.second": {"success": True}}
+    assert (led.calls, second.calls, other.calls) == (0, 1, 0)
+
+
+class SlowDevice:
+    """Entity whose calls take a while, counting the calls running at once."""
+
+    running = 0
+    most_running = 0
+
+    def __init__(self, entity_id, error=None):
+        """Initialize the entity, whose calls report the error if any."""
+        self.entity_id = entity_id
+        self.async_write_ha_state = Mock()
+        self._error = error
+
+    async def async_set_led_on(self):
+        """Turn the led on, reporting the error of a command."""
+        SlowDevice.running += 1
+        SlowDevice.most_running = max(SlowDevice.most_running, SlowDevice.running)
+        await asyncio.sleep(0.01)
+        SlowDevice.running -= 1
+        if self._error is not None:
+            report_command_error(self._error)
+
+
+class FailingDevice(SlowDevice):
+    """Entity whose calls raise."""
+
+    async def async_set_led_on(self):
+        """Fail to turn the led on."""
+        raise ValueError("unknown mode")
+
+
+async def test_calls_are_limited(hass) -> None:
+    """Test at most service_concurrency devices are called at once."""
+    hass.data[DATA_CONFIG] = {CONF_SERVICE_CONCURRENCY: 2}
+    SlowDevice.most_running = 0
+    devices = [SlowDevice(f"fan.fan_{index}") for index in range(5)]
+
+    response = await async_call_devices(hass, devices, "async_set_led_on", {})
+
+    assert SlowDevice.most_running == 2
+    assert len(response) == 5
+
+
+async def test_errors_are_collected_per_call(hass) -> None:
+    """Test the errors of a device only show up in its own outcome."""
+    devices = [
+        SlowDevice("fan.timeout", "timeout"),
+        SlowDevice("fan.ok"),
+        FailingDevice("fan.failing"),
+    ]
+
+    response = await async_call_devices(hass, devices, "async_set_led_on", {})
+
+    assert response == {
+        "fan.timeout": {"success": False, "error": "timeout"},
+        "fan.ok": {"success": True},
+        "fan.failing": {"success": False, "error": "unknown mode"},
+    }
+    for device in devices:
+        device.async_write_ha_state.assert_called_once()
@@ -0,0 +1,103 @@
+"""Tests for the recording and replaying of device traces."""
+
+from miio import DeviceError, DeviceException
+import pytest
+import voluptuous as vol
+
+from custom_components.xiaomi_miio_airpurifier.const import (
+    CONF_RECORD_TRACE,
+    CONF_REPLAY_TRACE,
+)
+from custom_components.xiaomi_miio_airpurifier.coordinator import COORDINATOR_SCHEMA
+from custom_components.xiaomi_miio_airpurifier.trace import (
+    TraceRecorder,
+    TraceReplayProtocol,
+    read_trace,
+)
+
+MODEL = "zhimi.airpurifier.ma4"
+
+
+class FakeProtocol:
+    """Protocol which answers the requests with the outcomes in turn."""
+
+    def __init__(self, outcomes):
+        """Initialize the protocol."""
+        self._outcomes = list(outcomes)
+
+    def send(self, command, parameters=None, retry_count=3, *, extra_parameters=None):
+        """Return the next result or raise the next exception."""
+        outcome = self._outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+
+def _record(path):
+    """Record the requests of a driver to a trace."""
+    recorder = TraceRecorder(
+        FakeProtocol(
+            [
+                ["on"],
+                ["off"],
+                DeviceError({"code": -5001, "message": "invalid mode"}),
+                DeviceException("timeout"),
+            ]
+        ),
+        path,
+        MODEL,
+    )
+    assert recorder.send("get_prop", ["power"]) == ["on"]
+    assert recorder.send("get_prop", ["power"]) == ["off"]
+    with pytest.raises(DeviceError):
+        recorder.send("set_mode", ["turbo"])
+    with pytest.raises(DeviceException):
+        recorder.send("get_prop", ["mode"])
+    recorder.close()
+
+
+def test_trace_is_recorded(tmp_path) -> None:
+    """Test the outcome of every request is written to the trace."""
+    path = tmp_path / "trace.jsonl.gz"
+    _record(path)
+
+    header, records = read_trace(path)
+
+    assert header == {"version": 1, "model": MODEL}
+    assert [record["method"] for record in records] == [
+        "get_prop",
+        "get_prop",
+        "set_mode",
+        "get_prop",
+    ]
+    assert records[1]["result"] == ["off"]
+    assert records[2]["error"] == {"code": -5001, "message": "invalid mode"}
+    assert records[3]["exception"] == "timeout"
+
+
+def test_trace_is_replayed(tmp_path) -> None:
+    """Test the recorded responses come back in order and start over."""
+    path = tmp_path / "trace.jsonl.gz"
+    _record(path)
+    protocol = TraceReplayProtocol(path)
+
+    responses = [protocol.send("get_prop", ["power"]) for _ in range(3)]
+
+    assert responses == [["on"], ["off"], ["on"]]
+    with pytest.raises(DeviceError) as error:
+        protocol.send("set_mode", ["turbo"])
+    assert error.value.code == -5001
+    with pytest.raises(DeviceException, match="timeout"):
+        protocol.send("get_prop", ["mode"])
+    with pytest.raises(DeviceException, match="isn't in the trace"):
+        protocol.send("get_prop", ["aqi"])
+
+
+def test_record_and_replay_are_exclusive() -> None:
+    """Test a device is either recorded or replayed."""
+    schema = vol.Schema(COORDINATOR_SCHEMA)
+
+    assert CONF_RECORD_TRACE in schema({CONF_RECORD_TRACE: "trace.jsonl.gz"})
+    assert CONF_REPLAY_TRACE in schema({CONF_REPLAY_TRACE: "trace.jsonl.gz"})
+    with pytest.raises(vol.Invalid):
+        schema({CONF_RECORD_TRACE: "a.jsonl.gz", CONF_REPLAY_TRACE: "b.jsonl.gz"})
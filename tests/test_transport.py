@@ -0,0 +1,103 @@
+"""Tests for the asyncio miIO transport."""
+
+from unittest.mock import AsyncMock
+
+from miio import DeviceException
+import pytest
+
+from custom_components.xiaomi_miio_airpurifier.transport import (
+    AsyncMiioTransport,
+    ProtocolWrapper,
+)
+
+
+class FakeProtocol:
+    """Protocol of a driver, which must not be used by the transport."""
+
+    def send(self, command, parameters=None, retry_count=3, *, extra_parameters=None):
+        """Fail, the requests are sent by the transport."""
+        raise AssertionError("The blocking protocol was used")
+
+
+class FakeDriver:
+    """Driver which sends its requests through its protocol."""
+
+    def __init__(self, protocol):
+        """Initialize the driver."""
+        self._protocol = protocol
+        self.model = None
+        self.runs = 0
+
+    def status(self):
+        """Detect the model once and request two properties one by one."""
+        self.runs += 1
+        if self.model is None:
+            self.model = self._protocol.send("miIO.info")["model"]
+
+        return (
+            self.model,
+            self._protocol.send("get_prop", ["power"]),
+            self._protocol.send("get_prop", ["mode"]),
+        )
+
+    def twice(self):
+        """Send the same request twice."""
+        return [self._protocol.send("get_count"), self._protocol.send("get_count")]
+
+
+def _transport(responses):
+    """Return a transport whose requests get the responses in turn."""
+    transport = AsyncMiioTransport("192.168.1.2", "0" * 32)
+    transport.async_send = AsyncMock(side_effect=responses)
+    return transport
+
+
+async def test_requests_are_replayed() -> None:
+    """Test the driver is run again until every response is there.
+
+    The model is cached by the first run, so the later runs skip its request.
+    """
+    transport = _transport([{"model": "zhimi.airpurifier.ma4"}, ["on"], ["auto"]])
+    driver = FakeDriver(FakeProtocol())
+
+    result = await transport.async_call(driver.status)
+
+    assert result == ("zhimi.airpurifier.ma4", ["on"], ["auto"])
+    assert [call.args[0] for call in transport.async_send.call_args_list] == [
+        "miIO.info",
+        "get_prop",
+        "get_prop",
+    ]
+    assert driver.runs == 4
+
+
+async def test_repeated_requests_get_their_own_responses() -> None:
+    """Test identical requests are answered in the order they were sent."""
+    transport = _transport([[1], [2]])
+    driver = FakeDriver(FakeProtocol())
+
+    assert await transport.async_call(driver.twice) == [[1], [2]]
+
+
+async def test_failed_request_is_raised_to_the_driver() -> None:
+    """Test the exception of a request is raised where the driver sent it."""
+    transport = _transport([DeviceException("timeout")])
+    driver = FakeDriver(FakeProtocol())
+
+    with pytest.raises(DeviceException, match="timeout"):
+        await transport.async_call(driver.status)
+
+    assert transport.async_send.call_count == 1
+
+
+async def test_protocol_of_the_driver_is_restored() -> None:
+    """Test the protocol below the wrappers is swapped and restored."""
+    transport = _transport([{"model": "zhimi.airpurifier.ma4"}, ["on"], ["auto"]])
+    protocol = FakeProtocol()
+    wrapper = ProtocolWrapper(protocol)
+    driver = FakeDriver(wrapper)
+
+    await transport.async_call(driver.status)
+
+    assert driver._protocol is wrapper
+    assert wrapper._protocol is protocol
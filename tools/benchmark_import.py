@@ -0,0 +1,103 @@
+"""Measure the import time of the integration and python-miio.
+
+Every measurement runs in a fresh interpreter, so nothing is cached in
+``sys.modules``. The modules a target depends on but doesn't own, like
+the Home Assistant fan platform, are imported before the clock starts.
+
+Usage, from the root of the repository:
+
+    python tools/benchmark_import.py [--runs 7]
+
+python-miio imports all of its drivers in ``miio/__init__.py``. Importing
+a single driver module like ``miio.integrations.fan.dmaker.fan_miot`` runs
+that first, so it costs about as much as ``import miio``.
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HOMEASSISTANT = [
+    "homeassistant.components.climate",
+    "homeassistant.components.fan",
+    "homeassistant.helpers.storage",
+    "homeassistant.helpers.update_coordinator",
+]
+
+# Name, modules imported before the clock starts, modules measured.
+TARGETS = [
+    ("miio", [], ["miio"]),
+    (
+        "miio, single driver module",
+        [],
+        ["miio.integrations.fan.dmaker.fan_miot"],
+    ),
+    ("Home Assistant platforms", [], HOMEASSISTANT),
+    (
+        "integration without miio",
+        HOMEASSISTANT + ["miio"],
+        [
+            "custom_components.xiaomi_miio_airpurifier.fan",
+            "custom_components.xiaomi_miio_airpurifier.climate",
+        ],
+    ),
+    (
+        "integration",
+        HOMEASSISTANT,
+        [
+            "custom_components.xiaomi_miio_airpurifier.fan",
+            "custom_components.xiaomi_miio_airpurifier.climate",
+        ],
+    ),
+]
+
+SCRIPT = """
+import importlib
+import time
+
+for module in {before!r}:
+    importlib.import_module(module)
+
+start = time.perf_counter()
+for module in {measured!r}:
+    importlib.import_module(module)
+print(time.perf_counter() - start)
+"""
+
+
+def measure(before, measured):
+    """Return the seconds it takes to import the modules in a fresh interpreter."""
+    result = subprocess.run(
+        [sys.executable, "-c", SCRIPT.format(before=before, measured=measured)],
+        cwd=ROOT,
+        capture_output=True,
+        check=True,
+        text=True,
+    )
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    """Print the median import time of every target."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=7, help="runs per target")
+    args = parser.parse_args()
+
+    # Compile the bytecode once, so the first run isn't slower than the others.
+    measure([], [module for _, _, modules in TARGETS for module in modules])
+
+    print(f"{'target':<30} {'median':>10} {'min':>10}")
+    for name, before, measured in TARGETS:
+        timings = [measure(before, measured) for _ in range(args.runs)]
+        print(
+            f"{name:<30} {statistics.median(timings) * 1000:>8.1f}ms"
+            f" {min(timings) * 1000:>8.1f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
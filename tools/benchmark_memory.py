@@ -0,0 +1,98 @@
+"""Measure the memory used by the state attributes of many entities.
+
+The state attributes of every entity used to be a dict of their own.
+They are kept as a list of values now, which shares the index of its
+keys with the other entities of the model. This compares both for a
+fleet of simulated Air Purifier 3 entities with tracemalloc.
+
+Usage, from the root of the repository:
+
+    python tools/benchmark_memory.py [--entities 1000]
+"""
+
+import argparse
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from custom_components.xiaomi_miio_airpurifier.attributes import (  # noqa: E402
+    StateAttributes,
+    get_schema,
+)
+from custom_components.xiaomi_miio_airpurifier.const import (  # noqa: E402
+    ATTR_CIRCUIT_BREAKER,
+)
+from custom_components.xiaomi_miio_airpurifier.fan import (  # noqa: E402
+    ATTR_MODEL,
+    AVAILABLE_ATTRIBUTES_AIRPURIFIER_3,
+    MODEL_AIRPURIFIER_3,
+)
+
+
+def simulated_states(count):
+    """Return the attributes of the entities, as read from their status."""
+    return [
+        {key: float(number) for key in AVAILABLE_ATTRIBUTES_AIRPURIFIER_3}
+        for number in range(count)
+    ]
+
+
+def as_dicts(states):
+    """Store the attributes like the entities did before."""
+    entities = []
+    for state in states:
+        attributes = {ATTR_MODEL: MODEL_AIRPURIFIER_3}
+        attributes.update(state)
+        attributes[ATTR_CIRCUIT_BREAKER] = "closed"
+        entities.append(attributes)
+    return entities
+
+
+def as_state_attributes(states):
+    """Store the attributes like the entities do now."""
+    entities = []
+    for state in states:
+        attributes = StateAttributes(
+            get_schema(
+                (ATTR_MODEL, *AVAILABLE_ATTRIBUTES_AIRPURIFIER_3, ATTR_CIRCUIT_BREAKER)
+            ),
+            {ATTR_MODEL: MODEL_AIRPURIFIER_3},
+        )
+        attributes.update(state)
+        attributes[ATTR_CIRCUIT_BREAKER] = "closed"
+        entities.append(attributes)
+    return entities
+
+
+def measure(store, states):
+    """Return the bytes allocated to store the attributes of the entities."""
+    tracemalloc.start()
+    entities = store(states)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert len(entities) == len(states)
+    return current
+
+
+def main():
+    """Print the memory used by both ways to store the attributes."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--entities", type=int, default=1000)
+    args = parser.parse_args()
+
+    states = simulated_states(args.entities)
+    # Build the shared index before measuring.
+    as_state_attributes(states[:1])
+
+    before = measure(as_dicts, states)
+    after = measure(as_state_attributes, states)
+    print(f"{'storage':<20} {'total':>12} {'per entity':>12}")
+    for name, size in (("dict", before), ("StateAttributes", after)):
+        print(f"{name:<20} {size / 1024:>10.1f}kB {size / args.entities:>11.0f}B")
+    print(f"saved {(before - after) / 1024:.1f}kB ({1 - after / before:.0%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,345 @@
+"""Benchmark the polling of simulated devices by the entities.
+
+Every scenario starts tools/simulator.py with a number of devices of one
+model and a Home Assistant instance which sets them up like the YAML
+configuration would. The coordinators of all devices are then refreshed
+together for a number of rounds. The benchmark reports:
+
+- the throughput, in polls per second
+- the p50 and p99 latency of an update, from the start of the poll until
+  the entity is updated
+- the longest and the p99 delay of the event loop while polling
+- the largest number of requests waiting for a worker of the executor
+
+Usage, from the root of the repository:
+
+    python tools/benchmark_polling.py [--devices 1 10 100 500]
+        [--entities XiaomiFan ...] [--rounds 5] [--io-workers 8]
+        [--transport executor] [--json results.json]
+        [--compare baseline.json] [--tolerance 0.25]
+
+With --compare, the results are checked against an earlier --json output.
+The exit code is 1 if the throughput dropped or the p99 latency grew by
+more than the tolerance.
+"""
+
+import argparse
+import asyncio
+from contextlib import suppress
+import ipaddress
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+from homeassistant import config_entries, core, loader
+from homeassistant.const import __version__ as HA_VERSION
+from homeassistant.helpers import (
+    area_registry,
+    category_registry,
+    device_registry,
+    entity_registry,
+    floor_registry,
+    issue_registry,
+    label_registry,
+)
+from homeassistant.setup import async_setup_component
+import miio
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from custom_components.xiaomi_miio_airpurifier.const import (  # noqa: E402
+    DATA_COORDINATORS,
+    DATA_EXECUTOR,
+    DOMAIN,
+)
+
+SIMULATOR = os.path.join(ROOT, "tools", "simulator.py")
+TOKEN = "00112233445566778899aabbccddeeff"
+
+# Entity class, platform and the model simulated for it.
+ENTITIES = {
+    "XiaomiAirPurifierMiot": ("fan", "zhimi.airpurifier.ma4"),
+    "XiaomiFan": ("fan", "zhimi.fan.za4"),
+    "XiaomiAirHumidifierMiot": ("fan", "zhimi.humidifier.ca4"),
+    "XiaomiAirDog": ("fan", "airdog.airpurifier.x3"),
+    "XiaomiAirDehumidifier": ("climate", "nwt.derh.wdh318efw1"),
+}
+
+# Interval of the probe of the event loop in seconds.
+PROBE_INTERVAL = 0.005
+
+
+def percentile(values, fraction):
+    """Return a percentile of the values."""
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+class LoopMonitor:
+    """Measure how late the event loop wakes up a sleeping task."""
+
+    def __init__(self, hass):
+        """Initialize the monitor."""
+        self._hass = hass
+        self._task = None
+        self.delays = []
+        self.max_queue_depth = 0
+
+    def start(self):
+        """Start probing the event loop."""
+        self._task = asyncio.create_task(self._probe())
+
+    async def stop(self):
+        """Stop probing the event loop."""
+        self._task.cancel()
+        with suppress(asyncio.CancelledError):
+            await self._task
+
+    async def _probe(self):
+        """Sleep repeatedly and record the delays."""
+        loop = asyncio.get_running_loop()
+        executor = self._hass.data.get(DATA_EXECUTOR)
+        while True:
+            start = loop.time()
+            await asyncio.sleep(PROBE_INTERVAL)
+            self.delays.append(max(0.0, loop.time() - start - PROBE_INTERVAL))
+            if executor is not None:
+                self.max_queue_depth = max(self.max_queue_depth, executor.queue_depth)
+
+
+async def async_start_simulator(model, count, address, config_path):
+    """Start the simulator and wait until its devices are listening."""
+    process = await asyncio.create_subprocess_exec(
+        sys.executable,
+        SIMULATOR,
+        "--models",
+        model,
+        "--count",
+        str(count),
+        "--address",
+        address,
+        "--token",
+        TOKEN,
+        "--config",
+        config_path,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    for _ in range(600):
+        if os.path.exists(config_path):
+            return process
+        if process.returncode is not None:
+            break
+        await asyncio.sleep(0.1)
+
+    process.kill()
+    raise RuntimeError(f"The simulator of {model} didn't start")
+
+
+async def async_start_home_assistant(config_dir):
+    """Return a Home Assistant instance which loads the integration."""
+    os.symlink(
+        os.path.join(ROOT, "custom_components"),
+        os.path.join(config_dir, "custom_components"),
+    )
+    hass = core.HomeAssistant(config_dir)
+    loader.async_setup(hass)
+    await asyncio.gather(
+        area_registry.async_load(hass),
+        category_registry.async_load(hass),
+        device_registry.async_load(hass),
+        entity_registry.async_load(hass),
+        floor_registry.async_load(hass),
+        issue_registry.async_load(hass),
+        label_registry.async_load(hass),
+    )
+    hass.config_entries = config_entries.ConfigEntries(hass, {})
+    await hass.config_entries.async_initialize()
+    hass.set_state(core.CoreState.running)
+    return hass
+
+
+async def async_refresh(coordinator):
+    """Refresh a coordinator and return the latency and its success."""
+    start = time.perf_counter()
+    await coordinator.async_refresh()
+    return time.perf_counter() - start, coordinator.last_update_success
+
+
+async def async_run_scenario(args, entity, count, address):
+    """Poll a number of simulated devices and return the measurements."""
+    domain, model = ENTITIES[entity]
+    with tempfile.TemporaryDirectory() as config_dir:
+        simulator = await async_start_simulator(
+            model, count, address, os.path.join(config_dir, "simulated.yaml")
+        )
+        hass = await async_start_home_assistant(config_dir)
+        try:
+            first = ipaddress.IPv4Address(address)
+            hosts = [str(first + index) for index in range(count)]
+            config = {
+                DOMAIN: {"io_workers": args.io_workers},
+                domain: [
+                    {
+                        "platform": DOMAIN,
+                        "name": f"{entity} {index}",
+                        "host": host,
+                        "token": TOKEN,
+                        "model": model,
+                        "transport": args.transport,
+                    }
+                    for index, host in enumerate(hosts)
+                ],
+            }
+            setup_start = time.perf_counter()
+            assert await async_setup_component(hass, DOMAIN, config)
+            assert await async_setup_component(hass, domain, config)
+            await hass.async_block_till_done()
+            setup_time = time.perf_counter() - setup_start
+
+            coordinators = list(hass.data[DATA_COORDINATORS].values())
+            assert len(coordinators) == count, "Not all devices were set up"
+
+            # Warm up the connections of the drivers.
+            await asyncio.gather(*(async_refresh(c) for c in coordinators))
+
+            monitor = LoopMonitor(hass)
+            latencies = []
+            failures = 0
+            monitor.start()
+            start = time.perf_counter()
+            for _ in range(args.rounds):
+                for latency, success in await asyncio.gather(
+                    *(async_refresh(c) for c in coordinators)
+                ):
+                    latencies.append(latency)
+                    failures += not success
+            elapsed = time.perf_counter() - start
+            await monitor.stop()
+        finally:
+            await hass.async_stop(force=True)
+            simulator.terminate()
+            await simulator.wait()
+
+    return {
+        "entity": entity,
+        "model": model,
+        "devices": count,
+        "rounds": args.rounds,
+        "polls": len(latencies),
+        "failures": failures,
+        "setup_s": round(setup_time, 3),
+        "throughput_per_s": round(len(latencies) / elapsed, 1),
+        "latency_p50_ms": round(percentile(latencies, 0.5) * 1000, 2),
+        "latency_p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+        "loop_delay_max_ms": round(max(monitor.delays, default=0) * 1000, 2),
+        "loop_delay_p99_ms": round((percentile(monitor.delays, 0.99) or 0) * 1000, 2),
+        "executor_max_queue_depth": monitor.max_queue_depth,
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Return the regressions of the results against a baseline."""
+    previous = {
+        (result["entity"], result["devices"]): result for result in baseline["results"]
+    }
+    regressions = []
+    for result in results:
+        before = previous.get((result["entity"], result["devices"]))
+        if before is None:
+            continue
+        name = f"{result['entity']} x{result['devices']}"
+        if result["throughput_per_s"] < before["throughput_per_s"] * (1 - tolerance):
+            regressions.append(
+                f"{name}: throughput {before['throughput_per_s']}"
+                f" -> {result['throughput_per_s']} polls/s"
+            )
+        if result["latency_p99_ms"] > before["latency_p99_ms"] * (1 + tolerance):
+            regressions.append(
+                f"{name}: p99 latency {before['latency_p99_ms']}"
+                f" -> {result['latency_p99_ms']} ms"
+            )
+    return regressions
+
+
+async def async_main(args):
+    """Run all scenarios and report the results."""
+    results = []
+    for entity in args.entities:
+        for count in args.devices:
+            # Every scenario gets addresses of its own.
+            address = f"127.{len(results) + 10}.0.1"
+            result = await async_run_scenario(args, entity, count, address)
+            results.append(result)
+            print(
+                f"{entity:<24} {count:>4} devices"
+                f" {result['throughput_per_s']:>8.1f} polls/s"
+                f" p50 {result['latency_p50_ms']:>7.2f}ms"
+                f" p99 {result['latency_p99_ms']:>7.2f}ms"
+                f" loop max {result['loop_delay_max_ms']:>7.2f}ms"
+                f" queue {result['executor_max_queue_depth']:>4}"
+                f" failures {result['failures']}",
+                flush=True,
+            )
+    return results
+
+
+def main():
+    """Parse the arguments and run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--devices", nargs="+", type=int, default=[1, 10, 100, 500])
+    parser.add_argument(
+        "--entities", nargs="+", choices=list(ENTITIES), default=list(ENTITIES)
+    )
+    parser.add_argument("--rounds", type=int, default=5, help="polls per device")
+    parser.add_argument("--io-workers", type=int, default=8)
+    parser.add_argument(
+        "--transport", choices=["executor", "asyncio"], default="executor"
+    )
+    parser.add_argument("--json", help="write the results to a file")
+    parser.add_argument("--compare", help="results of an earlier run to compare to")
+    parser.add_argument(
+        "--tolerance", type=float, default=0.25, help="allowed regression"
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.ERROR)
+    results = asyncio.run(async_main(args))
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as output:
+            json.dump(
+                {
+                    "environment": {
+                        "python": platform.python_version(),
+                        "machine": platform.machine(),
+                        "homeassistant": HA_VERSION,
+                        "python-miio": miio.__version__,
+                        "io_workers": args.io_workers,
+                        "transport": args.transport,
+                    },
+                    "results": results,
+                },
+                output,
+                indent=2,
+            )
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as baseline:
+            regressions = compare(results, json.load(baseline), args.tolerance)
+        for regression in regressions:
+            print(f"Regression: {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+"""Forward miIO datagrams to devices and inject network faults.
+
+Every proxy listens on UDP port 54321 of an address of its own and
+forwards the datagrams to the device at the target address, e.g. a
+device of tools/simulator.py. The responses are sent back to the client.
+Datagrams in both directions are subject to the configured faults:
+
+- loss: share of the datagrams which are dropped
+- delay and jitter: seconds every datagram is held back, varied by up to
+  the jitter in both directions
+- duplicate: share of the datagrams which are sent twice
+- corrupt: share of the datagrams with a flipped byte, which breaks their
+  checksum
+
+Usage, from the root of the repository:
+
+    python tools/fault_proxy.py --target 127.0.1.1 [--listen 127.0.2.1]
+        [--count 1] [--loss 0] [--delay 0] [--jitter 0] [--duplicate 0]
+        [--corrupt 0] [--seed SEED]
+
+The entities are then configured with the address of the proxy instead
+of the device. The faults of a running proxy can be changed, see
+tools/fault_scenarios.py.
+"""
+
+import argparse
+import asyncio
+import ipaddress
+import logging
+import random
+
+_LOGGER = logging.getLogger(__name__)
+
+PORT = 54321
+
+# Header of a miIO packet, which is left intact by the corruption.
+HEADER_LENGTH = 32
+
+# Seconds after which the upstream socket of an idle client is closed.
+IDLE_TIMEOUT = 30
+
+
+class Faults:
+    """Faults injected into the datagrams of a proxy."""
+
+    def __init__(self, loss=0.0, delay=0.0, jitter=0.0, duplicate=0.0, corrupt=0.0):
+        """Initialize the faults."""
+        self.loss = loss
+        self.delay = delay
+        self.jitter = jitter
+        self.duplicate = duplicate
+        self.corrupt = corrupt
+
+    def __repr__(self):
+        """Return the representation of the faults."""
+        return (
+            f"Faults(loss={self.loss}, delay={self.delay}, jitter={self.jitter}, "
+            f"duplicate={self.duplicate}, corrupt={self.corrupt})"
+        )
+
+
+class _Upstream(asyncio.DatagramProtocol):
+    """Socket of a single client towards the device."""
+
+    def __init__(self, proxy, client):
+        self._proxy = proxy
+        self._client = client
+        self.transport = None
+        self.pending = []
+        self.last_used = 0.0
+
+    def connection_made(self, transport):
+        self.transport = transport
+        for data in self.pending:
+            self._proxy.inject(transport.sendto, data)
+        self.pending = None
+
+    def datagram_received(self, data, addr):
+        self._proxy.reply(data, self._client)
+
+
+class FaultProxy(asyncio.DatagramProtocol):
+    """Forward the datagrams of the clients to a device, injecting faults.
+
+    python-miio opens a socket per request, so every request gets an
+    upstream socket of its own and the responses find their way back to
+    the socket which sent the request.
+    """
+
+    def __init__(self, target, faults=None, rng=None):
+        """Initialize the proxy."""
+        self.target = target
+        self.faults = faults or Faults()
+        self.forwarded = 0
+        self.dropped = 0
+        self.duplicated = 0
+        self.corrupted = 0
+        self._rng = rng or random.Random()
+        self._transport = None
+        self._upstreams = {}
+
+    def connection_made(self, transport):
+        """Store the listening transport."""
+        self._transport = transport
+
+    def datagram_received(self, data, addr):
+        """Forward a datagram of a client to the device."""
+        loop = asyncio.get_running_loop()
+        upstream = self._upstreams.get(addr)
+        if upstream is None:
+            upstream = self._upstreams[addr] = _Upstream(self, addr)
+            upstream.pending.append(data)
+            loop.create_task(
+                loop.create_datagram_endpoint(
+                    lambda: upstream, remote_addr=(self.target, PORT)
+                )
+            )
+        elif upstream.transport is None:
+            upstream.pending.append(data)
+        else:
+            self.inject(upstream.transport.sendto, data)
+        upstream.last_used = loop.time()
+
+    def reply(self, data, client):
+        """Send a datagram of the device back to the client."""
+        if self._transport is not None:
+            self.inject(lambda data: self._transport.sendto(data, client), data)
+
+    def inject(self, send, data):
+        """Send a datagram with the faults applied."""
+        faults = self.faults
+        rng = self._rng
+        if rng.random() < faults.loss:
+            self.dropped += 1
+            return
+
+        if rng.random() < faults.corrupt and len(data) > HEADER_LENGTH:
+            index = rng.randrange(HEADER_LENGTH, len(data))
+            data = data[:index] + bytes([data[index] ^ 0xFF]) + data[index + 1 :]
+            self.corrupted += 1
+
+        copies = 1
+        if rng.random() < faults.duplicate:
+            copies = 2
+            self.duplicated += 1
+
+        delay = faults.delay
+        if faults.jitter:
+            delay += rng.uniform(-faults.jitter, faults.jitter)
+
+        loop = asyncio.get_running_loop()
+        for _ in range(copies):
+            self.forwarded += 1
+            if delay > 0:
+                loop.call_later(delay, send, data)
+            else:
+                send(data)
+
+    def close_idle(self):
+        """Close the upstream sockets of the clients gone idle."""
+        now = asyncio.get_running_loop().time()
+        for client, upstream in list(self._upstreams.items()):
+            if (
+                upstream.transport is not None
+                and now - upstream.last_used > IDLE_TIMEOUT
+            ):
+                upstream.transport.close()
+                del self._upstreams[client]
+
+
+async def async_start_proxies(listen, target, count, faults, rng=None):
+    """Start a proxy per device and return them.
+
+    The proxies share the faults, so changing them affects all devices.
+    """
+    loop = asyncio.get_running_loop()
+    listen = ipaddress.IPv4Address(listen)
+    target = ipaddress.IPv4Address(target)
+    proxies = []
+    for index in range(count):
+        proxy = FaultProxy(str(target + index), faults, rng)
+        await loop.create_datagram_endpoint(
+            lambda proxy=proxy: proxy, local_addr=(str(listen + index), PORT)
+        )
+        proxies.append(proxy)
+
+    async def async_close_idle():
+        """Close the idle upstream sockets from time to time."""
+        while True:
+            await asyncio.sleep(IDLE_TIMEOUT)
+            for proxy in proxies:
+                proxy.close_idle()
+
+    loop.create_task(async_close_idle())
+    return proxies
+
+
+async def async_main(args):
+    """Start the proxies and run until interrupted."""
+    faults = Faults(args.loss, args.delay, args.jitter, args.duplicate, args.corrupt)
+    rng = random.Random(args.seed)
+    await async_start_proxies(args.listen, args.target, args.count, faults, rng)
+    _LOGGER.info(
+        "Forwarding %s devices from %s to %s with %s",
+        args.count,
+        args.listen,
+        args.target,
+        faults,
+    )
+    await asyncio.Event().wait()
+
+
+def main():
+    """Parse the arguments and run the proxies."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--target", required=True, help="address of the first device")
+    parser.add_argument("--listen", default="127.0.2.1", help="first proxy address")
+    parser.add_argument("--count", type=int, default=1, help="number of devices")
+    parser.add_argument("--loss", type=float, default=0.0)
+    parser.add_argument("--delay", type=float, default=0.0, help="seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="seconds")
+    parser.add_argument("--duplicate", type=float, default=0.0)
+    parser.add_argument("--corrupt", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, help="seed of the random faults")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    try:
+        asyncio.run(async_main(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,281 @@
+"""Measure the availability of an entity under network faults.
+
+A simulated device is put behind tools/fault_proxy.py and set up in a
+Home Assistant instance for every scenario and value of the retries
+option. The faults of the proxy are then changed as the scenario
+prescribes. The benchmark reports:
+
+- the seconds from the start of the faults until the entity became
+  unavailable
+- the seconds from the end of the faults until it was available again
+- how often and how long the entity was unavailable
+- the requests, timeouts and errors, and the seconds spent on failed
+  requests, which block a worker of the executor transport in vain
+
+Usage, from the root of the repository:
+
+    python tools/fault_scenarios.py [--scenarios outage loss slow flaky]
+        [--retries 0 1 3] [--scan-interval 10] [--duration 60]
+        [--transport executor] [--model zhimi.airpurifier.ma4]
+        [--json results.json]
+
+python-miio waits 5 seconds for the handshake of an unreachable device,
+however the timeout of the requests is configured. The time until an
+entity becomes unavailable grows accordingly.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+
+from homeassistant.const import EVENT_STATE_CHANGED, STATE_UNAVAILABLE
+from homeassistant.setup import async_setup_component
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmark_polling import (  # noqa: E402
+    TOKEN,
+    async_start_home_assistant,
+    async_start_simulator,
+)
+from fault_proxy import Faults, async_start_proxies  # noqa: E402
+
+from custom_components.xiaomi_miio_airpurifier.const import (  # noqa: E402
+    DATA_COORDINATORS,
+    DOMAIN,
+)
+from custom_components.xiaomi_miio_airpurifier.registry import (  # noqa: E402
+    async_get_registry,
+)
+
+DEVICE_ADDRESS = "127.30.0.1"
+PROXY_ADDRESS = "127.31.0.1"
+
+# Longest wait for the entity to become unavailable or available again.
+MAX_WAIT = 600
+
+# Faults of a scenario. The outage lasts until the entity is unavailable,
+# the other scenarios for the given duration.
+SCENARIOS = {
+    "outage": Faults(loss=1.0),
+    "loss": Faults(loss=0.3),
+    "slow": Faults(delay=2.0, jitter=1.5),
+    "flaky": Faults(duplicate=0.2, corrupt=0.1),
+}
+
+
+class AvailabilityMonitor:
+    """Record when the entity becomes unavailable and available again."""
+
+    def __init__(self, hass, entity_id):
+        """Initialize the monitor."""
+        self.available = True
+        self.changes = []
+        self._changed = asyncio.Event()
+        self._entity_id = entity_id
+        self._remove = hass.bus.async_listen(EVENT_STATE_CHANGED, self._state_changed)
+
+    def _state_changed(self, event):
+        if event.data["entity_id"] != self._entity_id:
+            return
+
+        available = event.data["new_state"].state != STATE_UNAVAILABLE
+        if available != self.available:
+            self.available = available
+            self.changes.append((time.monotonic(), available))
+            self._changed.set()
+
+    async def async_wait(self, available, timeout):
+        """Wait until the entity is (un)available and return when it became so."""
+        deadline = time.monotonic() + timeout
+        while self.available != available:
+            self._changed.clear()
+            try:
+                async with asyncio.timeout(deadline - time.monotonic()):
+                    await self._changed.wait()
+            except TimeoutError:
+                return None
+
+        return self.changes[-1][0] if self.changes else time.monotonic()
+
+    def unavailable_time(self, start, end):
+        """Return the seconds the entity was unavailable in a period."""
+        total = 0.0
+        since = None
+        for when, available in self.changes:
+            if not available:
+                since = when
+            elif since is not None:
+                total += min(when, end) - max(since, start)
+                since = None
+        if since is not None:
+            total += end - max(since, start)
+        return max(total, 0.0)
+
+    def stop(self):
+        """Stop recording."""
+        self._remove()
+
+
+async def async_run_scenario(args, proxies, name, retries):
+    """Run a scenario and return the measurements."""
+    with tempfile.TemporaryDirectory() as config_dir:
+        hass = await async_start_home_assistant(config_dir)
+        try:
+            config = {
+                "fan": [
+                    {
+                        "platform": DOMAIN,
+                        "name": "faulty",
+                        "host": PROXY_ADDRESS,
+                        "token": TOKEN,
+                        "model": args.model,
+                        "retries": retries,
+                        "scan_interval": args.scan_interval,
+                        "transport": args.transport,
+                    }
+                ]
+            }
+            assert await async_setup_component(hass, DOMAIN, {})
+            assert await async_setup_component(hass, "fan", config)
+            await hass.async_block_till_done()
+
+            coordinator = hass.data[DATA_COORDINATORS][PROXY_ADDRESS]
+            entity_id = async_get_registry(hass).async_get_host(PROXY_ADDRESS).entity_id
+            monitor = AvailabilityMonitor(hass, entity_id)
+
+            start = time.monotonic()
+            for proxy in proxies:
+                proxy.faults = SCENARIOS[name]
+            if name == "outage":
+                unavailable = await monitor.async_wait(False, MAX_WAIT)
+            else:
+                await asyncio.sleep(args.duration)
+                unavailable = next(
+                    (when for when, available in monitor.changes if not available),
+                    None,
+                )
+
+            healed = time.monotonic()
+            for proxy in proxies:
+                proxy.faults = Faults()
+            recovered = await monitor.async_wait(True, MAX_WAIT)
+            monitor.stop()
+            metrics = coordinator.metrics
+        finally:
+            await hass.async_stop(force=True)
+
+    return {
+        "scenario": name,
+        "retries": retries,
+        "time_to_unavailable_s": (
+            round(unavailable - start, 1) if unavailable is not None else None
+        ),
+        "time_to_recovery_s": (
+            round(max(recovered - healed, 0.0), 1) if recovered is not None else None
+        ),
+        "unavailable_count": sum(
+            1 for _, available in monitor.changes if not available
+        ),
+        "unavailable_s": round(monitor.unavailable_time(start, healed), 1),
+        "requests": metrics.requests.latency.count,
+        "timeouts": metrics.requests.timeouts,
+        "errors": metrics.requests.errors,
+        "hidden_by_retries": metrics.retries,
+        "failed_request_s": round(metrics.requests.failed_time, 1),
+    }
+
+
+def _format(value):
+    return "-" if value is None else str(value)
+
+
+async def async_main(args):
+    """Run all scenarios for every value of retries."""
+    simulator = await async_start_simulator(
+        args.model,
+        1,
+        DEVICE_ADDRESS,
+        os.path.join(tempfile.mkdtemp(), "simulated.yaml"),
+    )
+    proxies = await async_start_proxies(
+        PROXY_ADDRESS, DEVICE_ADDRESS, 1, Faults(), random.Random(args.seed)
+    )
+
+    results = []
+    print(
+        f"{'scenario':<8} {'retries':>7} {'to unavail.':>11} {'to recov.':>9}"
+        f" {'unavail.':>8} {'unavail. s':>10} {'requests':>8} {'timeouts':>8}"
+        f" {'errors':>6} {'failed s':>8}",
+        flush=True,
+    )
+    try:
+        for name in args.scenarios:
+            for retries in args.retries:
+                result = await async_run_scenario(args, proxies, name, retries)
+                results.append(result)
+                print(
+                    f"{name:<8} {retries:>7}"
+                    f" {_format(result['time_to_unavailable_s']):>11}"
+                    f" {_format(result['time_to_recovery_s']):>9}"
+                    f" {result['unavailable_count']:>8}"
+                    f" {result['unavailable_s']:>10}"
+                    f" {result['requests']:>8} {result['timeouts']:>8}"
+                    f" {result['errors']:>6} {result['failed_request_s']:>8}",
+                    flush=True,
+                )
+    finally:
+        simulator.terminate()
+        await simulator.wait()
+
+    return results
+
+
+def main():
+    """Parse the arguments and run the scenarios."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS)
+    )
+    parser.add_argument("--retries", nargs="+", type=int, default=[0, 1, 3])
+    parser.add_argument(
+        "--scan-interval", type=int, default=10, help="seconds between polls"
+    )
+    parser.add_argument(
+        "--duration", type=int, default=60, help="seconds of faults per scenario"
+    )
+    parser.add_argument(
+        "--transport", choices=["executor", "asyncio"], default="executor"
+    )
+    parser.add_argument("--model", default="zhimi.airpurifier.ma4")
+    parser.add_argument("--seed", type=int, default=1, help="seed of the faults")
+    parser.add_argument("--json", help="write the results to a file")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.CRITICAL)
+    results = asyncio.run(async_main(args))
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as output:
+            json.dump(
+                {
+                    "scan_interval": args.scan_interval,
+                    "duration": args.duration,
+                    "transport": args.transport,
+                    "model": args.model,
+                    "results": results,
+                },
+                output,
+                indent=2,
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""Replay a recorded trace into the entity of its model.
+
+A trace is recorded from a real device with the record_trace option of
+the platform. This sets up the entity of the recorded model in a Home
+Assistant instance with replay_trace, so the driver is answered from the
+trace instead of the network, and polls it as fast as possible. Every
+poll parses the recorded status and updates the entity, including its
+preset mode and speed.
+
+Usage, from the root of the repository:
+
+    python tools/replay_trace.py TRACE [--polls 1000] [--model MODEL]
+        [--output states.jsonl]
+
+The states of the entity after every poll can be written to a file of
+JSON lines. Replaying a trace is deterministic, so the files of two
+versions of the integration can be compared to find changes of the
+behaviour.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+
+from homeassistant.setup import async_setup_component
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmark_polling import async_start_home_assistant  # noqa: E402
+
+from custom_components.xiaomi_miio_airpurifier.const import (  # noqa: E402
+    DATA_COORDINATORS,
+    DOMAIN,
+)
+from custom_components.xiaomi_miio_airpurifier.fan import (  # noqa: E402
+    get_model_profile,
+)
+from custom_components.xiaomi_miio_airpurifier.registry import (  # noqa: E402
+    async_get_registry,
+)
+from custom_components.xiaomi_miio_airpurifier.trace import read_trace  # noqa: E402
+
+HOST = "replay"
+TOKEN = "00000000000000000000000000000000"
+
+
+async def async_replay(args, model):
+    """Poll the replayed entity and return its states and the elapsed time."""
+    domain = "fan" if get_model_profile(model) is not None else "climate"
+    config = {
+        domain: [
+            {
+                "platform": DOMAIN,
+                "name": "replay",
+                "host": HOST,
+                "token": TOKEN,
+                "model": model,
+                "replay_trace": os.path.abspath(args.trace),
+            }
+        ]
+    }
+
+    states = []
+    with tempfile.TemporaryDirectory() as config_dir:
+        hass = await async_start_home_assistant(config_dir)
+        try:
+            assert await async_setup_component(hass, DOMAIN, {})
+            assert await async_setup_component(hass, domain, config)
+            await hass.async_block_till_done()
+
+            coordinator = hass.data[DATA_COORDINATORS][HOST]
+            entity_id = async_get_registry(hass).async_get_host(HOST).entity_id
+
+            start = time.perf_counter()
+            for _ in range(args.polls):
+                await coordinator.async_refresh()
+                if args.output:
+                    state = hass.states.get(entity_id)
+                    states.append(
+                        {"state": state.state, "attributes": dict(state.attributes)}
+                    )
+            elapsed = time.perf_counter() - start
+        finally:
+            await hass.async_stop(force=True)
+
+    return states, elapsed
+
+
+def main():
+    """Replay the trace and print the time per poll."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("trace", help="gzip compressed JSON lines")
+    parser.add_argument("--polls", type=int, default=1000)
+    parser.add_argument("--model", help="model, if it isn't in the trace")
+    parser.add_argument("--output", help="write the states to a file")
+    args = parser.parse_args()
+
+    header, records = read_trace(args.trace)
+    model = args.model or header.get("model")
+    if model is None:
+        parser.error("The trace doesn't name its model, please pass --model")
+
+    logging.basicConfig(level=logging.ERROR)
+    states, elapsed = asyncio.run(async_replay(args, model))
+
+    print(f"{model}: {len(records)} recorded requests")
+    print(
+        f"{args.polls} polls in {elapsed:.2f}s, {args.polls / elapsed:.0f} polls/s, "
+        f"{elapsed / args.polls * 1e6:.0f}us per poll"
+    )
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output:
+            for state in states:
+                output.write(json.dumps(state, default=str) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,510 @@
+"""Simulate Xiaomi Miio devices on the local network.
+
+Every simulated device listens on UDP port 54321 of an address of its own
+and speaks the miIO protocol, including the handshake, the encryption and
+the MIoT get_properties, set_properties and action calls. The state of a
+device starts from the test fixtures of python-miio and is changed by the
+same commands a real device accepts.
+
+The MIoT devices accept the scenes of the push_updates option and push
+the changes of their properties to the address of the scene. With
+``--press-interval`` they are switched on and off every that many
+seconds, like by a press of their button.
+
+Usage, from the root of the repository:
+
+    python tools/simulator.py [--models MODEL ...] [--count 1]
+        [--address 127.0.1.1] [--token TOKEN] [--latency 0]
+        [--press-interval SECONDS] [--config simulated.yaml]
+
+Linux routes all of 127.0.0.0/8 to the loopback interface, so hundreds of
+devices can be simulated on one host. The fixtures are part of the test
+modules of python-miio, which need pytest to be installed.
+
+The configuration of the simulated devices is written to ``--config``,
+ready to be included into the configuration.yaml of Home Assistant.
+"""
+
+import argparse
+import asyncio
+from datetime import datetime, timezone
+import ipaddress
+import json
+import logging
+import struct
+import time
+
+from miio.protocol import Message
+
+_LOGGER = logging.getLogger(__name__)
+
+PORT = 54321
+DEFAULT_TOKEN = "00112233445566778899aabbccddeeff"
+
+HELLO = bytes.fromhex("21310020" + "ff" * 28)
+
+# Error codes returned by the devices.
+ERROR_UNKNOWN_METHOD = -32601
+ERROR_INVALID_ARGUMENT = -5001
+MIOT_NOT_FOUND = -4001
+
+
+def _fixtures():
+    """Return the factories of the python-miio test devices by model."""
+    # pylint: disable=import-outside-toplevel
+    from miio.integrations.airpurifier.airdog.tests.test_airpurifier_airdog import (
+        DummyAirDogX3,
+        DummyAirDogX5,
+        DummyAirDogX7SM,
+    )
+    from miio.integrations.airpurifier.dmaker.tests.test_airfresh_t2017 import (
+        DummyAirFreshA1,
+        DummyAirFreshT2017,
+    )
+    from miio.integrations.airpurifier.zhimi.tests.test_airfresh import (
+        DummyAirFresh,
+        DummyAirFreshVA4,
+    )
+    from miio.integrations.airpurifier.zhimi.tests.test_airpurifier import (
+        DummyAirPurifier,
+    )
+    from miio.integrations.airpurifier.zhimi.tests.test_airpurifier_miot import (
+        DummyAirPurifierMiot,
+    )
+    from miio.integrations.fan.dmaker.test_fan import DummyFanP5
+    from miio.integrations.fan.dmaker.test_fan_miot import (
+        DummyFan1C,
+        DummyFanMiot,
+        DummyFanMiotP10,
+        DummyFanMiotP11,
+    )
+    from miio.integrations.fan.leshow.tests.test_fan_leshow import DummyFanLeshow
+    from miio.integrations.fan.zhimi.test_fan import DummyFanSA1, DummyFanV2, DummyFanV3
+    from miio.integrations.humidifier.deerma.tests.test_airhumidifier_jsqs import (
+        DummyAirHumidifierJsqs,
+    )
+    from miio.integrations.humidifier.deerma.tests.test_airhumidifier_mjjsq import (
+        DummyAirHumidifierMjjsq,
+    )
+    from miio.integrations.humidifier.shuii.tests.test_airhumidifier_jsq import (
+        DummyAirHumidifierJsq,
+    )
+    from miio.integrations.humidifier.zhimi.tests.test_airhumidifier import (
+        DummyAirHumidifier,
+    )
+    from miio.integrations.humidifier.zhimi.tests.test_airhumidifier_miot import (
+        DummyAirHumidifierMiot,
+    )
+    from miio.tests.test_airdehumidifier import DummyAirDehumidifierV1
+
+    def fixed(fixture):
+        """Ignore the model for the test devices which are made for one."""
+        return lambda model: fixture()
+
+    purifier = fixed(DummyAirPurifier)
+    purifier_miot = fixed(DummyAirPurifierMiot)
+    fan_sa1 = fixed(DummyFanSA1)
+    fixtures = {
+        "zhimi.airpurifier.v1": purifier,
+        "zhimi.airpurifier.v2": purifier,
+        "zhimi.airpurifier.v3": purifier,
+        "zhimi.airpurifier.v5": purifier,
+        "zhimi.airpurifier.v6": purifier,
+        "zhimi.airpurifier.v7": purifier,
+        "zhimi.airpurifier.m1": purifier,
+        "zhimi.airpurifier.m2": purifier,
+        "zhimi.airpurifier.ma1": purifier,
+        "zhimi.airpurifier.ma2": purifier,
+        "zhimi.airpurifier.sa1": purifier,
+        "zhimi.airpurifier.sa2": purifier,
+        "zhimi.airpurifier.mc1": purifier,
+        "zhimi.airpurifier.mc2": purifier,
+        "zhimi.airpurifier.ma4": purifier_miot,
+        "zhimi.airpurifier.mb3": purifier_miot,
+        "zhimi.airpurifier.za1": purifier_miot,
+        "airdog.airpurifier.x3": fixed(DummyAirDogX3),
+        "airdog.airpurifier.x5": fixed(DummyAirDogX5),
+        "airdog.airpurifier.x7sm": fixed(DummyAirDogX7SM),
+        "zhimi.humidifier.v1": DummyAirHumidifier,
+        "zhimi.humidifier.ca1": DummyAirHumidifier,
+        "zhimi.humidifier.ca4": fixed(DummyAirHumidifierMiot),
+        "zhimi.humidifier.cb1": DummyAirHumidifier,
+        "zhimi.humidifier.cb2": DummyAirHumidifier,
+        "deerma.humidifier.mjjsq": fixed(DummyAirHumidifierMjjsq),
+        "deerma.humidifier.jsq": fixed(DummyAirHumidifierMjjsq),
+        "deerma.humidifier.jsq1": fixed(DummyAirHumidifierMjjsq),
+        "deerma.humidifier.jsq2w": fixed(DummyAirHumidifierJsqs),
+        "deerma.humidifier.jsq3": fixed(DummyAirHumidifierJsqs),
+        "deerma.humidifier.jsq5": fixed(DummyAirHumidifierJsqs),
+        "deerma.humidifier.jsqs": fixed(DummyAirHumidifierJsqs),
+        "shuii.humidifier.jsq001": fixed(DummyAirHumidifierJsq),
+        "dmaker.airfresh.a1": fixed(DummyAirFreshA1),
+        "zhimi.airfresh.va2": fixed(DummyAirFresh),
+        "zhimi.airfresh.va4": fixed(DummyAirFreshVA4),
+        "dmaker.airfresh.t2017": fixed(DummyAirFreshT2017),
+        "zhimi.fan.v2": fixed(DummyFanV2),
+        "zhimi.fan.v3": fixed(DummyFanV3),
+        "zhimi.fan.sa1": fan_sa1,
+        "zhimi.fan.za1": fan_sa1,
+        "zhimi.fan.za3": fan_sa1,
+        "zhimi.fan.za4": fan_sa1,
+        "dmaker.fan.p5": fixed(DummyFanP5),
+        "dmaker.fan.p8": fixed(DummyFan1C),
+        "dmaker.fan.p9": fixed(DummyFanMiot),
+        "dmaker.fan.p10": fixed(DummyFanMiotP10),
+        "dmaker.fan.p11": fixed(DummyFanMiotP11),
+        "dmaker.fan.p18": fixed(DummyFanMiotP10),
+        "dmaker.fan.1c": fixed(DummyFan1C),
+        "leshow.fan.ss4": fixed(DummyFanLeshow),
+        "nwt.derh.wdh318efw1": fixed(DummyAirDehumidifierV1),
+    }
+    return fixtures
+
+
+class CommandError(Exception):
+    """Error returned to the client instead of a result."""
+
+    def __init__(self, code, message):
+        """Initialize the error."""
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+
+class SimulatedDevice:
+    """State and commands of a simulated device."""
+
+    def __init__(self, model, fixture, device_id, token):
+        """Initialize the device from a python-miio test device."""
+        # pylint: disable=import-outside-toplevel
+        from miio.tests.dummies import DummyDevice, DummyMiotDevice
+
+        self.model = model
+        self.device_id = device_id
+        self.token = token
+        self._dummy = fixture(model)
+        self._get_state = DummyDevice._get_state
+        self.miot = isinstance(self._dummy, DummyMiotDevice)
+        # Scenes pushing the changes of properties, by scene id.
+        self.scenes = {}
+        # Changed properties which weren't pushed yet.
+        self.changes = []
+
+        if self.miot:
+            if model in type(self._dummy)._mappings:
+                self._dummy._model = model
+            mapping = self._dummy._get_mapping()
+            self._names = {
+                (spec["siid"], spec["piid"]): name
+                for name, spec in mapping.items()
+                if "piid" in spec
+            }
+        else:
+            self._dummy._model = model
+
+    def info(self):
+        """Return the response to miIO.info."""
+        mac = self.device_id.to_bytes(6, "big").hex(":")
+        return {
+            "model": self.model,
+            "mac": mac,
+            "fw_ver": "1.0.0_simulated",
+            "hw_ver": "simulator",
+            "token": self.token.hex(),
+            "ap": {"ssid": "simulator", "bssid": mac, "rssi": -50},
+            "netif": {"localIp": "127.0.0.1", "mask": "255.0.0.0", "gw": "127.0.0.1"},
+        }
+
+    def handle(self, method, params):
+        """Run a command and return its result."""
+        if method == "miIO.info":
+            return self.info()
+
+        if self.miot:
+            return self._handle_miot(method, params)
+
+        return self._handle_miio(method, params)
+
+    def _handle_miio(self, method, params):
+        """Run a command of a miIO device."""
+        handler = self._dummy.return_values.get(method)
+        if handler is None:
+            raise CommandError(ERROR_UNKNOWN_METHOD, "Method not found.")
+
+        # Real devices answer None for properties they don't know.
+        if getattr(handler, "__func__", None) is self._get_state:
+            return [self._dummy.state.get(name) for name in params]
+
+        try:
+            # The test devices consume their parameters.
+            result = handler(list(params) if isinstance(params, list) else params)
+        except (IndexError, KeyError, TypeError, ValueError) as ex:
+            raise CommandError(ERROR_INVALID_ARGUMENT, str(ex)) from ex
+
+        if result is None or isinstance(result, tuple):
+            return ["ok"]
+        return result
+
+    def _property(self, spec):
+        """Return the entry of a MIoT property in the state of the device."""
+        name = self._names.get((spec.get("siid"), spec.get("piid")), spec.get("did"))
+        for entry in self._dummy.state:
+            if entry["did"] == name:
+                return entry
+        return None
+
+    def _handle_miot(self, method, params):
+        """Run a command of a MIoT device."""
+        if method == "get_properties":
+            results = []
+            for spec in params:
+                entry = self._property(spec)
+                if entry is None:
+                    results.append({**spec, "code": MIOT_NOT_FOUND})
+                else:
+                    results.append({**spec, "code": 0, "value": entry["value"]})
+            return results
+
+        if method == "set_properties":
+            results = []
+            for spec in params:
+                entry = self._property(spec)
+                value = spec.get("value")
+                results.append(
+                    {key: value for key, value in spec.items() if key != "value"}
+                )
+                if entry is None:
+                    results[-1]["code"] = MIOT_NOT_FOUND
+                else:
+                    self._set_value(spec, entry, value)
+                    results[-1]["code"] = 0
+            return results
+
+        if method == "send_data_frame":
+            return self._add_scenes(params)
+
+        if method == "miIO.xdel":
+            for scene_id in params:
+                self.scenes.pop(scene_id, None)
+            return ["ok"]
+
+        if method == "action":
+            return {"code": 0}
+
+        raise CommandError(ERROR_UNKNOWN_METHOD, "Method not found.")
+
+    def _set_value(self, spec, entry, value):
+        """Change the value of a MIoT property and remember the change."""
+        if entry["value"] != value:
+            self.changes.append((spec["siid"], spec["piid"], value))
+        entry["value"] = value
+
+    def _add_scenes(self, frame):
+        """Install the scenes of a data frame, which push property changes."""
+        try:
+            scenes = json.loads(frame["data"])
+            for scene_id, (_, _, (_, trigger), targets) in scenes:
+                _, siid, piid = trigger["key"].split(".")
+                self.scenes[scene_id] = (
+                    int(siid),
+                    int(piid),
+                    [(target["ip"], target["command"]) for target in targets],
+                )
+        except (KeyError, TypeError, ValueError) as ex:
+            raise CommandError(ERROR_INVALID_ARGUMENT, str(ex)) from ex
+
+        return ["ok"]
+
+    def press(self):
+        """Switch the device on or off like a press of its button."""
+        for (siid, piid), name in self._names.items():
+            if name == "power":
+                entry = self._property({"siid": siid, "piid": piid})
+                self._set_value({"siid": siid, "piid": piid}, entry, not entry["value"])
+
+    def pushes(self):
+        """Return the commands the scenes send for the changes and forget them."""
+        pushes = []
+        for siid, piid, value in self.changes:
+            for scene_siid, scene_piid, targets in self.scenes.values():
+                if (scene_siid, scene_piid) == (siid, piid):
+                    pushes.extend(
+                        (ip, command, [{"siid": siid, "piid": piid, "value": value}])
+                        for ip, command in targets
+                    )
+        self.changes.clear()
+        return pushes
+
+
+class SimulatorProtocol(asyncio.DatagramProtocol):
+    """Answer the miIO requests of a simulated device."""
+
+    def __init__(self, device, latency):
+        """Initialize the protocol."""
+        self._device = device
+        self._latency = latency
+        self._started = time.monotonic()
+        self._transport = None
+        self._push_id = 0
+
+    def connection_made(self, transport):
+        """Remember the transport."""
+        self._transport = transport
+
+    def _timestamp(self):
+        """Return the uptime of the device, which it uses as timestamp."""
+        return 1000 + int(time.monotonic() - self._started)
+
+    def datagram_received(self, data, addr):
+        """Answer a handshake or a command."""
+        if data == HELLO:
+            response = struct.pack(
+                ">HHIII", 0x2131, 32, 0, self._device.device_id, self._timestamp()
+            )
+            self._send(response + b"\xff" * 16, addr)
+            return
+
+        try:
+            request = Message.parse(data, token=self._device.token).data.value
+            if "method" not in request:
+                # The acknowledgement of a pushed change.
+                return
+            method, params = request["method"], request.get("params", [])
+        except Exception as ex:  # noqa: BLE001 pylint: disable=broad-except
+            _LOGGER.warning("Dropping a malformed request from %s: %s", addr, ex)
+            return
+
+        try:
+            payload = {
+                "id": request["id"],
+                "result": self._device.handle(method, params),
+            }
+        except CommandError as ex:
+            payload = {
+                "id": request["id"],
+                "error": {"code": ex.code, "message": ex.message},
+            }
+        _LOGGER.debug("%s %s(%s) -> %s", self._device.model, method, params, payload)
+        self._send(self._build(payload), addr)
+        self.push()
+
+    def push(self):
+        """Send the commands of the scenes for the changed properties."""
+        for ip, command, params in self._device.pushes():
+            self._push_id += 1
+            payload = {"id": self._push_id, "method": command, "params": params}
+            _LOGGER.debug("%s pushes %s to %s", self._device.model, payload, ip)
+            self._send(self._build(payload), (ip, PORT))
+
+    def _build(self, payload):
+        """Return the encrypted message of the device with the payload."""
+        header = {
+            "length": 0,
+            "unknown": 0,
+            "device_id": self._device.device_id.to_bytes(4, "big"),
+            "ts": datetime.fromtimestamp(self._timestamp(), timezone.utc),
+        }
+        return Message.build(
+            {"data": {"value": payload}, "header": {"value": header}, "checksum": 0},
+            token=self._device.token,
+        )
+
+    def _send(self, response, addr):
+        """Send the response, after the latency of the device."""
+        if self._latency:
+            asyncio.get_running_loop().call_later(
+                self._latency, self._transport.sendto, response, addr
+            )
+        else:
+            self._transport.sendto(response, addr)
+
+
+def write_config(path, devices):
+    """Write the configuration of the simulated devices for Home Assistant."""
+    platforms = {"fan": [], "climate": []}
+    for host, device in devices:
+        domain = "climate" if device.model.startswith("nwt.derh.") else "fan"
+        platforms[domain].append(
+            "  - platform: xiaomi_miio_airpurifier\n"
+            f"    name: simulated {device.model} {host}\n"
+            f"    host: {host}\n"
+            f"    token: {device.token.hex()}\n"
+        )
+
+    with open(path, "w", encoding="utf-8") as config:
+        for domain, entries in platforms.items():
+            if entries:
+                config.write(f"{domain}:\n" + "".join(entries))
+
+
+async def async_main(args):
+    """Start the simulated devices and run until interrupted."""
+    fixtures = _fixtures()
+    models = args.models or list(fixtures)
+    unknown = [model for model in models if model not in fixtures]
+    if unknown:
+        raise SystemExit(f"Unsupported models: {', '.join(unknown)}")
+
+    loop = asyncio.get_running_loop()
+    token = bytes.fromhex(args.token)
+    address = ipaddress.IPv4Address(args.address)
+    devices = []
+    protocols = []
+    for model in models:
+        for _ in range(args.count):
+            device = SimulatedDevice(model, fixtures[model], len(devices) + 1, token)
+            host = str(address + len(devices))
+            _, protocol = await loop.create_datagram_endpoint(
+                lambda device=device: SimulatorProtocol(device, args.latency),
+                local_addr=(host, PORT),
+            )
+            devices.append((host, device))
+            if device.miot:
+                protocols.append((device, protocol))
+
+    if args.config:
+        write_config(args.config, devices)
+
+    _LOGGER.info(
+        "Simulating %s devices on %s to %s", len(devices), devices[0][0], devices[-1][0]
+    )
+    if not args.press_interval:
+        await asyncio.Event().wait()
+
+    while True:
+        await asyncio.sleep(args.press_interval)
+        for device, protocol in protocols:
+            device.press()
+            protocol.push()
+
+
+def main():
+    """Parse the arguments and run the simulator."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--models", nargs="*", help="models to simulate, all by default"
+    )
+    parser.add_argument("--count", type=int, default=1, help="devices per model")
+    parser.add_argument("--address", default="127.0.1.1", help="first address")
+    parser.add_argument("--token", default=DEFAULT_TOKEN, help="token of the devices")
+    parser.add_argument(
+        "--latency", type=float, default=0, help="response delay in seconds"
+    )
+    parser.add_argument(
+        "--press-interval",
+        type=float,
+        help="seconds between switching the MIoT devices on and off",
+    )
+    parser.add_argument("--config", help="write the Home Assistant configuration")
+    parser.add_argument("--debug", action="store_true", help="log every request")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.DEBUG if args.debug else logging.INFO)
+    try:
+        asyncio.run(async_main(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()